@@ -0,0 +1,179 @@
+"""Benchmarks and stress runs against scratch databases: `python -m bench <command>`
+from the backend directory. Commands that compare against a reference exit
+non-zero when the results differ."""
+import json
+import click
+
+@click.group()
+def cli():
+    """Inventory API benchmarks"""
+
+@cli.command('stress-movements')
+@click.option('--writers', default=32, show_default=True, help='Parallel writer threads')
+@click.option('--movements', default=200, show_default=True, help='Movements per writer')
+@click.option('--database', default=None, help='Database URI (defaults to a scratch SQLite file)')
+def stress_movements_command(writers, movements, database):
+    """Check stock updates for drift under concurrent writers"""
+    from bench.benchmarks import stress_movements
+
+    result = stress_movements(writers=writers, movements_per_writer=movements, database_uri=database)
+    click.echo(json.dumps(result, indent=2))
+    if result['drift'] != 0 or result['actual_quantity'] < 0:
+        raise click.ClickException('Stock drifted from the ledger')
+
+@cli.command('stock-as-of')
+@click.option('--per-day', default=200, show_default=True, help='Movements seeded per day')
+@click.option('--days', default=180, show_default=True, help='Days of history to seed')
+@click.option('--queries', default=50, show_default=True, help='Random points in time to rebuild')
+def bench_stock_as_of_command(per_day, days, queries):
+    """Rebuild stock at random points in time and compare with a full ledger replay"""
+    from bench.benchmarks import bench_stock_as_of
+
+    result = bench_stock_as_of(movements_per_day=per_day, days=days, queries=queries)
+    click.echo(json.dumps(result, indent=2))
+    if not result['matches']:
+        raise click.ClickException('Rebuilt stock differs from the ledger replay')
+
+@cli.command('forecast')
+@click.option('--series', default=100000, show_default=True, help='Inventory rows to forecast')
+@click.option('--days', default=90, show_default=True, help='Days of demand history to seed')
+@click.option('--workers', default=4, show_default=True, help='Processes for the sharded run')
+def bench_forecast_command(series, days, workers):
+    """Time the reorder forecast job and check it against the row-at-a-time computation"""
+    from bench.benchmarks import bench_forecast
+
+    result = bench_forecast(series=series, days=days, workers=workers)
+    click.echo(json.dumps(result, indent=2))
+    if not result['matches']:
+        raise click.ClickException('Vectorized forecast differs from the row-at-a-time computation')
+
+@cli.command('reorder-simulation')
+@click.option('--series', default=100000, show_default=True, help='Inventory rows to simulate')
+@click.option('--days', default=90, show_default=True, help='Days of demand to replay')
+@click.option('--workers', default=4, show_default=True, help='Processes for the sharded run')
+def bench_reorder_simulation_command(series, days, workers):
+    """Time a full-catalogue policy simulation and check it against the row-at-a-time replay"""
+    from bench.benchmarks import bench_reorder_simulation
+
+    result = bench_reorder_simulation(series=series, days=days, workers=workers)
+    click.echo(json.dumps(result, indent=2))
+    if not result['matches']:
+        raise click.ClickException('Vectorized simulation differs from the row-at-a-time replay')
+
+@cli.command('valuation')
+@click.option('--movements', default=20000, show_default=True, help='Movements recorded per method')
+@click.option('--batch-size', default=500, show_default=True, help='Movements per batch request')
+def bench_valuation_command(movements, batch_size):
+    """Measure cost-layer maintenance and valuation reads, and check them against a ledger replay"""
+    from bench.benchmarks import bench_valuation
+
+    result = bench_valuation(movements=movements, batch_size=batch_size)
+    click.echo(json.dumps(result, indent=2))
+    if not result['matches']:
+        raise click.ClickException('Maintained cost state differs from the ledger replay')
+
+@cli.command('movement-archive')
+@click.option('--per-day', default=200, show_default=True, help='Movements seeded per day')
+@click.option('--days', default=730, show_default=True, help='Days of history to seed')
+@click.option('--horizon-days', default=365, show_default=True, help='Days kept hot')
+def bench_movement_archive_command(per_day, days, horizon_days):
+    """Archive seeded history and compare history, export and analysis results before and after"""
+    from bench.benchmarks import bench_movement_archive
+
+    result = bench_movement_archive(movements_per_day=per_day, days=days, horizon_days=horizon_days)
+    click.echo(json.dumps(result, indent=2))
+    if not result['matches']:
+        raise click.ClickException('Results changed after archiving')
+
+@cli.command('movement-analysis')
+@click.option('--per-day', default=500, show_default=True, help='Movements seeded per day')
+@click.option('--days', default=365, show_default=True, help='Days of history to seed')
+@click.option('--skip-legacy', is_flag=True, help='Do not measure the load-everything approach')
+@click.option('--database', default=None, help='Database URI (defaults to a scratch SQLite file)')
+def bench_movement_analysis_command(per_day, days, skip_legacy, database):
+    """Measure movement analysis time and peak memory as the range grows"""
+    from bench.benchmarks import bench_movement_analysis
+
+    result = bench_movement_analysis(
+        movements_per_day=per_day, days=days, database_uri=database,
+        compare_legacy=not skip_legacy
+    )
+    click.echo(json.dumps(result, indent=2))
+
+@cli.command('aggregation')
+@click.option('--rows', default=1000000, show_default=True, help='Synthetic inventory rows')
+def bench_aggregation_command(rows):
+    """Time the columnar aggregation behind the summary and valuation reports"""
+    from bench.benchmarks import bench_aggregation
+
+    click.echo(json.dumps(bench_aggregation(rows=rows), indent=2))
+
+@cli.command('export')
+@click.option('--movements', default=200000, show_default=True, help='Movements to seed and export')
+@click.option('--format', 'export_format', type=click.Choice(['csv', 'ndjson']), default='csv', show_default=True)
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the export stream')
+def bench_export_command(movements, export_format, compress):
+    """Compare peak memory of the streamed movement export with building it in memory"""
+    from bench.benchmarks import bench_export
+
+    click.echo(json.dumps(bench_export(movements=movements, export_format=export_format, compress=compress), indent=2))
+
+@cli.command('product-import')
+@click.option('--rows', default=200000, show_default=True, help='Catalogue rows to import')
+@click.option('--chunk-rows', default=5000, show_default=True, help='Rows per transaction')
+def bench_product_import_command(rows, chunk_rows):
+    """Time a bulk catalogue import, first inserting and then updating every SKU"""
+    from bench.benchmarks import bench_product_import
+
+    click.echo(json.dumps(bench_product_import(rows=rows, chunk_rows=chunk_rows), indent=2))
+
+@cli.command('alert-sweep')
+@click.option('--alerts', default=200000, show_default=True, help='Alerts to seed, about two thirds sweepable')
+@click.option('--batch-rows', default=500, show_default=True, help='Alerts removed per transaction')
+def bench_alert_sweep_command(alerts, batch_rows):
+    """Time the alert retention sweep and the stock writes running alongside it"""
+    from bench.benchmarks import bench_alert_sweep
+
+    click.echo(json.dumps(bench_alert_sweep(alerts=alerts, batch_rows=batch_rows), indent=2))
+
+@cli.command('database')
+@click.option('--profile', 'profiles', multiple=True, help='Database profile to run (repeatable); "default" runs without pragmas or pool tuning')
+@click.option('--readers', default=8, show_default=True, help='Reader threads')
+@click.option('--writers', default=8, show_default=True, help='Writer threads')
+@click.option('--seconds', default=5.0, show_default=True, help='Duration of each run')
+def bench_database_command(profiles, readers, writers, seconds):
+    """Compare read/write throughput and lock failures across database profiles"""
+    from bench.benchmarks import bench_database
+
+    results = [
+        bench_database(None if profile == 'default' else profile, readers=readers, writers=writers, seconds=seconds)
+        for profile in (profiles or ('default', 'production'))
+    ]
+    click.echo(json.dumps(results, indent=2))
+
+@cli.command('read-write-split')
+@click.option('--writers', default=4, show_default=True, help='Writer threads')
+@click.option('--reporters', default=16, show_default=True, help='Report threads')
+@click.option('--seconds', default=5.0, show_default=True, help='Duration of each phase')
+@click.option('--max-p99-ratio', default=1.5, show_default=True,
+              help='Fail if, with the read engine, writer p99 under report load exceeds this multiple of writer p99 alone')
+def bench_read_write_split_command(writers, reporters, seconds, max_p99_ratio):
+    """Compare writer latency under report load with and without the read engine"""
+    from bench.benchmarks import bench_read_write_split
+
+    try:
+        results = [
+            bench_read_write_split(split=split, writers=writers, reporters=reporters, seconds=seconds)
+            for split in (False, True)
+        ]
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(json.dumps(results, indent=2))
+    ratio = results[1]['writer_p99_ratio']
+    if ratio is None or ratio > max_p99_ratio:
+        raise click.ClickException(
+            f'Writer p99 under report load was {ratio}x writer p99 alone with the read engine (limit {max_p99_ratio}x)'
+        )
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,1157 @@
+import csv
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from werkzeug.datastructures import MultiDict
+from sqlalchemy import func, insert
+from src.models.inventory import db, Category, Product, Warehouse, Inventory, InventoryMovement
+from src.services import columnar
+from src.services.analysis import movement_analysis
+from src.services.exports import build_export, export_stream, export_engine
+from src.services.movements import apply_stock_change, InsufficientStock
+from src.services.product_import import read_rows, import_products
+from src.services.rollups import rebuild_movement_rollups
+from bench.scratch import scratch_app, scratch_api, remove_scratch_database, seed_api_organization, seed_stock_item
+
+def stress_movements(writers=32, movements_per_writer=200, database_uri=None, seed=0):
+    """Run random in/out movements from parallel writers against one item.
+
+    Every writer records its movement in the ledger in the same transaction as
+    the stock change, so afterwards quantity_on_hand must equal the ledger's
+    net quantity; any difference is drift caused by lost updates.
+    """
+    app, path = scratch_app(database_uri)
+    try:
+        with app.app_context():
+            org_id, product_id, warehouse_id = seed_stock_item()
+
+        counts = {'committed': 0, 'rejected': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def writer(number):
+            rng = random.Random(seed + number)
+            outcome = {'committed': 0, 'rejected': 0, 'errors': 0}
+            with app.app_context():
+                for _ in range(movements_per_writer):
+                    movement_type = rng.choice(['in', 'out'])
+                    quantity = rng.randint(1, 5)
+                    try:
+                        apply_stock_change(org_id, product_id, warehouse_id, movement_type, quantity)
+                        db.session.add(InventoryMovement(
+                            organization_id=org_id,
+                            product_id=product_id,
+                            warehouse_id=warehouse_id,
+                            movement_type=movement_type,
+                            quantity=quantity
+                        ))
+                        db.session.commit()
+                        outcome['committed'] += 1
+                    except InsufficientStock:
+                        db.session.rollback()
+                        outcome['rejected'] += 1
+                    except Exception:
+                        db.session.rollback()
+                        outcome['errors'] += 1
+                db.session.remove()
+            with lock:
+                for key, value in outcome.items():
+                    counts[key] += value
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=writers) as pool:
+            list(pool.map(writer, range(writers)))
+        elapsed = time.perf_counter() - started
+
+        with app.app_context():
+            signed = func.sum(
+                db.case((InventoryMovement.movement_type == 'out', -InventoryMovement.quantity),
+                        else_=InventoryMovement.quantity)
+            )
+            expected = db.session.query(signed).filter(
+                InventoryMovement.product_id == product_id
+            ).scalar() or 0
+            actual = db.session.query(Inventory.quantity_on_hand).filter_by(
+                product_id=product_id, warehouse_id=warehouse_id
+            ).scalar()
+            db.session.remove()
+
+        return {
+            'writers': writers,
+            'attempted': writers * movements_per_writer,
+            **counts,
+            'elapsed_seconds': round(elapsed, 3),
+            'throughput_per_second': round(counts['committed'] / elapsed, 1) if elapsed else None,
+            'expected_quantity': expected,
+            'actual_quantity': actual,
+            'drift': actual - expected
+        }
+    finally:
+        remove_scratch_database(path)
+
+def _measure(func, *args, **kwargs):
+    """Run func once; returns (elapsed seconds, peak traced memory in KiB)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        func(*args, **kwargs)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak / 1024
+
+def bench_movement_analysis(movements_per_day=500, days=365, products=50, ranges=(1, 7, 30, 365),
+                            database_uri=None, seed=0, compare_legacy=True):
+    """Time the movement analysis report and trace its peak memory per range.
+
+    Seeds a year of movements, then runs the report for ranges ending at the
+    most recent movement. With compare_legacy the old approach (loading every
+    movement in the range as an ORM object) is measured alongside it.
+    """
+    app, path = scratch_app(database_uri)
+    try:
+        with app.app_context():
+            org_id, product_id, warehouse_id = seed_stock_item()
+            product_ids = [product_id]
+            for number in range(2, products + 1):
+                product = Product(organization_id=org_id, sku=f'BENCH-{number}', name=f'Benchmark item {number}')
+                db.session.add(product)
+                db.session.flush()
+                product_ids.append(product.id)
+
+            rng = random.Random(seed)
+            end = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+            for day in range(days):
+                day_start = end - timedelta(days=days - day)
+                db.session.execute(insert(InventoryMovement), [
+                    {
+                        'organization_id': org_id,
+                        'product_id': rng.choice(product_ids),
+                        'warehouse_id': warehouse_id,
+                        'movement_type': rng.choice(['in', 'out', 'adjustment']),
+                        'quantity': rng.randint(1, 20),
+                        'unit_cost': rng.randint(100, 5000) / 100,
+                        'movement_date': day_start + timedelta(seconds=rng.randint(0, 86399))
+                    }
+                    for _ in range(movements_per_day)
+                ])
+            rebuild_movement_rollups(org_id)
+            db.session.commit()
+
+            def legacy(date_from, date_to):
+                db.session.query(InventoryMovement).filter(
+                    InventoryMovement.organization_id == org_id,
+                    InventoryMovement.movement_date >= date_from,
+                    InventoryMovement.movement_date <= date_to
+                ).all()
+
+            results = []
+            for length in ranges:
+                date_from = end - timedelta(days=length)
+                elapsed, peak = _measure(movement_analysis, org_id, date_from, end)
+                db.session.expire_all()
+                row = {
+                    'range_days': length,
+                    'movements': movements_per_day * min(length, days),
+                    'elapsed_ms': round(elapsed * 1000, 1),
+                    'peak_kib': round(peak, 1)
+                }
+                if compare_legacy:
+                    elapsed, peak = _measure(legacy, date_from, end)
+                    db.session.expunge_all()
+                    row['legacy_elapsed_ms'] = round(elapsed * 1000, 1)
+                    row['legacy_peak_kib'] = round(peak, 1)
+                results.append(row)
+            db.session.remove()
+
+        return {'movements_seeded': movements_per_day * days, 'ranges': results}
+    finally:
+        remove_scratch_database(path)
+
+def bench_movement_archive(movements_per_day=200, days=730, products=50, horizon_days=365, seed=0):
+    """Archive the older part of a seeded ledger and check nothing changed.
+
+    Movement history (a full keyset traversal, offset pages and a filtered
+    range inside the archive), the movement analysis report and the CSV
+    export are computed before and after archiving and compared. Reports the
+    archive size, the hot table size and the time of a hot first page and of
+    a page read from the archive.
+    """
+    from hashlib import sha256
+    from src.services.movement_archive import archive_movements, paginate_movements
+
+    app, path = scratch_app(profile='test', read_split=False)
+    archive_dir = tempfile.mkdtemp(prefix='inventory-archive-')
+    app.config['MOVEMENT_ARCHIVE_DIR'] = archive_dir
+    try:
+        with app.app_context():
+            org_id, product_id, warehouse_id = seed_stock_item()
+            product_ids = [product_id]
+            for number in range(2, products + 1):
+                product = Product(organization_id=org_id, sku=f'BENCH-{number}', name=f'Benchmark item {number}')
+                db.session.add(product)
+                db.session.flush()
+                product_ids.append(product.id)
+
+            rng = random.Random(seed)
+            end = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+            for day in range(days):
+                day_start = end - timedelta(days=days - day)
+                db.session.execute(insert(InventoryMovement), [
+                    {
+                        'organization_id': org_id,
+                        'product_id': rng.choice(product_ids),
+                        'warehouse_id': warehouse_id,
+                        'movement_type': rng.choice(['in', 'out', 'adjustment']),
+                        'quantity': rng.randint(1, 20),
+                        'unit_cost': rng.randint(100, 5000) / 100,
+                        'movement_date': day_start + timedelta(seconds=rng.randint(0, 86399))
+                    }
+                    for _ in range(movements_per_day)
+                ])
+            rebuild_movement_rollups(org_id)
+            db.session.commit()
+
+            deep_from = end - timedelta(days=days - 30)
+            deep_to = deep_from + timedelta(days=20)
+
+            def history(args, filters=None):
+                query = InventoryMovement.query.filter_by(organization_id=org_id)
+                filters = filters or {}
+                if filters.get('date_from'):
+                    query = query.filter(InventoryMovement.movement_date >= filters['date_from'])
+                if filters.get('date_to'):
+                    query = query.filter(InventoryMovement.movement_date <= filters['date_to'])
+                if filters.get('product_id'):
+                    query = query.filter_by(product_id=filters['product_id'])
+                started = time.perf_counter()
+                items, info = paginate_movements(query, MultiDict(args), org_id, filters)
+                return [item.id for item in items], info, time.perf_counter() - started
+
+            def traverse():
+                ids = []
+                cursor = ''
+                while cursor is not None:
+                    page, info, _ = history({'cursor': cursor, 'limit': 1000})
+                    ids.extend(page)
+                    cursor = info['next_cursor']
+                return ids
+
+            def snapshot():
+                export = build_export('movements', org_id, MultiDict({'date_from': (end - timedelta(days=days - 10)).isoformat()}))
+                digest = sha256()
+                for chunk in export_stream(db.engine, export, 'csv'):
+                    digest.update(chunk)
+                analysis = movement_analysis(org_id, end - timedelta(days=days - 5, hours=7), end, bucket='month')
+                db.session.expire_all()
+                deep = {'date_from': deep_from, 'date_to': deep_to}
+                return {
+                    'traversal': traverse(),
+                    'page_3': history({'page': 3, 'limit': 100})[:2],
+                    'deep_page': history({'page': 2, 'limit': 100}, deep)[:2],
+                    'deep_product': history({'limit': 50}, {**deep, 'product_id': product_ids[1]})[:2],
+                    'analysis': analysis,
+                    'export_sha256': digest.hexdigest()
+                }
+
+            before = snapshot()
+            hot_before = db.session.query(func.count(InventoryMovement.id)).scalar()
+            summary = archive_movements([org_id], horizon_days=horizon_days)
+            hot_after = db.session.query(func.count(InventoryMovement.id)).scalar()
+            after = snapshot()
+
+            first_page = min(history({'cursor': '', 'limit': 50})[2] for _ in range(5))
+            deep_page = min(history({'page': 2, 'limit': 50}, {'date_from': deep_from, 'date_to': deep_to})[2] for _ in range(5))
+            db.session.remove()
+
+        return {
+            'movements_seeded': movements_per_day * days,
+            'archive': summary,
+            'hot_rows_before': hot_before,
+            'hot_rows_after': hot_after,
+            'bytes_per_archived_row': round(summary['bytes'] / summary['rows'], 1) if summary['rows'] else None,
+            'first_page_ms': round(first_page * 1000, 2),
+            'archived_page_ms': round(deep_page * 1000, 2),
+            'matches': before == after,
+            'mismatched': [key for key in before if before[key] != after[key]]
+        }
+    finally:
+        shutil.rmtree(archive_dir, ignore_errors=True)
+        remove_scratch_database(path)
+
+def bench_stock_as_of(movements_per_day=200, days=180, products=50, warehouses=2, queries=50,
+                      snapshot_after_days=30, horizon_days=60, seed=0):
+    """Rebuild stock at random points in time from snapshots and the ledger.
+
+    History is seeded day by day with in, out and adjustment movements and a
+    snapshot at the end of every day after the first `snapshot_after_days`
+    (so early points replay from the start of the ledger), then months older
+    than `horizon_days` are archived. Every rebuilt point is compared with a
+    replay of the full seeded ledger.
+    """
+    from src.services.movement_archive import archive_movements
+    from src.services.movements import stock_after
+    from src.services.snapshots import take_snapshot, stock_as_of
+    from src.services.upsert import dialect_insert
+
+    app, path = scratch_app(profile='test', read_split=False)
+    archive_dir = tempfile.mkdtemp(prefix='inventory-archive-')
+    app.config['MOVEMENT_ARCHIVE_DIR'] = archive_dir
+    try:
+        with app.app_context():
+            org_id, product_id, warehouse_id = seed_stock_item()
+            product_ids = [product_id]
+            for number in range(2, products + 1):
+                product = Product(organization_id=org_id, sku=f'BENCH-{number}', name=f'Benchmark item {number}')
+                db.session.add(product)
+                db.session.flush()
+                product_ids.append(product.id)
+            warehouse_ids = [warehouse_id]
+            for number in range(2, warehouses + 1):
+                warehouse = Warehouse(organization_id=org_id, name=f'Benchmark {number}', code=f'BENCH{number}')
+                db.session.add(warehouse)
+                db.session.flush()
+                warehouse_ids.append(warehouse.id)
+            db.session.commit()
+
+            rng = random.Random(seed)
+            end = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+            start = end - timedelta(days=days)
+            stock = {}
+            ledger = []
+            inventory = dialect_insert()(Inventory.__table__)
+            inventory = inventory.on_conflict_do_update(
+                index_elements=['organization_id', 'product_id', 'warehouse_id'],
+                set_={'quantity_on_hand': inventory.excluded.quantity_on_hand}
+            )
+            snapshots = 0
+            for day in range(days):
+                day_start = start + timedelta(days=day)
+                seconds = sorted(rng.randint(0, 86399) for _ in range(movements_per_day))
+                rows = []
+                for second in seconds:
+                    key = (rng.choice(product_ids), rng.choice(warehouse_ids))
+                    movement_type = rng.choices(['in', 'out', 'adjustment', 'transfer'], [5, 4, 1, 1])[0]
+                    quantity = rng.randint(1, 20)
+                    if movement_type in ('out', 'transfer') and stock.get(key, 0) < quantity:
+                        movement_type = 'in'
+                    stock[key] = stock_after(stock.get(key, 0), movement_type, quantity)
+                    rows.append({
+                        'organization_id': org_id,
+                        'product_id': key[0],
+                        'warehouse_id': key[1],
+                        'movement_type': movement_type,
+                        'quantity': quantity,
+                        'movement_date': day_start + timedelta(seconds=second)
+                    })
+                db.session.execute(insert(InventoryMovement), rows)
+                db.session.execute(inventory, [
+                    {'organization_id': org_id, 'product_id': key[0], 'warehouse_id': key[1], 'quantity_on_hand': quantity}
+                    for key, quantity in stock.items()
+                ])
+                db.session.commit()
+                ledger.extend((row['movement_date'], (row['product_id'], row['warehouse_id']), row['movement_type'], row['quantity']) for row in rows)
+                if day >= snapshot_after_days:
+                    take_snapshot(org_id, now=day_start + timedelta(days=1))
+                    snapshots += 1
+
+            archived = archive_movements([org_id], horizon_days=horizon_days)
+
+            def replayed(as_of):
+                levels = {}
+                for moved, key, movement_type, quantity in ledger:
+                    if moved > as_of:
+                        break
+                    levels[key] = stock_after(levels.get(key, 0), movement_type, quantity)
+                return levels
+
+            def nonzero(levels):
+                return {key: quantity for key, quantity in levels.items() if quantity}
+
+            timings = []
+            replay_counts = []
+            mismatches = 0
+            points = [start + timedelta(seconds=rng.randint(0, days * 86400)) for _ in range(queries)]
+            for as_of in points + [end]:
+                started = time.perf_counter()
+                levels, _, count = stock_as_of(org_id, as_of)
+                timings.append(time.perf_counter() - started)
+                replay_counts.append(count)
+                if nonzero(levels) != nonzero(replayed(as_of)):
+                    mismatches += 1
+            filtered, _, _ = stock_as_of(org_id, points[0], product_id=product_ids[1], warehouse_id=warehouse_ids[-1])
+            expected = {key: quantity for key, quantity in replayed(points[0]).items() if key == (product_ids[1], warehouse_ids[-1])}
+            if nonzero(filtered) != nonzero(expected):
+                mismatches += 1
+            db.session.remove()
+
+        return {
+            'movements_seeded': len(ledger),
+            'snapshots': snapshots,
+            'archived_rows': archived['rows'],
+            'queries': len(timings),
+            'as_of_p50_ms': round(_percentile(timings, 0.5) * 1000, 2),
+            'as_of_max_ms': round(max(timings) * 1000, 2),
+            'movements_replayed_p50': _percentile(replay_counts, 0.5),
+            'movements_replayed_max': max(replay_counts),
+            'mismatches': mismatches,
+            'matches': mismatches == 0
+        }
+    finally:
+        shutil.rmtree(archive_dir, ignore_errors=True)
+        remove_scratch_database(path)
+
+def bench_valuation(movements=20000, products=200, batch_size=500, seed=0):
+    """Record movements through the batch path under each valuation method.
+
+    Reports the time spent per batch, the time to read the organization's
+    stock value from the maintained cost state and the time to replay the
+    ledger for the same figure, and checks the maintained state against the
+    replay.
+    """
+    from src.services.movements import apply_movement_batch
+    from src.services.valuation import (
+        check_valuation, inventory_cost_value, join_valuation, replay_valuation, save_valuation_method
+    )
+
+    results = {}
+    for method in ('weighted_average', 'fifo'):
+        app, path = scratch_app(profile='test', read_split=False)
+        try:
+            with app.app_context():
+                org_id, product_id, warehouse_id = seed_stock_item()
+                product_ids = [product_id]
+                for number in range(2, products + 1):
+                    product = Product(organization_id=org_id, sku=f'BENCH-{number}', name=f'Benchmark item {number}',
+                                      cost_price=5)
+                    db.session.add(product)
+                    db.session.flush()
+                    product_ids.append(product.id)
+                save_valuation_method(org_id, method)
+                db.session.commit()
+
+                rng = random.Random(seed)
+                stock = {}
+                batch_times = []
+                for start in range(0, movements, batch_size):
+                    lines = []
+                    for _ in range(min(batch_size, movements - start)):
+                        key = rng.choice(product_ids)
+                        roll = rng.random()
+                        if roll < 0.45 or stock.get(key, 0) < 20:
+                            quantity = rng.randint(10, 50)
+                            lines.append({'product_id': key, 'warehouse_id': warehouse_id, 'movement_type': 'in',
+                                          'quantity': quantity,
+                                          'unit_cost': rng.randint(100, 900) / 100 if roll > 0.05 else None})
+                            stock[key] = stock.get(key, 0) + quantity
+                        elif roll < 0.97:
+                            quantity = rng.randint(1, 20)
+                            lines.append({'product_id': key, 'warehouse_id': warehouse_id, 'movement_type': 'out',
+                                          'quantity': quantity})
+                            stock[key] -= quantity
+                        else:
+                            quantity = max(stock[key] + rng.randint(-5, 5), 0)
+                            lines.append({'product_id': key, 'warehouse_id': warehouse_id,
+                                          'movement_type': 'adjustment', 'quantity': quantity})
+                            stock[key] = quantity
+                    started = time.perf_counter()
+                    _, summary, committed = apply_movement_batch(org_id, None, lines)
+                    batch_times.append(time.perf_counter() - started)
+                    if not committed:
+                        raise RuntimeError(f'Seeding batch rejected: {summary}')
+
+                started = time.perf_counter()
+                maintained = join_valuation(db.session.query(
+                    func.sum(inventory_cost_value(func.coalesce(Product.cost_price, 0)))
+                ).select_from(Inventory).join(Product)).filter(Inventory.organization_id == org_id).scalar()
+                read_seconds = time.perf_counter() - started
+
+                started = time.perf_counter()
+                states, _ = replay_valuation(org_id, method)
+                replay_seconds = time.perf_counter() - started
+                drift = check_valuation(org_id)
+                db.session.remove()
+
+            results[method] = {
+                'batch_p50_ms': round(_percentile(batch_times, 0.5) * 1000, 2),
+                'batch_max_ms': round(max(batch_times) * 1000, 2),
+                'value_read_ms': round(read_seconds * 1000, 2),
+                'ledger_replay_ms': round(replay_seconds * 1000, 2),
+                'total_value': float(maintained or 0),
+                'items_replayed': len(states),
+                'drifted_items': len(drift)
+            }
+        finally:
+            remove_scratch_database(path)
+
+    return {
+        'movements': movements,
+        'batch_size': batch_size,
+        'methods': results,
+        'matches': all(result['drifted_items'] == 0 for result in results.values())
+    }
+
+def seed_demand_history(series, days, density, warehouses, rng):
+    """Seed an organization with `series` stocked inventory rows spread over
+    `warehouses` and `days` of outbound demand in the daily rollup (about
+    `density` of the item-days have any). Products get random reorder
+    settings. Returns (organization id, rollup rows)."""
+    from sqlalchemy import select
+    from src.models.inventory import MovementDailyRollup
+
+    org_id, _, warehouse_id = seed_stock_item()
+    warehouse_ids = [warehouse_id]
+    for number in range(2, warehouses + 1):
+        warehouse = Warehouse(organization_id=org_id, name=f'Benchmark {number}', code=f'BENCH{number}')
+        db.session.add(warehouse)
+        db.session.flush()
+        warehouse_ids.append(warehouse.id)
+    products = -(-series // warehouses)
+    db.session.execute(insert(Product), [
+        {'organization_id': org_id, 'sku': f'BENCH-{number}', 'name': f'Benchmark item {number}', 'is_active': True,
+         'cost_price': rng.randint(100, 5000) / 100, 'minimum_stock_level': rng.randint(0, 20),
+         'reorder_point': rng.randint(0, 60), 'reorder_quantity': rng.randint(0, 200)}
+        for number in range(2, products + 1)
+    ])
+    product_ids = db.session.execute(
+        select(Product.id).where(Product.organization_id == org_id).order_by(Product.id)
+    ).scalars().all()
+    keys = [(product_id, warehouse) for product_id in product_ids for warehouse in warehouse_ids][:series]
+    db.session.execute(insert(Inventory), [
+        {'organization_id': org_id, 'product_id': key[0], 'warehouse_id': key[1],
+         'quantity_on_hand': rng.randint(0, 200)}
+        for key in keys[1:]  # seed_stock_item stocked the first one
+    ])
+
+    today = datetime.utcnow().date()
+    rollup_rows = 0
+    rows = []
+    for product_id, warehouse in keys:
+        rate = rng.uniform(0.5, 10)
+        active = min(days, int(days * density * rng.uniform(0.5, 1.5)))
+        for day in rng.sample(range(1, days + 1), active):
+            rows.append({
+                'organization_id': org_id, 'day': today - timedelta(days=day), 'warehouse_id': warehouse,
+                'product_id': product_id, 'movement_type': 'out', 'movement_count': 1,
+                'total_quantity': max(1, round(rng.expovariate(1 / rate))), 'total_value': 0
+            })
+        if len(rows) >= 20000:
+            db.session.execute(insert(MovementDailyRollup), rows)
+            rollup_rows += len(rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(MovementDailyRollup), rows)
+        rollup_rows += len(rows)
+    db.session.commit()
+    return org_id, rollup_rows
+
+def bench_forecast(series=100000, days=90, density=0.2, warehouses=10, workers=4, checked=1000, seed=0):
+    """Forecast reorder levels for `series` inventory rows with `days` of
+    synthetic outbound demand (about `density` of the item-days have any).
+
+    Times the whole job (reading the series, computing, replacing the stored
+    suggestions) in one process and with the computation sharded over
+    `workers` processes, and checks `checked` random rows of both runs
+    against the row-at-a-time computation.
+    """
+    from sqlalchemy import select
+    from src.models.inventory import ReorderSuggestion
+    from src.services import forecasting
+
+    app, path = scratch_app(profile='test', read_split=False)
+    try:
+        with app.app_context():
+            rng = random.Random(seed)
+            org_id, rollup_rows = seed_demand_history(series, days, density, warehouses, rng)
+
+            def stored():
+                return {
+                    (row.product_id, row.warehouse_id): (row.reorder_point, row.reorder_quantity, row.suggested_order_quantity)
+                    for row in db.session.execute(select(
+                        ReorderSuggestion.product_id, ReorderSuggestion.warehouse_id, ReorderSuggestion.reorder_point,
+                        ReorderSuggestion.reorder_quantity, ReorderSuggestion.suggested_order_quantity
+                    ).where(ReorderSuggestion.organization_id == org_id))
+                }
+
+            single = forecasting.run_forecast([org_id], workers=1, history_days=days)
+            single_levels = stored()
+            sharded = forecasting.run_forecast([org_id], workers=workers, history_days=days)
+            sharded_levels = stored()
+            smoothing = forecasting.run_forecast(
+                [org_id], workers=1, history_days=days, method='exponential_smoothing'
+            )
+
+            settings = forecasting.forecast_settings(history_days=days)
+            series_keys, on_hand, matrix = forecasting.load_series(org_id, settings['history_days'])
+            sample = rng.sample(range(len(series_keys)), min(checked, len(series_keys)))
+            rows_matrix = [list(map(float, matrix[row])) for row in sample]
+            expected = forecasting.compute_suggestions_rows(
+                rows_matrix, [settings['lead_time_days']] * len(sample), [on_hand[row] for row in sample], settings
+            )
+            mismatched = 0
+            for position, row in enumerate(sample):
+                levels = (
+                    expected['reorder_point'][position], expected['reorder_quantity'][position],
+                    expected['suggested_order_quantity'][position]
+                )
+                key = series_keys[row]
+                if single_levels.get(key) != levels or sharded_levels.get(key) != levels:
+                    mismatched += 1
+            db.session.remove()
+
+        def timing(result):
+            return {'seconds': result['seconds'], 'compute_seconds': result['compute_seconds']}
+
+        return {
+            'series': single['series'],
+            'days': days,
+            'rollup_rows': rollup_rows,
+            'numpy': columnar.np is not None,
+            'moving_average': timing(single),
+            f'moving_average_{workers}_workers': timing(sharded),
+            'exponential_smoothing': timing(smoothing),
+            'suggested_orders': single['suggested'],
+            'checked_rows': len(sample),
+            'mismatched_rows': mismatched,
+            'matches': mismatched == 0 and single_levels == sharded_levels
+        }
+    finally:
+        remove_scratch_database(path)
+
+def bench_reorder_simulation(series=100000, days=90, density=0.2, warehouses=10, workers=4, candidates=1000,
+                             checked=1000, seed=0):
+    """Simulate `days` of synthetic demand for a catalogue of `series`
+    inventory rows against the current policies and the forecast
+    suggestions with `candidates` products overridden.
+
+    Times the request in one process and with warehouses spread over
+    `workers` processes, and checks `checked` random rows of the vectorized
+    replay against the row-at-a-time one.
+    """
+    from src.services import forecasting, reorder_simulation
+    from src.services.snapshots import take_snapshot
+
+    app, path = scratch_app(profile='test', read_split=False)
+    try:
+        with app.app_context():
+            rng = random.Random(seed)
+            org_id, rollup_rows = seed_demand_history(series, days, density, warehouses, rng)
+            date_to = datetime.utcnow().date()
+            date_from = date_to - timedelta(days=days)
+            # The seeded stock is where the simulated period starts
+            take_snapshot(org_id, now=datetime.combine(date_from, datetime.min.time()))
+            forecasting.run_forecast([org_id], history_days=days)
+
+            product_ids = sorted({
+                product_id for product_id, _ in forecasting.load_series(org_id, days)[0]
+            })
+            params = reorder_simulation.validate_simulation({
+                'date_from': date_from.isoformat(), 'date_to': date_to.isoformat(), 'policy': 'suggested',
+                'products': [
+                    {'product_id': product_id, 'reorder_point': rng.randint(0, 60), 'reorder_quantity': rng.randint(1, 200)}
+                    for product_id in rng.sample(product_ids, min(candidates, len(product_ids)))
+                ]
+            })
+            single = reorder_simulation.run_simulation(org_id, params, workers=1)
+            sharded = reorder_simulation.run_simulation(org_id, params, workers=workers)
+
+            keys, on_hand, demand = forecasting.load_series(org_id, days)
+            sample = rng.sample(range(len(keys)), min(checked, len(keys)))
+            inputs = (
+                [rng.randint(0, 200) for _ in sample], [rng.randint(1, 14) for _ in sample],
+                [rng.randint(0, 60) for _ in sample], [rng.randint(0, 200) for _ in sample],
+                [rng.randint(0, 20) for _ in sample]
+            )
+            sample_demand = demand[sample] if columnar.np is not None else [demand[row] for row in sample]
+            vectorized = reorder_simulation.simulate(sample_demand, *inputs)
+            expected = reorder_simulation.simulate_rows([list(map(float, demand[row])) for row in sample], *inputs)
+            db.session.remove()
+
+        def timing(result):
+            return {'seconds': result['seconds'], 'simulation_seconds': result['simulation_seconds']}
+
+        return {
+            'series': single['items_simulated'],
+            'days': days,
+            'rollup_rows': rollup_rows,
+            'numpy': columnar.np is not None,
+            'one_process': timing(single),
+            f'{workers}_workers': timing(sharded),
+            'baseline': single['baseline'],
+            'candidate': single['candidate'],
+            'candidate_items': len(single['items']),
+            'checked_rows': len(sample),
+            'matches': vectorized == expected and (single['baseline'], single['candidate'], single['items']) == (
+                sharded['baseline'], sharded['candidate'], sharded['items']
+            )
+        }
+    finally:
+        remove_scratch_database(path)
+
+def bench_aggregation(rows=1000000, categories=200, warehouses=20, seed=0):
+    """Time the columnar report aggregation over synthetic inventory rows.
+
+    Builds the columns the inventory-summary and valuation reports load and
+    runs their totals, category and warehouse group sums and top 10.
+    """
+    rng = random.Random(seed)
+    quantity = columnar.numeric_column([rng.randint(0, 500) for _ in range(rows)], integer=True)
+    cost_price = columnar.numeric_column([rng.randint(100, 10000) / 100 for _ in range(rows)])
+    selling_price = columnar.numeric_column([rng.randint(100, 20000) / 100 for _ in range(rows)])
+    category_id = columnar.numeric_column([rng.randint(0, categories) for _ in range(rows)], integer=True)
+    warehouse_id = columnar.numeric_column([rng.randint(1, warehouses) for _ in range(rows)], integer=True)
+
+    started = time.perf_counter()
+    values = {
+        'total_quantity': quantity,
+        'total_cost_value': columnar.multiply(quantity, cost_price),
+        'total_selling_value': columnar.multiply(quantity, selling_price)
+    }
+    columnar.total(values['total_cost_value'])
+    columnar.total(values['total_selling_value'])
+    columnar.group_sums(category_id, values)
+    columnar.group_sums(warehouse_id, values)
+    columnar.top_k(values['total_cost_value'], 10)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'backend': 'numpy' if columnar.np is not None else 'array',
+        'rows': rows,
+        'elapsed_ms': round(elapsed * 1000, 1),
+        'rows_per_second': round(rows / elapsed) if elapsed else None
+    }
+
+def bench_export(movements=200000, products=50, export_format='csv', compress=False, seed=0):
+    """Stream the movement history export and trace its peak memory.
+
+    The legacy figure is for building the same rows as a list of dicts and
+    serializing it as one JSON document, which is what the report endpoints
+    do.
+    """
+    app, path = scratch_app()
+    try:
+        with app.app_context():
+            org_id, product_id, warehouse_id = seed_stock_item()
+            product_ids = [product_id]
+            for number in range(2, products + 1):
+                product = Product(organization_id=org_id, sku=f'BENCH-{number}', name=f'Benchmark item {number}')
+                db.session.add(product)
+                db.session.flush()
+                product_ids.append(product.id)
+
+            rng = random.Random(seed)
+            start = datetime.utcnow() - timedelta(days=365)
+            for offset in range(0, movements, 10000):
+                db.session.execute(insert(InventoryMovement), [
+                    {
+                        'organization_id': org_id,
+                        'product_id': rng.choice(product_ids),
+                        'warehouse_id': warehouse_id,
+                        'movement_type': rng.choice(['in', 'out', 'adjustment']),
+                        'quantity': rng.randint(1, 20),
+                        'unit_cost': rng.randint(100, 5000) / 100,
+                        'notes': 'Benchmark movement',
+                        'movement_date': start + timedelta(seconds=offset + number)
+                    }
+                    for number in range(min(10000, movements - offset))
+                ])
+            db.session.commit()
+            db.session.remove()
+
+            export = build_export('movements', org_id, MultiDict())
+            engine = export_engine()
+            size = [0]
+
+            def streamed():
+                for chunk in export_stream(engine, export, export_format, compress=compress):
+                    size[0] += len(chunk)
+
+            def legacy():
+                with engine.connect() as connection:
+                    rows = [
+                        dict(zip(export.columns, row))
+                        for row in connection.execute(export.statement)
+                    ]
+                json.dumps(rows, default=str)
+
+            elapsed, peak = _measure(streamed)
+            legacy_elapsed, legacy_peak = _measure(legacy)
+
+        return {
+            'movements': movements,
+            'format': export_format + ('.gz' if compress else ''),
+            'bytes': size[0],
+            'elapsed_ms': round(elapsed * 1000, 1),
+            'peak_kib': round(peak, 1),
+            'legacy_elapsed_ms': round(legacy_elapsed * 1000, 1),
+            'legacy_peak_kib': round(legacy_peak, 1)
+        }
+    finally:
+        remove_scratch_database(path)
+
+def bench_product_import(rows=200000, categories=50, chunk_rows=5000, seed=0):
+    """Import a synthetic CSV catalogue twice: once creating every product,
+    then again updating them all. Reports rows per second for each pass.
+
+    The product search index and its triggers are in place, as in the app.
+    """
+    from src.services.search import ensure_product_search_index
+
+    app, path = scratch_app(profile='test', read_split=False)
+    csv_path = None
+    try:
+        with app.app_context():
+            ensure_product_search_index(db.engine)
+            org_id, _, _ = seed_stock_item()
+            db.session.add_all([
+                Category(organization_id=org_id, name=f'Category {number}') for number in range(categories)
+            ])
+            db.session.commit()
+
+            rng = random.Random(seed)
+            fd, csv_path = tempfile.mkstemp(prefix='inventory-bench-', suffix='.csv')
+            with os.fdopen(fd, 'w', newline='') as handle:
+                writer = csv.writer(handle)
+                writer.writerow(['sku', 'name', 'category', 'brand', 'cost_price', 'selling_price',
+                                 'minimum_stock_level', 'reorder_point', 'reorder_quantity'])
+                for number in range(rows):
+                    cost = rng.randint(100, 10000) / 100
+                    writer.writerow([
+                        f'IMPORT-{number}', f'Imported item {number}', f'Category {rng.randrange(categories)}',
+                        'Benchmark', cost, round(cost * 1.4, 2), rng.randint(0, 50), rng.randint(0, 20),
+                        rng.randint(0, 100)
+                    ])
+
+            passes = []
+            for label in ('insert', 'update'):
+                started = time.perf_counter()
+                with open(csv_path, 'rb') as stream:
+                    result = import_products(org_id, read_rows(stream, 'csv'), chunk_rows=chunk_rows)
+                elapsed = time.perf_counter() - started
+                passes.append({
+                    'pass': label,
+                    'inserted': result['inserted'],
+                    'updated': result['updated'],
+                    'failed': result['failed'],
+                    'elapsed_ms': round(elapsed * 1000, 1),
+                    'rows_per_second': round(rows / elapsed) if elapsed else None
+                })
+            db.session.remove()
+
+        return {'rows': rows, 'chunk_rows': chunk_rows, 'passes': passes}
+    finally:
+        if csv_path:
+            os.remove(csv_path)
+        remove_scratch_database(path)
+
+def bench_alert_sweep(alerts=200000, batch_rows=500, seed=0):
+    """Sweep a table of alerts of which about a third are expired and a third
+    read long ago, while one writer keeps recording stock changes.
+
+    Reports the rows removed per second and the writer's latency during the
+    sweep, which shows how long each batch holds the write lock.
+    """
+    from src.models.inventory import Alert
+    from src.services.alert_retention import sweep_alerts
+
+    app, path = scratch_app(profile='test', read_split=False)
+    try:
+        with app.app_context():
+            org_id, product_id, warehouse_id = seed_stock_item(initial_quantity=1000)
+            rng = random.Random(seed)
+            now = datetime.utcnow()
+            rows = []
+            for number in range(alerts):
+                kind = rng.randrange(3)
+                seen = now - timedelta(days=rng.randint(0, 60))
+                rows.append({
+                    'organization_id': org_id, 'alert_type': 'low_stock', 'title': 'Low Stock Alert',
+                    'message': f'Alert {number}', 'severity': 'warning', 'entity_type': 'product',
+                    'entity_id': number, 'status': 'resolved', 'occurrence_count': 1,
+                    'is_read': kind == 1, 'created_at': seen, 'last_seen_at': seen if kind != 2 else now,
+                    'expires_at': now - timedelta(days=1) if kind == 0 else now + timedelta(days=30)
+                })
+                if len(rows) == 10000:
+                    db.session.execute(insert(Alert), rows)
+                    rows = []
+            if rows:
+                db.session.execute(insert(Alert), rows)
+            db.session.commit()
+            db.session.remove()
+
+        done = threading.Event()
+        latencies = []
+
+        def write():
+            with app.app_context():
+                while not done.is_set():
+                    started = time.perf_counter()
+                    apply_stock_change(org_id, product_id, warehouse_id, 'in', 1)
+                    db.session.commit()
+                    latencies.append(time.perf_counter() - started)
+                db.session.remove()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            with app.app_context():
+                result = sweep_alerts([org_id], batch_rows=batch_rows)
+                remaining = db.session.query(func.count(Alert.id)).scalar()
+                db.session.remove()
+        finally:
+            done.set()
+            writer.join()
+
+        return {
+            'alerts': alerts,
+            'batch_rows': batch_rows,
+            'removed': result['rows'],
+            'remaining': remaining,
+            'batches': result['batches'],
+            'elapsed_ms': round(result['seconds'] * 1000, 1),
+            'rows_per_second': round(result['rows'] / result['seconds']) if result['seconds'] else None,
+            'writes_during_sweep': len(latencies),
+            'write_p50_ms': round(_percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+            'write_max_ms': round(max(latencies) * 1000, 2) if latencies else None
+        }
+    finally:
+        remove_scratch_database(path)
+
+def _percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def bench_database(profile=None, readers=8, writers=8, seconds=5.0, database_uri=None, seed=0):
+    """Mixed read/write load against one database configuration.
+
+    Writers record in/out movements (stock change plus ledger row, one
+    commit each); readers list inventory joined to products. With no profile
+    the engine runs with default settings, which is how the app used to be
+    configured. Reports operations, "database is locked" failures and
+    latency percentiles for each side.
+    """
+    app, path = scratch_app(
+        database_uri, engine_options={'connect_args': {'check_same_thread': False}} if not profile else None,
+        profile=profile
+    )
+    try:
+        with app.app_context():
+            org_id, product_id, warehouse_id = seed_stock_item(initial_quantity=1000)
+            journal_mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar() \
+                if db.engine.dialect.name == 'sqlite' else None
+            db.session.remove()
+
+        deadline = time.perf_counter() + seconds
+        lock = threading.Lock()
+        stats = {
+            side: {'operations': 0, 'locked': 0, 'errors': 0, 'latencies': []}
+            for side in ('read', 'write')
+        }
+
+        def run(side, number):
+            rng = random.Random(seed + number)
+            outcome = {'operations': 0, 'locked': 0, 'errors': 0, 'latencies': []}
+            with app.app_context():
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        if side == 'write':
+                            movement_type = rng.choice(['in', 'out'])
+                            quantity = rng.randint(1, 5)
+                            apply_stock_change(org_id, product_id, warehouse_id, movement_type, quantity)
+                            db.session.add(InventoryMovement(
+                                organization_id=org_id,
+                                product_id=product_id,
+                                warehouse_id=warehouse_id,
+                                movement_type=movement_type,
+                                quantity=quantity
+                            ))
+                            db.session.commit()
+                        else:
+                            db.session.query(Inventory, Product).join(Product).filter(
+                                Inventory.organization_id == org_id
+                            ).all()
+                            db.session.query(func.count(InventoryMovement.id)).filter(
+                                InventoryMovement.organization_id == org_id
+                            ).scalar()
+                            db.session.rollback()
+                        outcome['operations'] += 1
+                        outcome['latencies'].append(time.perf_counter() - started)
+                    except InsufficientStock:
+                        db.session.rollback()
+                    except Exception as e:
+                        db.session.rollback()
+                        outcome['locked' if 'locked' in str(e) else 'errors'] += 1
+                db.session.remove()
+            with lock:
+                for key, value in outcome.items():
+                    stats[side][key] += value
+
+        jobs = [('write', number) for number in range(writers)] + \
+            [('read', writers + number) for number in range(readers)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            list(pool.map(lambda job: run(*job), jobs))
+        elapsed = time.perf_counter() - started
+
+        result = {'profile': profile or 'default', 'journal_mode': journal_mode, 'elapsed_seconds': round(elapsed, 2)}
+        for side, values in stats.items():
+            latencies = values.pop('latencies')
+            result[side] = {
+                **values,
+                'per_second': round(values['operations'] / elapsed, 1),
+                'p50_ms': round(_percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+                'p99_ms': round(_percentile(latencies, 0.99) * 1000, 2) if latencies else None
+            }
+        return result
+    finally:
+        remove_scratch_database(path)
+
+def _report_load(database_uri, jwt_secret, split, headers, url, seconds, cpus, ready, results):
+    """One reporter process of bench_read_write_split: pinned to `cpus`,
+    request `url` for `seconds` once every process is ready, then put
+    (completed, errors) on `results`"""
+    os.sched_setaffinity(0, cpus)
+    app, _ = scratch_api(read_split=split, database_uri=database_uri, jwt_secret=jwt_secret)
+    client = app.test_client()
+    ready.wait()
+    deadline = time.perf_counter() + seconds
+    completed = errors = 0
+    while time.perf_counter() < deadline:
+        if client.get(url, headers=headers).status_code == 200:
+            completed += 1
+        else:
+            errors += 1
+    results.put((completed, errors))
+
+def bench_read_write_split(split=True, writers=4, reporters=16, seconds=5.0, history_days=365,
+                           movements_per_day=200, seed=0):
+    """Writer latency with and without concurrent heavy reports.
+
+    Writers post single movements from threads of this process. Reporters
+    request year-long movement analyses and inventory summaries from
+    processes of their own on the same database, as they would from other API
+    workers, so what is measured is contention in the database and its pools
+    rather than for this process's GIL. The writers first run alone, then
+    alongside the reporters; with `split` the reports read through their own
+    engine and pool. Returns writer latency percentiles for both phases, the
+    report throughput and `writer_p99_ratio` (p99 with reports over p99
+    without).
+
+    Writers are pinned to half of the available CPUs and reporters to the
+    other half, as API workers and a reporting replica would be, so the
+    ratio measures the database rather than CPU contention. Raises
+    RuntimeError on a machine with fewer than two CPUs to pin to.
+    """
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+    if len(available) < 2:
+        raise RuntimeError('bench_read_write_split needs at least two CPUs to keep reporters off the writers\' CPUs')
+    writer_cpus = available[:len(available) // 2]
+    reporter_cpus = available[len(available) // 2:]
+
+    app, path = scratch_api(read_split=split)
+    os.sched_setaffinity(0, writer_cpus)
+    try:
+        client = app.test_client()
+        headers, ids = seed_api_organization(client)
+        with app.app_context():
+            organization_id = db.session.query(Product.organization_id).filter_by(id=ids['product_id']).scalar()
+            rng = random.Random(seed)
+            end = datetime.utcnow()
+            for day in range(history_days):
+                db.session.execute(insert(InventoryMovement), [
+                    {
+                        'organization_id': organization_id,
+                        'product_id': ids['product_id'],
+                        'warehouse_id': ids['warehouse_id'],
+                        'movement_type': rng.choice(['in', 'out']),
+                        'quantity': rng.randint(1, 9),
+                        'unit_cost': 2.5,
+                        'movement_date': end - timedelta(days=day, seconds=rng.randint(0, 86399))
+                    }
+                    for _ in range(movements_per_day)
+                ])
+            rebuild_movement_rollups(organization_id)
+            db.session.commit()
+            db.session.remove()
+        year_ago = (end - timedelta(days=history_days)).isoformat()
+        report_urls = [
+            f'/api/reports/movement-analysis?date_from={year_ago}',
+            '/api/reports/inventory-summary'
+        ]
+
+        def phase(with_reports):
+            latencies = []
+            lock = threading.Lock()
+            processes = []
+            context = multiprocessing.get_context('spawn')
+            ready = context.Barrier((reporters if with_reports else 0) + 1)
+            results = context.Queue()
+            if with_reports:
+                processes = [
+                    context.Process(target=_report_load, args=(
+                        f'sqlite:///{path}', app.config['JWT_SECRET_KEY'], split, headers,
+                        report_urls[number % len(report_urls)], seconds, reporter_cpus, ready, results
+                    ))
+                    for number in range(reporters)
+                ]
+                for process in processes:
+                    process.start()
+
+            def writer(number):
+                local = app.test_client()
+                samples = []
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    local.post('/api/inventory/movements', json={
+                        'product_id': ids['product_id'], 'warehouse_id': ids['warehouse_id'],
+                        'movement_type': 'in', 'quantity': 1
+                    }, headers=headers)
+                    samples.append(time.perf_counter() - started)
+                with lock:
+                    latencies.extend(samples)
+
+            ready.wait()
+            deadline = time.perf_counter() + seconds
+            with ThreadPoolExecutor(max_workers=writers) as pool:
+                list(pool.map(writer, range(writers)))
+
+            reports = {'completed': 0, 'errors': 0}
+            for _ in processes:
+                completed, errors = results.get()
+                reports['completed'] += completed
+                reports['errors'] += errors
+            for process in processes:
+                process.join()
+
+            return {
+                'writes': len(latencies),
+                'writer_p50_ms': round(_percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+                'writer_p99_ms': round(_percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+                **({'reports': reports} if with_reports else {})
+            }
+
+        writers_only = phase(False)
+        with_reports = phase(True)
+        baseline, loaded = writers_only['writer_p99_ms'], with_reports['writer_p99_ms']
+        return {
+            'read_split': split,
+            'writers_only': writers_only,
+            'with_reports': with_reports,
+            'writer_p99_ratio': round(loaded / baseline, 2) if baseline and loaded is not None else None,
+            'writer_cpus': writer_cpus,
+            'reporter_cpus': reporter_cpus
+        }
+    finally:
+        os.sched_setaffinity(0, available)
+        remove_scratch_database(path)
@@ -0,0 +1,124 @@
+import os
+import secrets
+import tempfile
+import time
+from datetime import datetime, timedelta
+from flask import Flask
+from src.models.inventory import db, Organization, Product, Warehouse, Inventory
+from src.services.database import database_settings, configure_engines
+
+def scratch_app(database_uri=None, engine_options=None, profile=None, read_split=True):
+    """Create a bare Flask app bound to a scratch database for benchmarks.
+
+    With a `profile` the engines are configured like the application's (see
+    src/services/database.py), with a separate read pool unless `read_split`
+    is False; otherwise `engine_options` are used as given. Returns (app,
+    path); `path` is the temporary file to remove afterwards, or None when an
+    explicit database URI was given.
+    """
+    path = None
+    if not database_uri:
+        fd, path = tempfile.mkstemp(prefix='inventory-bench-', suffix='.db')
+        os.close(fd)
+        database_uri = f'sqlite:///{path}'
+
+    app = Flask('inventory-benchmark')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if profile:
+        settings = database_settings(profile, database_uri, read_uri=database_uri)
+        if not read_split:
+            settings['read'] = None
+        configure_engines(app, db, settings)
+    else:
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options or {'connect_args': {'timeout': 30}}
+        db.init_app(app)
+    with app.app_context():
+        db.create_all(bind_key=None)
+    return app, path
+
+def scratch_api(profile='test', read_split=True, database_uri=None, jwt_secret=None):
+    """A scratch app serving the auth, inventory and reports API for checks and
+    benchmarks: migrated, with JWT revocation checks, a cheap bcrypt cost and
+    the report cache disabled. Pass the `database_uri` and `jwt_secret` of
+    another scratch app to serve its data and accept its tokens. Returns (app,
+    path) like scratch_app()."""
+    from flask_jwt_extended import JWTManager
+    from src.routes.auth import auth_bp
+    from src.routes.inventory import inventory_bp
+    from src.routes.reports import reports_bp
+    from src.services.auth_context import token_revoked
+    from src.services.migrations import apply_migrations
+    from src.services.search import ensure_product_search_index
+
+    app, path = scratch_app(database_uri, profile=profile, read_split=read_split)
+    app.config['JWT_SECRET_KEY'] = jwt_secret or secrets.token_hex(32)
+    app.config['REPORT_CACHE_TTL'] = 0
+    app.config['BCRYPT_ROUNDS'] = 4
+    jwt = JWTManager(app)
+    jwt.token_in_blocklist_loader(lambda jwt_header, jwt_payload: token_revoked(jwt_payload))
+    for blueprint in (auth_bp, inventory_bp, reports_bp):
+        app.register_blueprint(blueprint, url_prefix='/api')
+    with app.app_context():
+        ensure_product_search_index(db.engine)
+        apply_migrations()
+    return app, path
+
+def remove_scratch_database(path):
+    """Delete a scratch SQLite file and its WAL companions"""
+    if path:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+def seed_api_organization(client):
+    """Register an organization through the API and give it a warehouse, a
+    category, three products and a few movements; returns (headers, ids)"""
+    client.post('/api/auth/register', json={
+        'organization_name': 'Plan Check', 'organization_email': 'plans@example.com',
+        'username': 'plans', 'email': 'plans@example.com', 'password': 'plans',
+        'first_name': 'Plan', 'last_name': 'Check'
+    })
+    token = client.post('/api/auth/login', json={'username': 'plans', 'password': 'plans'}).json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    warehouse_id = client.post('/api/warehouses', json={'name': 'Main', 'code': 'MAIN'}, headers=headers).json['warehouse']['id']
+    category_id = client.post('/api/categories', json={'name': 'Widgets'}, headers=headers).json['category']['id']
+    product_ids = [
+        client.post('/api/products', json={
+            'sku': f'W-{number}', 'name': f'Widget {number}', 'category_id': category_id,
+            'cost_price': 2.5, 'selling_price': 4, 'minimum_stock_level': 10
+        }, headers=headers).json['product']['id']
+        for number in range(3)
+    ]
+    client.post('/api/inventory/movements/batch', json={'movements': [
+        {'product_id': product_id, 'warehouse_id': warehouse_id, 'movement_type': movement_type, 'quantity': 3}
+        for product_id in product_ids for movement_type in ('in', 'in', 'out')
+    ]}, headers=headers)
+
+    now = datetime.utcnow()
+    return headers, {
+        'warehouse_id': warehouse_id,
+        'category_id': category_id,
+        'product_id': product_ids[0],
+        'date_from': (now - timedelta(days=40)).isoformat(),
+        'date_to': (now + timedelta(hours=1)).isoformat()
+    }
+
+def seed_stock_item(initial_quantity=0):
+    """Create an organization with one product and warehouse; returns their ids"""
+    organization = Organization(name='Benchmark', slug=f'benchmark-{time.time_ns()}', email='bench@example.com')
+    db.session.add(organization)
+    db.session.flush()
+    product = Product(organization_id=organization.id, sku='BENCH-1', name='Benchmark item')
+    warehouse = Warehouse(organization_id=organization.id, name='Benchmark', code='BENCH')
+    db.session.add_all([product, warehouse])
+    db.session.flush()
+    db.session.add(Inventory(
+        organization_id=organization.id,
+        product_id=product.id,
+        warehouse_id=warehouse.id,
+        quantity_on_hand=initial_quantity
+    ))
+    db.session.commit()
+    return organization.id, product.id, warehouse.id
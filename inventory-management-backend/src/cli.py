@@ -0,0 +1,203 @@
+import json
+import click
+
+def register_commands(app):
+    """Attach the maintenance commands to `flask <command>`"""
+
+    @app.cli.command('rebuild-org-stats')
+    @click.option('--org-id', type=int, default=None, help='Only rebuild this organization')
+    @click.option('--check', is_flag=True, help='Report drift without saving the rebuilt values')
+    def rebuild_org_stats_command(org_id, check):
+        """Recompute dashboard summary rows from the base tables"""
+        from src.models.inventory import db, Organization, OrgStats
+        from src.services.stats import STAT_COLUMNS, rebuild_org_stats
+
+        org_ids = [org_id] if org_id else [row.id for row in db.session.query(Organization.id)]
+        drifted = 0
+        for current_org in org_ids:
+            stored = db.session.get(OrgStats, current_org)
+            before = {name: getattr(stored, name) for name in STAT_COLUMNS} if stored else None
+            rebuilt = rebuild_org_stats(current_org)
+            after = {name: getattr(rebuilt, name) for name in STAT_COLUMNS}
+            if before is not None and before != after:
+                drifted += 1
+                click.echo(f'Organization {current_org}: stored {before}, rebuilt {after}')
+
+        if check:
+            db.session.rollback()
+        else:
+            db.session.commit()
+        click.echo(f'{len(org_ids)} organizations checked, {drifted} drifted')
+        if check and drifted:
+            raise click.ClickException('Summary rows drifted from the base tables')
+
+    @app.cli.command('rebuild-movement-rollups')
+    @click.option('--org-id', type=int, default=None, help='Only rebuild this organization')
+    def rebuild_movement_rollups_command(org_id):
+        """Recompute the daily movement rollup from the ledger"""
+        from src.models.inventory import db
+        from src.services.rollups import rebuild_movement_rollups
+
+        rows = rebuild_movement_rollups(org_id)
+        db.session.commit()
+        click.echo(f'{rows} rollup rows written')
+
+    @app.cli.command('rebuild-low-stock')
+    @click.option('--org-id', type=int, default=None, help='Only rebuild this organization')
+    def rebuild_low_stock_command(org_id):
+        """Recompute the low-stock table from inventory and product thresholds"""
+        from src.models.inventory import db
+        from src.services.low_stock import rebuild_low_stock
+
+        rows = rebuild_low_stock(org_id)
+        db.session.commit()
+        click.echo(f'{rows} low-stock rows written')
+
+    @app.cli.command('revoke-tokens')
+    @click.option('--org-id', type=int, default=None, help='Only revoke tokens of this organization')
+    def revoke_tokens_command(org_id):
+        """Make issued tokens re-check their user, e.g. after editing users outside SQLite"""
+        from src.models.inventory import db
+        from src.services.auth_context import revoke_tokens
+
+        rows = revoke_tokens(org_id)
+        db.session.commit()
+        click.echo(f'{rows} organizations revoked')
+
+    @app.cli.command('rebuild-valuation')
+    @click.option('--org-id', type=int, default=None, help='Only rebuild this organization')
+    @click.option('--method', type=click.Choice(['weighted_average', 'fifo']), default=None,
+                  help="Switch the organizations to this method before rebuilding")
+    @click.option('--check', is_flag=True, help='Compare the stored cost state with the ledger without saving')
+    def rebuild_valuation_command(org_id, method, check):
+        """Rebuild inventory cost layers and valuation from the ledger"""
+        from src.models.inventory import db, Organization
+        from src.services.stats import rebuild_org_stats
+        from src.services.valuation import check_valuation, rebuild_valuation, save_valuation_method
+
+        org_ids = [org_id] if org_id else [row.id for row in db.session.query(Organization.id)]
+        drifted = 0
+        for current_org in org_ids:
+            if check:
+                drift = check_valuation(current_org)
+                drifted += bool(drift)
+                for item in drift[:20]:
+                    click.echo(f'Organization {current_org}: {json.dumps(item)}')
+                continue
+            result = save_valuation_method(current_org, method) if method else rebuild_valuation(current_org)
+            rebuild_org_stats(current_org)
+            db.session.commit()
+            click.echo(f'Organization {current_org}: {json.dumps(result)}')
+
+        if check:
+            click.echo(f'{len(org_ids)} organizations checked, {drifted} drifted')
+            if drifted:
+                raise click.ClickException('Cost state drifted from the ledger')
+
+    @app.cli.command('archive-movements')
+    @click.option('--org-id', type=int, default=None, help='Only archive this organization')
+    @click.option('--horizon-days', type=int, default=None, help='Keep this many days hot (defaults to MOVEMENT_ARCHIVE_HORIZON_DAYS)')
+    def archive_movements_command(org_id, horizon_days):
+        """Move whole months of movements older than the horizon into archive files"""
+        from src.services.movement_archive import archive_movements
+
+        try:
+            result = archive_movements([org_id] if org_id else None, horizon_days=horizon_days)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(json.dumps(result, indent=2))
+
+    @app.cli.command('snapshot-inventory')
+    @click.option('--org-id', type=int, default=None, help='Only snapshot this organization')
+    def snapshot_inventory_command(org_id):
+        """Snapshot current stock levels for point-in-time queries"""
+        from src.services.snapshots import take_snapshots
+
+        click.echo(json.dumps(take_snapshots([org_id] if org_id else None), indent=2))
+
+    @app.cli.command('forecast-reorders')
+    @click.option('--org-id', type=int, default=None, help='Only forecast this organization')
+    @click.option('--method', type=click.Choice(['moving_average', 'exponential_smoothing']), default=None,
+                  help='Forecast method (defaults to FORECAST_METHOD)')
+    @click.option('--workers', type=int, default=None, help='Processes to shard the computation over (defaults to FORECAST_WORKERS)')
+    def forecast_reorders_command(org_id, method, workers):
+        """Forecast demand and refresh the reorder suggestions"""
+        from src.services.forecasting import run_forecast
+
+        try:
+            result = run_forecast([org_id] if org_id else None, workers=workers, method=method)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(json.dumps(result, indent=2))
+
+    @app.cli.command('simulate-reorders')
+    @click.option('--org-id', type=int, required=True, help='Organization to simulate')
+    @click.option('--days', default=90, show_default=True, help='Days of demand to replay, ending yesterday')
+    @click.option('--policy', type=click.Choice(['current', 'suggested']), default='current', show_default=True,
+                  help='Base policy for products without candidate settings')
+    @click.option('--products', 'products_path', type=click.Path(exists=True, dir_okay=False), default=None,
+                  help='JSON list of candidate product policies')
+    @click.option('--workers', type=int, default=None, help='Processes to simulate warehouses in (defaults to SIMULATION_WORKERS)')
+    def simulate_reorders_command(org_id, days, policy, products_path, workers):
+        """Replay past demand against current and candidate reorder policies"""
+        from datetime import datetime, timedelta
+        from src.services.reorder_simulation import run_simulation, validate_simulation
+
+        products = []
+        if products_path:
+            with open(products_path, encoding='utf-8') as handle:
+                products = json.load(handle)
+        date_to = datetime.utcnow().date()
+        try:
+            params = validate_simulation({
+                'date_from': (date_to - timedelta(days=days)).isoformat(), 'date_to': date_to.isoformat(),
+                'policy': policy, 'products': products
+            })
+            result = run_simulation(org_id, params, workers=workers)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(json.dumps(result, indent=2))
+
+    @app.cli.command('import-products')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--org-id', type=int, required=True, help='Organization to import into')
+    @click.option('--format', 'source_format', type=click.Choice(['csv', 'json', 'ndjson']), default=None,
+                  help='File format (defaults to the file extension)')
+    @click.option('--chunk-rows', default=5000, show_default=True, help='Rows per transaction')
+    def import_products_command(path, org_id, source_format, chunk_rows):
+        """Upsert products from a CSV, JSON or NDJSON catalogue file"""
+        import os
+        import time
+        from src.services.product_import import read_rows, import_products
+
+        source_format = source_format or os.path.splitext(path)[1].lstrip('.').lower()
+        if source_format not in ('csv', 'json', 'ndjson'):
+            raise click.ClickException('Cannot tell the file format, pass --format')
+
+        started = time.perf_counter()
+        with open(path, 'rb') as stream:
+            result = import_products(org_id, read_rows(stream, source_format), chunk_rows=chunk_rows)
+        elapsed = time.perf_counter() - started
+        result['rows_per_second'] = round(result['processed'] / elapsed) if elapsed else None
+        click.echo(json.dumps(result, indent=2))
+
+    @app.cli.command('sweep-alerts')
+    @click.option('--org-id', type=int, default=None, help='Only sweep this organization')
+    @click.option('--batch-rows', default=500, show_default=True, help='Alerts removed per transaction')
+    def sweep_alerts_command(org_id, batch_rows):
+        """Delete or archive expired and old read alerts now"""
+        from src.services.alert_retention import sweep_alerts
+
+        result = sweep_alerts([org_id] if org_id else None, batch_rows=batch_rows)
+        click.echo(json.dumps(result, indent=2))
+
+    @app.cli.command('db-migrate')
+    def db_migrate_command():
+        """Apply pending schema migrations"""
+        from src.services.migrations import MIGRATIONS, apply_migrations
+
+        applied = apply_migrations()
+        descriptions = {entry.version: entry.description for entry in MIGRATIONS}
+        for version in applied:
+            click.echo(f'Applied {version}: {descriptions[version]}')
+        click.echo(f'{len(applied)} migrations applied, schema at version {max(descriptions, default=0)}')
@@ -10,12 +10,24 @@ from datetime import timedelta
 
 # Import database and models
 from src.models.inventory import db
+from src.services.database import init_database
+from src.services.migrations import apply_migrations
+from src.services.search import ensure_product_search_index
+from src.services.rollups import ensure_movement_rollups
+from src.services.alert_retention import start_alert_sweeper
+from src.services.movement_archive import start_movement_archiver
+from src.services.snapshots import start_inventory_snapshots
+from src.services.valuation import ensure_stock_valuations
+from src.services.low_stock import ensure_low_stock
+from src.services.forecasting import start_reorder_forecast
+from src.services.auth_context import token_revoked
 
 # Import blueprints
 from src.routes.auth import auth_bp
 from src.routes.inventory import inventory_bp
 from src.routes.reports import reports_bp
 from src.routes.user import user_bp
+from src.cli import register_commands
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 
@@ -25,12 +37,72 @@ app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-stri
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
 app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+# Database configuration (URI, SQLite pragmas and pool come from the DATABASE_PROFILE, see src/services/database.py)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Product search switches from LIKE to the FTS5 index at this catalogue size
+app.config['PRODUCT_SEARCH_FTS_MIN_ROWS'] = int(os.environ.get('PRODUCT_SEARCH_FTS_MIN_ROWS', 5000))
+
+# Rendered reports are cached per organization until the next write or the TTL (0 disables)
+app.config['REPORT_CACHE_TTL'] = int(os.environ.get('REPORT_CACHE_TTL', 60))
+app.config['REPORT_CACHE_MAX_ENTRIES'] = int(os.environ.get('REPORT_CACHE_MAX_ENTRIES', 1024))
+app.config['REPORT_CACHE_MAX_BYTES'] = int(os.environ.get('REPORT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+# Tokens carry the tenant claims; user and organization active flags are re-checked at most this often
+app.config['AUTH_STATUS_TTL'] = int(os.environ.get('AUTH_STATUS_TTL', 30))
+
+# Password hashing cost and the reniced processes that hash and verify passwords.
+# The requesting thread waits for its hash, for at most PASSWORD_HASH_TIMEOUT
+# seconds (queueing included) before the request gets a 503.
+app.config['BCRYPT_ROUNDS'] = int(os.environ.get('BCRYPT_ROUNDS', 12))
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 8))
+app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 2.0))
+app.config['PASSWORD_HASH_NICE'] = int(os.environ.get('PASSWORD_HASH_NICE', 10))
+
+# Bulk product imports run on a background pool; progress is committed every chunk
+app.config['PRODUCT_IMPORT_WORKERS'] = int(os.environ.get('PRODUCT_IMPORT_WORKERS', 2))
+app.config['PRODUCT_IMPORT_CHUNK_ROWS'] = int(os.environ.get('PRODUCT_IMPORT_CHUNK_ROWS', 5000))
+app.config['PRODUCT_IMPORT_SEARCH_REBUILD_BYTES'] = int(os.environ.get('PRODUCT_IMPORT_SEARCH_REBUILD_BYTES', 1024 * 1024))
+
+# Alert retention: default expiry of new alerts, how long read alerts are kept (organizations can
+# override both) and how often the background sweep runs (0 disables it; `flask sweep-alerts` runs it once)
+app.config['ALERT_EXPIRE_AFTER_DAYS'] = int(os.environ.get('ALERT_EXPIRE_AFTER_DAYS', 30)) or None
+app.config['ALERT_READ_RETENTION_DAYS'] = int(os.environ.get('ALERT_READ_RETENTION_DAYS', 14)) or None
+app.config['ALERT_ARCHIVE'] = os.environ.get('ALERT_ARCHIVE', '0') == '1'
+app.config['ALERT_SWEEP_INTERVAL'] = int(os.environ.get('ALERT_SWEEP_INTERVAL', 3600))
+app.config['ALERT_SWEEP_BATCH_ROWS'] = int(os.environ.get('ALERT_SWEEP_BATCH_ROWS', 500))
+
+# Movements older than the horizon are moved, a month at a time, into gzipped files under
+# MOVEMENT_ARCHIVE_DIR (default src/database/movement_archive); history queries read them back
+# when a date range reaches that far. 0 disables the periodic run (`flask archive-movements` runs it once).
+app.config['MOVEMENT_ARCHIVE_DIR'] = os.environ.get('MOVEMENT_ARCHIVE_DIR')
+app.config['MOVEMENT_ARCHIVE_HORIZON_DAYS'] = int(os.environ.get('MOVEMENT_ARCHIVE_HORIZON_DAYS', 365))
+app.config['MOVEMENT_ARCHIVE_INTERVAL'] = int(os.environ.get('MOVEMENT_ARCHIVE_INTERVAL', 86400))
+
+# Stock levels are snapshotted this often (0 disables it; `flask snapshot-inventory` takes one), so
+# GET /api/inventory/as-of replays at most one interval of movements
+app.config['INVENTORY_SNAPSHOT_INTERVAL'] = int(os.environ.get('INVENTORY_SNAPSHOT_INTERVAL', 86400))
+
+# Inventory valuation method for organizations that have not chosen one
+# ('weighted_average' or 'fifo'; PUT /api/inventory/valuation-method switches an organization)
+app.config['VALUATION_METHOD'] = os.environ.get('VALUATION_METHOD', 'weighted_average')
+
+# Reorder suggestions are forecast from the last FORECAST_HISTORY_DAYS of outbound demand this often
+# (0 disables it; `flask forecast-reorders` runs it once). FORECAST_WORKERS > 1 shards the computation
+# over that many processes.
+app.config['FORECAST_METHOD'] = os.environ.get('FORECAST_METHOD', 'moving_average')
+app.config['FORECAST_HISTORY_DAYS'] = int(os.environ.get('FORECAST_HISTORY_DAYS', 90))
+app.config['FORECAST_SERVICE_LEVEL'] = float(os.environ.get('FORECAST_SERVICE_LEVEL', 0.95))
+app.config['FORECAST_LEAD_TIME_DAYS'] = int(os.environ.get('FORECAST_LEAD_TIME_DAYS', 7))
+app.config['FORECAST_INTERVAL'] = int(os.environ.get('FORECAST_INTERVAL', 86400))
+app.config['FORECAST_WORKERS'] = int(os.environ.get('FORECAST_WORKERS', 1))
+
+# Warehouses simulated in parallel by POST /api/reports/reorder-simulation (1 runs them in the request)
+app.config['SIMULATION_WORKERS'] = int(os.environ.get('SIMULATION_WORKERS', 1))
+
 # Initialize extensions
-db.init_app(app)
+init_database(app, db)
 jwt = JWTManager(app)
 CORS(app, origins="*")  # Allow all origins for development
 
@@ -40,9 +112,21 @@ app.register_blueprint(inventory_bp, url_prefix='/api')
 app.register_blueprint(reports_bp, url_prefix='/api')
 app.register_blueprint(user_bp, url_prefix='/api')
 
-# Create database tables
+# Register CLI commands
+register_commands(app)
+
+# Create database tables (on the primary; the read bind shares them)
 with app.app_context():
-    db.create_all()
+    db.create_all(bind_key=None)
+    apply_migrations()
+    ensure_product_search_index(db.engine)
+    ensure_movement_rollups()
+    ensure_stock_valuations()
+    ensure_low_stock()
+start_alert_sweeper(app)
+start_movement_archiver(app)
+start_inventory_snapshots(app)
+start_reorder_forecast(app)
 
 # JWT error handlers
 @jwt.expired_token_loader
@@ -57,6 +141,14 @@ def invalid_token_callback(error):
 def missing_token_callback(error):
     return {'error': 'Authorization token is required'}, 401
 
+@jwt.token_in_blocklist_loader
+def check_token_revoked(jwt_header, jwt_payload):
+    return token_revoked(jwt_payload)
+
+@jwt.revoked_token_loader
+def revoked_token_callback(jwt_header, jwt_payload):
+    return {'error': 'Token has been revoked'}, 401
+
 # Serve frontend files
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
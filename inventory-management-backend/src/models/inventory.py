@@ -1,9 +1,17 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from collections import namedtuple
 import json
-import bcrypt
+from sqlalchemy import text
+from src.services.database import RoutingSession
+from src.services.passwords import hash_password, verify_password, needs_rehash
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# A relation that can be requested with ?expand=<name>. `local` is the attribute
+# on the serialized row, `remote` the matching column on `model`; `many` marks
+# one-to-many collections (e.g. purchase order items).
+Expansion = namedtuple('Expansion', ['local', 'model', 'remote', 'many'], defaults=['id', False])
 
 class Organization(db.Model):
     __tablename__ = 'organizations'
@@ -18,6 +26,7 @@ class Organization(db.Model):
     settings = db.Column(db.Text)  # JSON string
     subscription_plan = db.Column(db.String(50), default='basic')
     is_active = db.Column(db.Boolean, default=True)
+    auth_generation = db.Column(db.Integer, nullable=False, default=0)  # bumped to revoke issued tokens
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -47,6 +56,10 @@ class Organization(db.Model):
 class User(db.Model):
     __tablename__ = 'users'
     
+    __expandable__ = {
+        'organization': Expansion('organization_id', 'Organization')
+    }
+    
     id = db.Column(db.Integer, primary_key=True)
     organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
     username = db.Column(db.String(100), unique=True, nullable=False)
@@ -65,11 +78,15 @@ class User(db.Model):
     
     def set_password(self, password):
         """Hash and set the user's password"""
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
         """Check if the provided password matches the user's password"""
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return verify_password(password, self.password_hash)
+    
+    def password_needs_rehash(self):
+        """Check if the stored hash was made at a different cost than configured"""
+        return needs_rehash(self.password_hash)
     
     def to_dict(self, include_sensitive=False):
         data = {
@@ -95,6 +112,10 @@ class User(db.Model):
 class Warehouse(db.Model):
     __tablename__ = 'warehouses'
     
+    __expandable__ = {
+        'manager': Expansion('manager_id', 'User')
+    }
+    
     id = db.Column(db.Integer, primary_key=True)
     organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
     name = db.Column(db.String(255), nullable=False)
@@ -120,7 +141,6 @@ class Warehouse(db.Model):
             'code': self.code,
             'address': self.address,
             'manager_id': self.manager_id,
-            'manager': self.manager.to_dict() if self.manager else None,
             'capacity_limit': self.capacity_limit,
             'is_active': self.is_active,
             'created_at': self.created_at.isoformat() if self.created_at else None,
@@ -130,6 +150,10 @@ class Warehouse(db.Model):
 class Category(db.Model):
     __tablename__ = 'categories'
     
+    __expandable__ = {
+        'parent': Expansion('parent_id', 'Category')
+    }
+    
     id = db.Column(db.Integer, primary_key=True)
     organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
     name = db.Column(db.String(255), nullable=False)
@@ -144,6 +168,8 @@ class Category(db.Model):
     children = db.relationship('Category', backref=db.backref('parent', remote_side=[id]), lazy=True)
     products = db.relationship('Product', backref='category', lazy=True)
     
+    __table_args__ = (db.Index('ix_categories_org_sort', 'organization_id', 'sort_order', 'name'),)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -160,6 +186,10 @@ class Category(db.Model):
 class Product(db.Model):
     __tablename__ = 'products'
     
+    __expandable__ = {
+        'category': Expansion('category_id', 'Category')
+    }
+    
     id = db.Column(db.Integer, primary_key=True)
     organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
     sku = db.Column(db.String(100), nullable=False)
@@ -186,7 +216,11 @@ class Product(db.Model):
     inventory_items = db.relationship('Inventory', backref='product', lazy=True, cascade='all, delete-orphan')
     movements = db.relationship('InventoryMovement', backref='product', lazy=True)
     
-    __table_args__ = (db.UniqueConstraint('organization_id', 'sku', name='_org_product_sku_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('organization_id', 'sku', name='_org_product_sku_uc'),
+        db.Index('ix_products_org_name', 'organization_id', 'name', 'id'),
+        db.Index('ix_products_org_category', 'organization_id', 'category_id')
+    )
     
     def to_dict(self):
         return {
@@ -196,7 +230,6 @@ class Product(db.Model):
             'name': self.name,
             'description': self.description,
             'category_id': self.category_id,
-            'category': self.category.to_dict() if self.category else None,
             'brand': self.brand,
             'unit_of_measure': self.unit_of_measure,
             'cost_price': float(self.cost_price) if self.cost_price else None,
@@ -217,6 +250,12 @@ class Product(db.Model):
 class Inventory(db.Model):
     __tablename__ = 'inventory'
     
+    __expandable__ = {
+        'product': Expansion('product_id', 'Product'),
+        'warehouse': Expansion('warehouse_id', 'Warehouse')
+    }
+    __computed_fields__ = ('quantity_available',)
+    
     id = db.Column(db.Integer, primary_key=True)
     organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
@@ -228,7 +267,11 @@ class Inventory(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    __table_args__ = (db.UniqueConstraint('organization_id', 'product_id', 'warehouse_id', name='_org_product_warehouse_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('organization_id', 'product_id', 'warehouse_id', name='_org_product_warehouse_uc'),
+        db.Index('ix_inventory_org_warehouse', 'organization_id', 'warehouse_id'),
+        db.Index('ix_inventory_product', 'product_id')
+    )
     
     @property
     def quantity_available(self):
@@ -239,9 +282,7 @@ class Inventory(db.Model):
             'id': self.id,
             'organization_id': self.organization_id,
             'product_id': self.product_id,
-            'product': self.product.to_dict() if self.product else None,
             'warehouse_id': self.warehouse_id,
-            'warehouse': self.warehouse.to_dict() if self.warehouse else None,
             'quantity_on_hand': self.quantity_on_hand,
             'quantity_reserved': self.quantity_reserved,
             'quantity_available': self.quantity_available,
@@ -254,6 +295,12 @@ class Inventory(db.Model):
 class InventoryMovement(db.Model):
     __tablename__ = 'inventory_movements'
     
+    __expandable__ = {
+        'product': Expansion('product_id', 'Product'),
+        'warehouse': Expansion('warehouse_id', 'Warehouse'),
+        'user': Expansion('user_id', 'User')
+    }
+    
     id = db.Column(db.Integer, primary_key=True)
     organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
@@ -272,14 +319,18 @@ class InventoryMovement(db.Model):
     user = db.relationship('User', backref='inventory_movements', lazy=True)
     warehouse = db.relationship('Warehouse', backref='inventory_movements', lazy=True)
     
+    __table_args__ = (
+        db.Index('ix_movements_org_date', 'organization_id', 'movement_date', 'id'),
+        db.Index('ix_movements_org_product_date', 'organization_id', 'product_id', 'movement_date'),
+        db.Index('ix_movements_org_warehouse_date', 'organization_id', 'warehouse_id', 'movement_date')
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
             'organization_id': self.organization_id,
             'product_id': self.product_id,
-            'product': self.product.to_dict() if self.product else None,
             'warehouse_id': self.warehouse_id,
-            'warehouse': self.warehouse.to_dict() if self.warehouse else None,
             'movement_type': self.movement_type,
             'quantity': self.quantity,
             'unit_cost': float(self.unit_cost) if self.unit_cost else None,
@@ -287,7 +338,6 @@ class InventoryMovement(db.Model):
             'reference_id': self.reference_id,
             'notes': self.notes,
             'user_id': self.user_id,
-            'user': self.user.to_dict() if self.user else None,
             'movement_date': self.movement_date.isoformat() if self.movement_date else None,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
@@ -330,6 +380,14 @@ class Supplier(db.Model):
 class PurchaseOrder(db.Model):
     __tablename__ = 'purchase_orders'
     
+    __expandable__ = {
+        'supplier': Expansion('supplier_id', 'Supplier'),
+        'warehouse': Expansion('warehouse_id', 'Warehouse'),
+        'creator': Expansion('created_by', 'User'),
+        'approver': Expansion('approved_by', 'User'),
+        'items': Expansion('id', 'PurchaseOrderItem', remote='purchase_order_id', many=True)
+    }
+    
     id = db.Column(db.Integer, primary_key=True)
     organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
     po_number = db.Column(db.String(100), nullable=False)
@@ -360,27 +418,27 @@ class PurchaseOrder(db.Model):
             'organization_id': self.organization_id,
             'po_number': self.po_number,
             'supplier_id': self.supplier_id,
-            'supplier': self.supplier.to_dict() if self.supplier else None,
             'warehouse_id': self.warehouse_id,
-            'warehouse': self.warehouse.to_dict() if self.warehouse else None,
             'status': self.status,
             'order_date': self.order_date.isoformat() if self.order_date else None,
             'expected_delivery_date': self.expected_delivery_date.isoformat() if self.expected_delivery_date else None,
             'total_amount': float(self.total_amount) if self.total_amount else None,
             'notes': self.notes,
             'created_by': self.created_by,
-            'creator': self.creator.to_dict() if self.creator else None,
             'approved_by': self.approved_by,
-            'approver': self.approver.to_dict() if self.approver else None,
             'approved_at': self.approved_at.isoformat() if self.approved_at else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'items': [item.to_dict() for item in self.items] if self.items else []
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
 class PurchaseOrderItem(db.Model):
     __tablename__ = 'purchase_order_items'
     
+    __expandable__ = {
+        'product': Expansion('product_id', 'Product')
+    }
+    __computed_fields__ = ('total_cost',)
+    
     id = db.Column(db.Integer, primary_key=True)
     purchase_order_id = db.Column(db.Integer, db.ForeignKey('purchase_orders.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
@@ -402,7 +460,6 @@ class PurchaseOrderItem(db.Model):
             'id': self.id,
             'purchase_order_id': self.purchase_order_id,
             'product_id': self.product_id,
-            'product': self.product.to_dict() if self.product else None,
             'quantity_ordered': self.quantity_ordered,
             'quantity_received': self.quantity_received,
             'unit_cost': float(self.unit_cost) if self.unit_cost else None,
@@ -414,6 +471,11 @@ class PurchaseOrderItem(db.Model):
 class Alert(db.Model):
     __tablename__ = 'alerts'
     
+    __expandable__ = {
+        'user': Expansion('user_id', 'User'),
+        'warehouse': Expansion('warehouse_id', 'Warehouse')
+    }
+    
     id = db.Column(db.Integer, primary_key=True)
     organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
     alert_type = db.Column(db.String(50), nullable=False)  # 'low_stock', 'expiry', 'system', etc.
@@ -422,13 +484,34 @@ class Alert(db.Model):
     severity = db.Column(db.String(20), default='info')  # 'info', 'warning', 'error', 'critical'
     entity_type = db.Column(db.String(50))  # 'product', 'warehouse', 'purchase_order', etc.
     entity_id = db.Column(db.Integer)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.id'))
+    status = db.Column(db.String(20), nullable=False, default='open', server_default='open')  # 'open', 'resolved'
+    occurrence_count = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     is_read = db.Column(db.Boolean, default=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_seen_at = db.Column(db.DateTime, default=datetime.utcnow)
+    resolved_at = db.Column(db.DateTime)
     expires_at = db.Column(db.DateTime)
     
     # Relationships
     user = db.relationship('User', backref='alerts', lazy=True)
+    __table_args__ = (
+        db.Index('ix_alerts_org_created', 'organization_id', 'created_at', 'id'),
+        db.Index('ix_alerts_org_read_created', 'organization_id', 'is_read', 'created_at'),
+        db.Index('ix_alerts_org_status_created', 'organization_id', 'status', 'created_at', 'id'),
+        # Retention sweeps: expired alerts, and read alerts by age
+        db.Index('ix_alerts_org_expires', 'organization_id', 'expires_at'),
+        db.Index('ix_alerts_org_read_seen', 'organization_id', 'is_read', 'last_seen_at'),
+        # At most one open alert per dedup key; repeats update it instead
+        db.Index(
+            'ux_alerts_open_key',
+            'organization_id', 'alert_type', 'entity_type', 'entity_id', 'warehouse_id',
+            unique=True,
+            sqlite_where=text("status = 'open'"),
+            postgresql_where=text("status = 'open'")
+        )
+    )
     
     def to_dict(self):
         return {
@@ -440,10 +523,400 @@ class Alert(db.Model):
             'severity': self.severity,
             'entity_type': self.entity_type,
             'entity_id': self.entity_id,
+            'warehouse_id': self.warehouse_id,
+            'status': self.status,
+            'occurrence_count': self.occurrence_count,
             'is_read': self.is_read,
             'user_id': self.user_id,
-            'user': self.user.to_dict() if self.user else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_seen_at': self.last_seen_at.isoformat() if self.last_seen_at else None,
+            'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None,
             'expires_at': self.expires_at.isoformat() if self.expires_at else None
         }
 
+class AlertArchive(db.Model):
+    __tablename__ = 'alerts_archive'
+    
+    # Alerts removed by the retention sweep of organizations whose policy
+    # archives instead of deleting; same columns as alerts plus archived_at
+    id = db.Column(db.Integer, primary_key=True)
+    organization_id = db.Column(db.Integer, nullable=False)
+    alert_type = db.Column(db.String(50), nullable=False)
+    title = db.Column(db.String(255), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    severity = db.Column(db.String(20))
+    entity_type = db.Column(db.String(50))
+    entity_id = db.Column(db.Integer)
+    warehouse_id = db.Column(db.Integer)
+    status = db.Column(db.String(20), nullable=False)
+    occurrence_count = db.Column(db.Integer, nullable=False)
+    is_read = db.Column(db.Boolean)
+    user_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime)
+    last_seen_at = db.Column(db.DateTime)
+    resolved_at = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_alerts_archive_org_created', 'organization_id', 'created_at'),
+    )
+
+class OrgStats(db.Model):
+    __tablename__ = 'org_stats'
+    
+    # Dashboard summary per organization, kept current by the product, warehouse
+    # and movement write paths in the same transaction as the write itself
+    organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), primary_key=True)
+    active_products = db.Column(db.Integer, nullable=False, default=0)
+    active_warehouses = db.Column(db.Integer, nullable=False, default=0)
+    low_stock_items = db.Column(db.Integer, nullable=False, default=0)
+    total_inventory_value = db.Column(db.Numeric(16, 2), nullable=False, default=0)
+    report_generation = db.Column(db.Integer, nullable=False, default=0)  # part of the report cache key
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'organization_id': self.organization_id,
+            'active_products': self.active_products,
+            'active_warehouses': self.active_warehouses,
+            'low_stock_items': self.low_stock_items,
+            'total_inventory_value': float(self.total_inventory_value) if self.total_inventory_value else 0,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class MovementDailyRollup(db.Model):
+    __tablename__ = 'movement_daily_rollup'
+    
+    # Movements aggregated per day, maintained as movements are recorded.
+    # Quantities and values are absolute, as in the movement analysis report.
+    organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.id'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    movement_type = db.Column(db.String(50), primary_key=True)
+    movement_count = db.Column(db.Integer, nullable=False, default=0)
+    total_quantity = db.Column(db.Integer, nullable=False, default=0)
+    total_value = db.Column(db.Numeric(16, 2), nullable=False, default=0)
+    
+    __table_args__ = (
+        # Covers the daily demand series read by forecasting and simulation
+        db.Index(
+            'ix_rollup_org_type_day_item',
+            'organization_id', 'movement_type', 'day', 'product_id', 'warehouse_id', 'total_quantity'
+        ),
+    )
+    
+    def to_dict(self):
+        return {
+            'organization_id': self.organization_id,
+            'day': self.day.isoformat() if self.day else None,
+            'warehouse_id': self.warehouse_id,
+            'product_id': self.product_id,
+            'movement_type': self.movement_type,
+            'movement_count': self.movement_count,
+            'total_quantity': self.total_quantity,
+            'total_value': float(self.total_value) if self.total_value else 0
+        }
+
+class MovementArchive(db.Model):
+    __tablename__ = 'movement_archives'
+    
+    # One month of an organization's movements moved out of inventory_movements
+    # into a gzipped NDJSON file. Months are archived oldest first, so the
+    # archived period of an organization always ends where its hot ledger begins.
+    organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)  # first day of the month
+    next_month = db.Column(db.Date, nullable=False)
+    path = db.Column(db.String(500), nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    bytes = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'organization_id': self.organization_id,
+            'month': self.month.isoformat() if self.month else None,
+            'row_count': self.row_count,
+            'bytes': self.bytes,
+            'archived_at': self.archived_at.isoformat() if self.archived_at else None
+        }
+
+class StockValuation(db.Model):
+    __tablename__ = 'stock_valuations'
+    
+    # Cost state of one inventory row, maintained with each movement. Under
+    # 'weighted_average' unit_cost is the average cost; under 'fifo' the value
+    # is the sum of the open cost_layers and unit_cost the latest receipt
+    # cost. Stock received without a known cost is counted in
+    # uncosted_quantity and valued at the product's cost_price when read.
+    organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.id'), primary_key=True)
+    method = db.Column(db.String(20), nullable=False)  # 'weighted_average', 'fifo'
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    unit_cost = db.Column(db.Numeric(14, 4))
+    total_value = db.Column(db.Numeric(16, 2), nullable=False, default=0)
+    uncosted_quantity = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'organization_id': self.organization_id,
+            'product_id': self.product_id,
+            'warehouse_id': self.warehouse_id,
+            'method': self.method,
+            'quantity': self.quantity,
+            'unit_cost': float(self.unit_cost) if self.unit_cost is not None else None,
+            'total_value': float(self.total_value) if self.total_value else 0,
+            'uncosted_quantity': self.uncosted_quantity
+        }
+
+class CostLayer(db.Model):
+    __tablename__ = 'cost_layers'
+    
+    # A receipt still (partly) in stock under FIFO valuation; issues consume
+    # the oldest layers of their item first
+    id = db.Column(db.Integer, primary_key=True)
+    organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.id'), nullable=False)
+    movement_id = db.Column(db.Integer)  # the receipt; None for layers from upward adjustments
+    quantity_remaining = db.Column(db.Integer, nullable=False)
+    unit_cost = db.Column(db.Numeric(14, 4))  # None when received without a known cost
+    
+    __table_args__ = (
+        db.Index('ix_cost_layers_item', 'organization_id', 'product_id', 'warehouse_id', 'id'),
+    )
+
+class InventorySnapshot(db.Model):
+    __tablename__ = 'inventory_snapshots'
+    
+    # An organization's stock levels at taken_at, so historical stock can be
+    # rebuilt by replaying only the movements recorded after it. The snapshot
+    # includes every movement with an id up to last_movement_id.
+    id = db.Column(db.Integer, primary_key=True)
+    organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
+    taken_at = db.Column(db.DateTime, nullable=False)
+    last_movement_id = db.Column(db.Integer, nullable=False, default=0)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.Index('ix_inventory_snapshots_org_taken', 'organization_id', 'taken_at'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'organization_id': self.organization_id,
+            'taken_at': self.taken_at.isoformat() if self.taken_at else None,
+            'last_movement_id': self.last_movement_id,
+            'row_count': self.row_count
+        }
+
+class InventorySnapshotLine(db.Model):
+    __tablename__ = 'inventory_snapshot_lines'
+    
+    snapshot_id = db.Column(db.Integer, db.ForeignKey('inventory_snapshots.id'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.id'), primary_key=True)
+    quantity_on_hand = db.Column(db.Integer, nullable=False)
+
+class ReorderSuggestion(db.Model):
+    __tablename__ = 'reorder_suggestions'
+
+    # Reorder point and quantity for one inventory row, forecast from its
+    # recent outbound demand. The forecast job replaces an organization's
+    # rows on every run; suggested_order_quantity is what to order now (0
+    # while stock is above the reorder point).
+    __expandable__ = {
+        'product': Expansion('product_id', 'Product'),
+        'warehouse': Expansion('warehouse_id', 'Warehouse')
+    }
+
+    id = db.Column(db.Integer, primary_key=True)
+    organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.id'), nullable=False)
+    method = db.Column(db.String(30), nullable=False)  # 'moving_average', 'exponential_smoothing'
+    daily_demand = db.Column(db.Numeric(12, 4), nullable=False, default=0)
+    demand_std_dev = db.Column(db.Numeric(12, 4), nullable=False, default=0)
+    lead_time_days = db.Column(db.Integer, nullable=False)
+    safety_stock = db.Column(db.Integer, nullable=False, default=0)
+    reorder_point = db.Column(db.Integer, nullable=False, default=0)
+    reorder_quantity = db.Column(db.Integer, nullable=False, default=0)
+    quantity_on_hand = db.Column(db.Integer, nullable=False, default=0)
+    suggested_order_quantity = db.Column(db.Integer, nullable=False, default=0)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('organization_id', 'product_id', 'warehouse_id', name='_org_reorder_item_uc'),
+        db.Index('ix_reorder_suggestions_org_order', 'organization_id', 'suggested_order_quantity', 'id'),
+        db.Index('ix_reorder_suggestions_org_warehouse_order',
+                 'organization_id', 'warehouse_id', 'suggested_order_quantity', 'id')
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'organization_id': self.organization_id,
+            'product_id': self.product_id,
+            'warehouse_id': self.warehouse_id,
+            'method': self.method,
+            'daily_demand': float(self.daily_demand) if self.daily_demand is not None else 0,
+            'demand_std_dev': float(self.demand_std_dev) if self.demand_std_dev is not None else 0,
+            'lead_time_days': self.lead_time_days,
+            'safety_stock': self.safety_stock,
+            'reorder_point': self.reorder_point,
+            'reorder_quantity': self.reorder_quantity,
+            'quantity_on_hand': self.quantity_on_hand,
+            'suggested_order_quantity': self.suggested_order_quantity,
+            'computed_at': self.computed_at.isoformat() if self.computed_at else None
+        }
+
+class LowStockItem(db.Model):
+    __tablename__ = 'low_stock_items'
+
+    # Inventory rows of active products at or below MAX_THRESHOLD_PERCENTAGE
+    # of their minimum level, kept in step with stock and product changes so
+    # low-stock reads are index range scans. stock_ratio is on hand over the
+    # minimum (0 when the minimum is 0); rows at or below ratio 1 are low.
+    inventory_id = db.Column(db.Integer, db.ForeignKey('inventory.id'), primary_key=True)
+    organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.id'), nullable=False)
+    quantity_on_hand = db.Column(db.Integer, nullable=False)
+    minimum_stock_level = db.Column(db.Integer, nullable=False)
+    stock_ratio = db.Column(db.Float, nullable=False)
+    criticality = db.Column(db.String(20), nullable=False)  # 'critical', 'warning'
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_low_stock_items_org_ratio', 'organization_id', 'stock_ratio', 'inventory_id'),
+        db.Index('ix_low_stock_items_org_warehouse_ratio',
+                 'organization_id', 'warehouse_id', 'stock_ratio', 'inventory_id'),
+        db.Index('ix_low_stock_items_org_criticality', 'organization_id', 'criticality', 'stock_ratio')
+    )
+
+class ProductImport(db.Model):
+    __tablename__ = 'product_imports'
+
+    # A bulk catalogue import; counters are committed with each chunk so the
+    # progress can be polled while it runs
+    id = db.Column(db.Integer, primary_key=True)
+    organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    source_format = db.Column(db.String(20), nullable=False)  # 'csv', 'json', 'ndjson'
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'running', 'completed', 'failed'
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    rows_inserted = db.Column(db.Integer, nullable=False, default=0)
+    rows_updated = db.Column(db.Integer, nullable=False, default=0)
+    rows_failed = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Text)  # JSON string, the first row errors
+    message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_product_imports_org_created', 'organization_id', 'created_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'organization_id': self.organization_id,
+            'user_id': self.user_id,
+            'source_format': self.source_format,
+            'status': self.status,
+            'rows_processed': self.rows_processed,
+            'rows_inserted': self.rows_inserted,
+            'rows_updated': self.rows_updated,
+            'rows_failed': self.rows_failed,
+            'errors': json.loads(self.errors) if self.errors else [],
+            'message': self.message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+# Serialization helpers shared by the list endpoints. Rows are flat by default
+# (foreign keys only); relations are added on request and batch-loaded.
+
+def parse_list_arg(value):
+    """Split a comma separated query argument into a list of names"""
+    if not value:
+        return []
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+def _split_expand(expand):
+    """Group dotted expand paths by their first segment"""
+    grouped = {}
+    for path in expand or []:
+        head, _, rest = path.partition('.')
+        nested = grouped.setdefault(head, [])
+        if rest:
+            nested.append(rest)
+    return grouped
+
+def _validate_expand(model, expand):
+    for name, nested in _split_expand(expand).items():
+        expansion = getattr(model, '__expandable__', {}).get(name)
+        if not expansion:
+            raise ValueError(f'Cannot expand {name!r} on {model.__name__}')
+        _validate_expand(globals()[expansion.model], nested)
+
+def serialization_args(args, model):
+    """Read and validate the ?fields= and ?expand= arguments for a list endpoint.
+
+    Raises ValueError for unknown fields or relations.
+    """
+    fields = parse_list_arg(args.get('fields'))
+    expand = parse_list_arg(args.get('expand'))
+
+    allowed = set(model.__table__.columns.keys()) | set(getattr(model, '__computed_fields__', ()))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+    _validate_expand(model, expand)
+
+    return fields or None, expand
+
+def serialize(instances, fields=None, expand=None):
+    """Serialize model instances to dicts with optional projection and expansion.
+
+    Every relation named in `expand` (dotted paths such as `product.category`
+    expand nested relations) is loaded with one IN query for the whole list,
+    so the number of queries does not depend on the number of rows.
+    """
+    instances = list(instances)
+    rows = [instance.to_dict() for instance in instances]
+    if not instances:
+        return rows
+
+    model = type(instances[0])
+    grouped = _split_expand(expand)
+    for name, nested in grouped.items():
+        expansion = model.__expandable__[name]
+        target = globals()[expansion.model]
+        keys = {getattr(instance, expansion.local) for instance in instances} - {None}
+
+        related = {}
+        if keys:
+            remote = getattr(target, expansion.remote)
+            objects = target.query.filter(remote.in_(keys)).all()
+            for obj, data in zip(objects, serialize(objects, expand=nested)):
+                key = getattr(obj, expansion.remote)
+                if expansion.many:
+                    related.setdefault(key, []).append(data)
+                else:
+                    related[key] = data
+
+        empty = [] if expansion.many else None
+        for instance, row in zip(instances, rows):
+            row[name] = related.get(getattr(instance, expansion.local), empty)
+
+    if fields:
+        keep = set(fields) | set(grouped)
+        rows = [{key: value for key, value in row.items() if key in keep} for row in rows]
+    return rows
@@ -2,6 +2,9 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, create_refresh_token
 from datetime import datetime, timedelta
 from src.models.inventory import db, User, Organization
+from src.services.auth_context import token_claims, forget_user_status
+from src.services.passwords import PasswordHasherBusy
+from sqlalchemy.orm import joinedload
 import json
 
 auth_bp = Blueprint('auth', __name__)
@@ -18,12 +21,18 @@ def login():
         username = data.get('username')
         password = data.get('password')
         
-        # Find user by username or email
-        user = User.query.filter(
+        # Find user by username or email (both unique, so indexed), with the
+        # organization in the same query
+        user = User.query.options(joinedload(User.organization)).filter(
             (User.username == username) | (User.email == username)
         ).first()
         
-        if not user or not user.check_password(password):
+        try:
+            valid = user is not None and user.check_password(password)
+        except PasswordHasherBusy:
+            return jsonify({'error': 'Too many logins in progress, please retry'}), 503
+        
+        if not valid:
             return jsonify({'error': 'Invalid credentials'}), 401
         
         if not user.is_active:
@@ -32,25 +41,40 @@ def login():
         if not user.organization.is_active:
             return jsonify({'error': 'Organization is deactivated'}), 401
         
-        # Update last login
+        # Upgrade the hash if the configured cost changed since it was made
+        if user.password_needs_rehash():
+            try:
+                user.set_password(password)
+            except PasswordHasherBusy:
+                pass  # Keep the old hash and try again on the next login
+        
+        # Update last login; the response is built first so the commit does
+        # not force the user and organization to be reloaded
         user.last_login = datetime.utcnow()
+        user_id = user.id
+        claims = token_claims(user)
+        user_data = user.to_dict(include_sensitive=True)
+        organization_data = user.organization.to_dict()
         db.session.commit()
         
-        # Create JWT tokens
+        # Create JWT tokens; the tenant claims let protected routes skip the user lookup
+        forget_user_status(user_id)
         access_token = create_access_token(
-            identity=user.id,
+            identity=str(user_id),
+            additional_claims=claims,
             expires_delta=timedelta(hours=24)
         )
         refresh_token = create_refresh_token(
-            identity=user.id,
+            identity=str(user_id),
+            additional_claims=claims,
             expires_delta=timedelta(days=30)
         )
         
         return jsonify({
             'access_token': access_token,
             'refresh_token': refresh_token,
-            'user': user.to_dict(include_sensitive=True),
-            'organization': user.organization.to_dict()
+            'user': user_data,
+            'organization': organization_data
         }), 200
         
     except Exception as e:
@@ -61,14 +85,17 @@ def login():
 def refresh():
     """JWT token refresh for extended sessions"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        current_user_id = int(get_jwt_identity())
+        user = db.session.get(User, current_user_id)
         
         if not user or not user.is_active:
             return jsonify({'error': 'User not found or inactive'}), 401
         
+        # Re-read role and permissions so the new token carries current claims
+        forget_user_status(user.id)
         new_token = create_access_token(
-            identity=current_user_id,
+            identity=str(user.id),
+            additional_claims=token_claims(user),
             expires_delta=timedelta(hours=24)
         )
         
@@ -144,7 +171,11 @@ def register():
                 'manage_settings': True
             })
         )
-        user.set_password(data['password'])
+        try:
+            user.set_password(data['password'])
+        except PasswordHasherBusy:
+            db.session.rollback()
+            return jsonify({'error': 'Too many requests in progress, please retry'}), 503
         db.session.add(user)
         db.session.commit()
         
@@ -163,8 +194,8 @@ def register():
 def get_current_user():
     """Get current user information"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        current_user_id = int(get_jwt_identity())
+        user = db.session.get(User, current_user_id)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -1,19 +1,39 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from datetime import datetime, date
 from sqlalchemy import and_, or_, func, desc
 from src.models.inventory import (
     db, User, Product, Category, Warehouse, Inventory, 
-    InventoryMovement, Supplier, PurchaseOrder, PurchaseOrderItem, Alert
+    InventoryMovement, Supplier, PurchaseOrder, PurchaseOrderItem, Alert,
+    ProductImport, LowStockItem, serialize, serialization_args
+)
+from src.services.alerts import StockLevel, evaluate_low_stock
+from src.services.alert_retention import retention_policy, save_retention_policy, validate_retention
+from src.services.auth_context import current_identity
+from src.services.low_stock import LOW_STOCK_RATIO, refresh_low_stock
+from src.services.pagination import paginate
+from src.services.movement_archive import paginate_movements
+from src.services.product_import import IMPORT_FORMATS, start_product_import
+from src.services.report_cache import invalidate_reports
+from src.services.search import apply_product_search
+from src.services.snapshots import stock_as_of
+from src.services.valuation import VALUATION_METHODS, valuation_method, save_valuation_method, record_valuation
+from src.services.rollups import record_movement_rollups
+from src.services.stats import bump_org_stats, rebuild_org_stats, stock_change_deltas, product_change_deltas
+from src.services.movements import (
+    apply_movement_batch, apply_stock_change, validate_movement_line,
+    InsufficientStock, ConcurrentStockUpdate, MAX_BATCH_SIZE
 )
 import json
+import os
+import shutil
+import tempfile
 
 inventory_bp = Blueprint('inventory', __name__)
 
 def get_current_user():
-    """Helper function to get current user"""
-    user_id = get_jwt_identity()
-    return User.query.get(user_id)
+    """Helper function to get the current user's id and organization from the token claims"""
+    return current_identity()
 
 def check_organization_access(user, organization_id):
     """Helper function to check if user has access to organization data"""
@@ -29,9 +49,12 @@ def get_products():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
+        try:
+            fields, expand = serialization_args(request.args, Product)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Query parameters
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 20, type=int)
         search = request.args.get('search', '')
         category_id = request.args.get('category_id', type=int)
         is_active = request.args.get('is_active', type=bool)
@@ -42,12 +65,11 @@ def get_products():
         
         # Apply filters
         if search:
-            query = query.filter(
-                or_(
-                    Product.name.contains(search),
-                    Product.sku.contains(search),
-                    Product.description.contains(search)
-                )
+            # Relevance ordering only applies to offset pages; keyset pages
+            # stay ordered by (name, id) so the cursor remains valid
+            query = apply_product_search(
+                query, search, user.organization_id,
+                ranked='cursor' not in request.args
             )
         
         if category_id:
@@ -57,20 +79,26 @@ def get_products():
             query = query.filter_by(is_active=is_active)
         
         if low_stock:
-            # Join with inventory to check stock levels
-            query = query.join(Inventory).filter(
-                Inventory.quantity_on_hand <= Product.minimum_stock_level
-            )
+            # Products with at least one low inventory row
+            query = query.filter(Product.id.in_(
+                db.session.query(LowStockItem.product_id).filter(
+                    LowStockItem.organization_id == user.organization_id,
+                    LowStockItem.stock_ratio <= LOW_STOCK_RATIO
+                )
+            ))
         
-        # Pagination
-        total = query.count()
-        products = query.offset((page - 1) * limit).limit(limit).all()
+        # Pagination (offset by default, keyset on (name, id) with ?cursor=)
+        try:
+            products, page_info = paginate(
+                query, request.args, Product.name, Product.id,
+                count_scope=('products', user.organization_id)
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         return jsonify({
-            'products': [product.to_dict() for product in products],
-            'total': total,
-            'page': page,
-            'pages': (total + limit - 1) // limit
+            'products': serialize(products, fields, expand),
+            **page_info
         }), 200
         
     except Exception as e:
@@ -123,6 +151,8 @@ def create_product():
         )
         
         db.session.add(product)
+        bump_org_stats(user.organization_id, active_products=0 if product.is_active is False else 1)
+        invalidate_reports(user.organization_id)
         db.session.commit()
         
         return jsonify({
@@ -134,6 +164,85 @@ def create_product():
         db.session.rollback()
         return jsonify({'error': 'Failed to create product', 'details': str(e)}), 500
 
+@inventory_bp.route('/products/import', methods=['POST'])
+@jwt_required()
+def import_products():
+    """Start a bulk product import from an uploaded CSV, JSON or NDJSON catalogue"""
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        # Either a multipart upload in 'file' or the raw request body
+        upload = request.files.get('file')
+        stream = upload.stream if upload else request.stream
+        filename = upload.filename if upload else ''
+        
+        source_format = request.args.get('format')
+        if not source_format:
+            extension = os.path.splitext(filename or '')[1].lstrip('.').lower()
+            content_type = (upload.mimetype if upload else request.mimetype) or ''
+            if extension in IMPORT_FORMATS:
+                source_format = extension
+            elif 'ndjson' in content_type:
+                source_format = 'ndjson'
+            elif 'json' in content_type:
+                source_format = 'json'
+            else:
+                source_format = 'csv'
+        if source_format not in IMPORT_FORMATS:
+            return jsonify({'error': f'format must be one of: {", ".join(IMPORT_FORMATS)}'}), 400
+        
+        # Spool the upload to disk so the import can read it in chunks after
+        # this request has returned
+        fd, path = tempfile.mkstemp(prefix='product-import-', suffix=f'.{source_format}')
+        try:
+            with os.fdopen(fd, 'wb') as spool:
+                shutil.copyfileobj(stream, spool, 1024 * 1024)
+            
+            product_import = ProductImport(
+                organization_id=user.organization_id,
+                user_id=user.id,
+                source_format=source_format
+            )
+            db.session.add(product_import)
+            db.session.commit()
+        except Exception:
+            os.remove(path)
+            raise
+        start_product_import(product_import.id, path)
+        
+        return jsonify({
+            'import': product_import.to_dict(),
+            'message': 'Product import started'
+        }), 202
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to start product import', 'details': str(e)}), 500
+
+@inventory_bp.route('/products/imports/<int:import_id>', methods=['GET'])
+@jwt_required()
+def get_product_import(import_id):
+    """Progress and row errors of a bulk product import"""
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        product_import = ProductImport.query.filter_by(
+            id=import_id,
+            organization_id=user.organization_id
+        ).first()
+        
+        if not product_import:
+            return jsonify({'error': 'Import not found'}), 404
+        
+        return jsonify({'import': product_import.to_dict()}), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to get product import', 'details': str(e)}), 500
+
 @inventory_bp.route('/products/<int:product_id>', methods=['PUT'])
 @jwt_required()
 def update_product(product_id):
@@ -161,11 +270,19 @@ def update_product(product_id):
             'dimensions', 'is_active'
         ]
         
+        old_state = (product.is_active, product.cost_price, product.minimum_stock_level)
         for field in updatable_fields:
             if field in data:
                 setattr(product, field, data[field])
         
         product.updated_at = datetime.utcnow()
+        new_state = (product.is_active, product.cost_price, product.minimum_stock_level)
+        bump_org_stats(user.organization_id, **product_change_deltas(
+            user.organization_id, product.id, old_state, new_state
+        ))
+        if (old_state[0], old_state[2]) != (new_state[0], new_state[2]):
+            refresh_low_stock(user.organization_id, product_ids=[product.id])
+        invalidate_reports(user.organization_id)
         db.session.commit()
         
         return jsonify({
@@ -187,6 +304,11 @@ def get_inventory():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
+        try:
+            fields, expand = serialization_args(request.args, Inventory)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Query parameters
         page = request.args.get('page', 1, type=int)
         limit = request.args.get('limit', 50, type=int)
@@ -205,8 +327,8 @@ def get_inventory():
             query = query.filter_by(product_id=product_id)
         
         if low_stock:
-            query = query.join(Product).filter(
-                Inventory.quantity_on_hand <= Product.minimum_stock_level
+            query = query.join(LowStockItem, LowStockItem.inventory_id == Inventory.id).filter(
+                LowStockItem.stock_ratio <= LOW_STOCK_RATIO
             )
         
         # Pagination
@@ -218,15 +340,13 @@ def get_inventory():
             organization_id=user.organization_id
         ).scalar()
         
-        low_stock_count = db.session.query(func.count(Inventory.id)).join(Product).filter(
-            and_(
-                Inventory.organization_id == user.organization_id,
-                Inventory.quantity_on_hand <= Product.minimum_stock_level
-            )
+        low_stock_count = db.session.query(func.count(LowStockItem.inventory_id)).filter(
+            LowStockItem.organization_id == user.organization_id,
+            LowStockItem.stock_ratio <= LOW_STOCK_RATIO
         ).scalar()
         
         return jsonify({
-            'inventory': [item.to_dict() for item in inventory_items],
+            'inventory': serialize(inventory_items, fields, expand),
             'total': total,
             'page': page,
             'pages': (total + limit - 1) // limit,
@@ -239,6 +359,116 @@ def get_inventory():
     except Exception as e:
         return jsonify({'error': 'Failed to retrieve inventory', 'details': str(e)}), 500
 
+@inventory_bp.route('/inventory/as-of', methods=['GET'])
+@jwt_required()
+def get_inventory_as_of():
+    """Stock levels at a point in time, rebuilt from snapshots and the ledger"""
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        ts = request.args.get('ts')
+        if not ts:
+            return jsonify({'error': 'ts is required'}), 400
+        try:
+            as_of = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+        except ValueError:
+            return jsonify({'error': 'Invalid ts format'}), 400
+        
+        page = max(request.args.get('page', 1, type=int), 1)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 1000)
+        warehouse_id = request.args.get('warehouse_id', type=int)
+        product_id = request.args.get('product_id', type=int)
+        
+        levels, snapshot, replayed = stock_as_of(
+            user.organization_id, as_of, product_id=product_id, warehouse_id=warehouse_id
+        )
+        keys = sorted(levels)
+        page_keys = keys[(page - 1) * limit:page * limit]
+        
+        products = {
+            row.id: row for row in db.session.query(Product.id, Product.name, Product.sku).filter(
+                Product.organization_id == user.organization_id,
+                Product.id.in_({key[0] for key in page_keys})
+            )
+        }
+        warehouses = dict(db.session.query(Warehouse.id, Warehouse.name).filter(
+            Warehouse.organization_id == user.organization_id,
+            Warehouse.id.in_({key[1] for key in page_keys})
+        ).all())
+        
+        inventory = []
+        for key in page_keys:
+            product = products.get(key[0])
+            inventory.append({
+                'product_id': key[0],
+                'sku': product.sku if product else None,
+                'product_name': product.name if product else None,
+                'warehouse_id': key[1],
+                'warehouse': warehouses.get(key[1]),
+                'quantity_on_hand': levels[key]
+            })
+        
+        return jsonify({
+            'as_of': as_of.isoformat(),
+            'snapshot': snapshot.to_dict() if snapshot else None,
+            'movements_replayed': replayed,
+            'inventory': inventory,
+            'total': len(keys),
+            'page': page,
+            'pages': (len(keys) + limit - 1) // limit
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to rebuild inventory', 'details': str(e)}), 500
+
+@inventory_bp.route('/inventory/valuation-method', methods=['GET'])
+@jwt_required()
+def get_valuation_method():
+    """Retrieve the organization's inventory valuation method"""
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        return jsonify({'method': valuation_method(user.organization_id), 'methods': list(VALUATION_METHODS)}), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to retrieve valuation method', 'details': str(e)}), 500
+
+@inventory_bp.route('/inventory/valuation-method', methods=['PUT'])
+@jwt_required()
+def update_valuation_method():
+    """Switch the organization's valuation method and revalue its stock (admins only)"""
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        if user.role != 'admin':
+            return jsonify({'error': 'Only administrators can change the valuation method'}), 403
+        
+        data = request.get_json()
+        method = data.get('method') if isinstance(data, dict) else None
+        if method not in VALUATION_METHODS:
+            return jsonify({'error': f'method must be one of: {", ".join(VALUATION_METHODS)}'}), 400
+        
+        # The cost state is rebuilt from the ledger under the new method
+        rebuilt = save_valuation_method(user.organization_id, method)
+        rebuild_org_stats(user.organization_id)
+        invalidate_reports(user.organization_id)
+        db.session.commit()
+        
+        return jsonify({
+            'method': method,
+            'rebuilt': rebuilt,
+            'message': 'Valuation method updated successfully'
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to update valuation method', 'details': str(e)}), 500
+
 @inventory_bp.route('/inventory/movements', methods=['POST'])
 @jwt_required()
 def create_inventory_movement():
@@ -250,16 +480,10 @@ def create_inventory_movement():
         
         data = request.get_json()
         
-        # Validate required fields
-        required_fields = ['product_id', 'warehouse_id', 'movement_type', 'quantity']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'error': f'{field} is required'}), 400
-        
-        # Validate movement type
-        valid_types = ['in', 'out', 'adjustment', 'transfer']
-        if data['movement_type'] not in valid_types:
-            return jsonify({'error': 'Invalid movement type'}), 400
+        # Validate required fields and movement type
+        error = validate_movement_line(data)
+        if error:
+            return jsonify({'error': error}), 400
         
         # Check if product and warehouse belong to user's organization
         product = Product.query.filter_by(
@@ -276,38 +500,18 @@ def create_inventory_movement():
         if not warehouse:
             return jsonify({'error': 'Warehouse not found'}), 404
         
-        # Get or create inventory record
-        inventory = Inventory.query.filter_by(
-            organization_id=user.organization_id,
-            product_id=data['product_id'],
-            warehouse_id=data['warehouse_id']
-        ).first()
-        
-        if not inventory:
-            inventory = Inventory(
-                organization_id=user.organization_id,
-                product_id=data['product_id'],
-                warehouse_id=data['warehouse_id'],
-                quantity_on_hand=0
-            )
-            db.session.add(inventory)
-        
-        # Validate stock for outbound movements
+        # Update the stock level in place; the conditional UPDATE rejects
+        # outbound movements that would oversell
         quantity = data['quantity']
-        if data['movement_type'] in ['out', 'transfer'] and inventory.quantity_on_hand < quantity:
+        try:
+            inventory, previous_quantity = apply_stock_change(
+                user.organization_id, data['product_id'], data['warehouse_id'],
+                data['movement_type'], quantity
+            )
+        except InsufficientStock:
+            db.session.rollback()
             return jsonify({'error': 'Insufficient stock'}), 409
         
-        # Update inventory quantity
-        if data['movement_type'] == 'in':
-            inventory.quantity_on_hand += quantity
-        elif data['movement_type'] == 'out':
-            inventory.quantity_on_hand -= quantity
-        elif data['movement_type'] == 'adjustment':
-            inventory.quantity_on_hand = quantity  # Set to absolute value for adjustments
-        
-        inventory.last_movement_at = datetime.utcnow()
-        inventory.updated_at = datetime.utcnow()
-        
         # Create movement record
         movement = InventoryMovement(
             organization_id=user.organization_id,
@@ -319,26 +523,42 @@ def create_inventory_movement():
             reference_type=data.get('reference_type'),
             reference_id=data.get('reference_id'),
             notes=data.get('notes'),
-            user_id=user.id
+            user_id=user.id,
+            movement_date=datetime.utcnow()
         )
         
         db.session.add(movement)
+        db.session.flush()
+        record_movement_rollups([{
+            'organization_id': movement.organization_id,
+            'product_id': movement.product_id,
+            'warehouse_id': movement.warehouse_id,
+            'movement_type': movement.movement_type,
+            'quantity': movement.quantity,
+            'unit_cost': movement.unit_cost,
+            'movement_date': movement.movement_date
+        }])
+        value_change = record_valuation(user.organization_id, [{
+            'product_id': movement.product_id,
+            'warehouse_id': movement.warehouse_id,
+            'movement_type': movement.movement_type,
+            'quantity': movement.quantity,
+            'unit_cost': movement.unit_cost,
+            'movement_id': movement.id
+        }])[(movement.product_id, movement.warehouse_id)]
+        bump_org_stats(user.organization_id, **stock_change_deltas(
+            product, previous_quantity, inventory.quantity_on_hand, value_change
+        ))
+        refresh_low_stock(user.organization_id, items=[(movement.product_id, movement.warehouse_id)])
+        
+        # Raise, refresh or resolve the low stock alert with the movement
+        evaluate_low_stock(user.organization_id, [StockLevel(
+            product, warehouse.id, warehouse.name, previous_quantity, inventory.quantity_on_hand
+        )])
+        
+        invalidate_reports(user.organization_id)
         db.session.commit()
         
-        # Check for low stock alerts
-        if inventory.quantity_on_hand <= product.minimum_stock_level:
-            alert = Alert(
-                organization_id=user.organization_id,
-                alert_type='low_stock',
-                title=f'Low Stock Alert: {product.name}',
-                message=f'Product {product.name} (SKU: {product.sku}) is running low in {warehouse.name}. Current stock: {inventory.quantity_on_hand}, Minimum level: {product.minimum_stock_level}',
-                severity='warning',
-                entity_type='product',
-                entity_id=product.id
-            )
-            db.session.add(alert)
-            db.session.commit()
-        
         return jsonify({
             'movement': movement.to_dict(),
             'updated_inventory': inventory.to_dict(),
@@ -349,6 +569,55 @@ def create_inventory_movement():
         db.session.rollback()
         return jsonify({'error': 'Failed to record movement', 'details': str(e)}), 500
 
+@inventory_bp.route('/inventory/movements/batch', methods=['POST'])
+@jwt_required()
+def create_inventory_movement_batch():
+    """Record many inventory movements in one transaction"""
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        data = request.get_json()
+        
+        movements = data.get('movements') if isinstance(data, dict) else None
+        if not isinstance(movements, list) or not movements:
+            return jsonify({'error': 'movements must be a non-empty list'}), 400
+        if len(movements) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'A batch may contain at most {MAX_BATCH_SIZE} movements'}), 400
+        
+        # 'atomic' rejects the whole batch if any line fails, 'best_effort' skips failed lines
+        mode = data.get('mode', 'atomic')
+        if mode not in ['atomic', 'best_effort']:
+            return jsonify({'error': 'Invalid mode'}), 400
+        
+        try:
+            results, summary, committed = apply_movement_batch(
+                user.organization_id, user.id, movements, atomic=(mode == 'atomic')
+            )
+        except ConcurrentStockUpdate:
+            return jsonify({'error': 'Stock changed while the batch was applied, please retry'}), 409
+        
+        # Nothing recorded (an atomic batch with a failed line, or a best-effort
+        # batch whose lines all failed): 409 if only stock was short, else 400
+        if not committed:
+            errors = {result['error'] for result in results if result['status'] == 'failed'}
+            return jsonify({
+                'error': 'Batch rejected',
+                'summary': summary,
+                'results': results
+            }), 409 if errors == {'Insufficient stock'} else 400
+        
+        return jsonify({
+            'summary': summary,
+            'results': results,
+            'message': 'Inventory movements recorded successfully'
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to record movements', 'details': str(e)}), 500
+
 @inventory_bp.route('/inventory/movements', methods=['GET'])
 @jwt_required()
 def get_inventory_movements():
@@ -358,9 +627,12 @@ def get_inventory_movements():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
+        try:
+            fields, expand = serialization_args(request.args, InventoryMovement)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Query parameters
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 50, type=int)
         product_id = request.args.get('product_id', type=int)
         warehouse_id = request.args.get('warehouse_id', type=int)
         movement_type = request.args.get('movement_type')
@@ -380,6 +652,7 @@ def get_inventory_movements():
         if movement_type:
             query = query.filter_by(movement_type=movement_type)
         
+        date_from_obj = date_to_obj = None
         if date_from:
             try:
                 date_from_obj = datetime.fromisoformat(date_from.replace('Z', '+00:00'))
@@ -394,18 +667,25 @@ def get_inventory_movements():
             except ValueError:
                 return jsonify({'error': 'Invalid date_to format'}), 400
         
-        # Order by most recent first
-        query = query.order_by(desc(InventoryMovement.movement_date))
-        
-        # Pagination
-        total = query.count()
-        movements = query.offset((page - 1) * limit).limit(limit).all()
+        # Most recent first; keyset pagination seeks on (movement_date, id). Ranges
+        # reaching before the hot ledger continue into the archived months.
+        try:
+            movements, page_info = paginate_movements(
+                query, request.args, user.organization_id, {
+                    'date_from': date_from_obj,
+                    'date_to': date_to_obj,
+                    'product_id': product_id,
+                    'warehouse_id': warehouse_id,
+                    'movement_type': movement_type
+                },
+                count_scope=('movements', user.organization_id)
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         return jsonify({
-            'movements': [movement.to_dict() for movement in movements],
-            'total': total,
-            'page': page,
-            'pages': (total + limit - 1) // limit
+            'movements': serialize(movements, fields, expand),
+            **page_info
         }), 200
         
     except Exception as e:
@@ -421,13 +701,18 @@ def get_warehouses():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
+        try:
+            fields, expand = serialization_args(request.args, Warehouse)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         warehouses = Warehouse.query.filter_by(
             organization_id=user.organization_id,
             is_active=True
         ).all()
         
         return jsonify({
-            'warehouses': [warehouse.to_dict() for warehouse in warehouses]
+            'warehouses': serialize(warehouses, fields, expand)
         }), 200
         
     except Exception as e:
@@ -469,6 +754,8 @@ def create_warehouse():
         )
         
         db.session.add(warehouse)
+        bump_org_stats(user.organization_id, active_warehouses=1)
+        invalidate_reports(user.organization_id)
         db.session.commit()
         
         return jsonify({
@@ -490,13 +777,18 @@ def get_categories():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
+        try:
+            fields, expand = serialization_args(request.args, Category)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         categories = Category.query.filter_by(
             organization_id=user.organization_id,
             is_active=True
         ).order_by(Category.sort_order, Category.name).all()
         
         return jsonify({
-            'categories': [category.to_dict() for category in categories]
+            'categories': serialize(categories, fields, expand)
         }), 200
         
     except Exception as e:
@@ -548,33 +840,80 @@ def get_alerts():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
+        try:
+            fields, expand = serialization_args(request.args, Alert)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Query parameters
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 20, type=int)
         unread_only = request.args.get('unread_only', type=bool)
+        status = request.args.get('status')  # 'open' or 'resolved'
         
         # Base query
         query = Alert.query.filter_by(organization_id=user.organization_id)
         
         if unread_only:
             query = query.filter_by(is_read=False)
+        if status:
+            query = query.filter_by(status=status)
+        
+        # Most recent first; keyset pagination seeks on (created_at, id)
+        try:
+            alerts, page_info = paginate(
+                query, request.args, Alert.created_at, Alert.id,
+                descending=True, count_scope=('alerts', user.organization_id)
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Order by most recent first
-        query = query.order_by(desc(Alert.created_at))
+        return jsonify({
+            'alerts': serialize(alerts, fields, expand),
+            **page_info
+        }), 200
         
-        # Pagination
-        total = query.count()
-        alerts = query.offset((page - 1) * limit).limit(limit).all()
+    except Exception as e:
+        return jsonify({'error': 'Failed to retrieve alerts', 'details': str(e)}), 500
+
+@inventory_bp.route('/alerts/retention', methods=['GET'])
+@jwt_required()
+def get_alert_retention():
+    """Retrieve the organization's alert retention policy"""
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        return jsonify({'retention': retention_policy(user.organization_id)}), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to retrieve alert retention', 'details': str(e)}), 500
+
+@inventory_bp.route('/alerts/retention', methods=['PUT'])
+@jwt_required()
+def update_alert_retention():
+    """Update the organization's alert retention policy (admins only)"""
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        if user.role != 'admin':
+            return jsonify({'error': 'Only administrators can change alert retention'}), 403
+        
+        changes, error = validate_retention(request.get_json())
+        if error:
+            return jsonify({'error': error}), 400
+        
+        policy = save_retention_policy(user.organization_id, changes)
+        db.session.commit()
         
         return jsonify({
-            'alerts': [alert.to_dict() for alert in alerts],
-            'total': total,
-            'page': page,
-            'pages': (total + limit - 1) // limit
+            'retention': policy,
+            'message': 'Alert retention updated successfully'
         }), 200
         
     except Exception as e:
-        return jsonify({'error': 'Failed to retrieve alerts', 'details': str(e)}), 500
+        db.session.rollback()
+        return jsonify({'error': 'Failed to update alert retention', 'details': str(e)}), 500
 
 @inventory_bp.route('/alerts/<int:alert_id>/read', methods=['PUT'])
 @jwt_required()
@@ -1,21 +1,37 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, Response, request, jsonify
+from flask_jwt_extended import jwt_required
 from datetime import datetime, timedelta
-from sqlalchemy import and_, or_, func, desc, text
+from sqlalchemy import and_, or_, func, desc, text, cast, Float
 from src.models.inventory import (
     db, User, Product, Category, Warehouse, Inventory, 
-    InventoryMovement, Supplier, PurchaseOrder
+    InventoryMovement, Supplier, PurchaseOrder, ReorderSuggestion, LowStockItem, serialize, serialization_args
 )
+from src.services.analysis import movement_analysis
+from src.services.auth_context import current_identity
+from src.services.columnar import load_columns, multiply, total, group_sums, top_k
+from src.services.exports import EXPORT_FORMATS, EXPORTS, build_export, export_engine, export_stream
+from src.services.low_stock import ratio_limit
+from src.services.pagination import paginate
+from src.services.reorder_simulation import run_simulation, validate_simulation
+from src.services.report_cache import cached_report, report_cache
+from src.services.rollups import movement_trends, TREND_BUCKETS
+from src.services.stats import get_org_stats
+from src.services.valuation import inventory_cost_value, join_valuation, valuation_method
 
 reports_bp = Blueprint('reports', __name__)
 
 def get_current_user():
-    """Helper function to get current user"""
-    user_id = get_jwt_identity()
-    return User.query.get(user_id)
+    """Helper function to get the current user's id and organization from the token claims"""
+    return current_identity()
+
+def current_organization_id():
+    """Organization of the current user, or None if the user is gone"""
+    user = get_current_user()
+    return user.organization_id if user else None
 
 @reports_bp.route('/reports/dashboard', methods=['GET'])
 @jwt_required()
+@cached_report(current_organization_id)
 def get_dashboard_stats():
     """Get dashboard statistics and overview"""
     try:
@@ -23,39 +39,20 @@ def get_dashboard_stats():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        org_id = user.organization_id
-        
-        # Total products
-        total_products = db.session.query(func.count(Product.id)).filter_by(
-            organization_id=org_id, is_active=True
-        ).scalar()
-        
-        # Total warehouses
-        total_warehouses = db.session.query(func.count(Warehouse.id)).filter_by(
-            organization_id=org_id, is_active=True
-        ).scalar()
-        
-        # Low stock items
-        low_stock_items = db.session.query(func.count(Inventory.id)).join(Product).filter(
-            and_(
-                Inventory.organization_id == org_id,
-                Inventory.quantity_on_hand <= Product.minimum_stock_level,
-                Product.is_active == True
-            )
-        ).scalar()
+        try:
+            fields, expand = serialization_args(request.args, InventoryMovement)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Total inventory value (using cost price)
-        inventory_value_result = db.session.query(
-            func.sum(Inventory.quantity_on_hand * Product.cost_price)
-        ).join(Product).filter(
-            and_(
-                Inventory.organization_id == org_id,
-                Product.cost_price.isnot(None),
-                Product.is_active == True
-            )
-        ).scalar()
+        org_id = user.organization_id
         
-        total_inventory_value = float(inventory_value_result) if inventory_value_result else 0
+        # Product, warehouse, low stock and value totals (at the cost layers) come
+        # from the summary row maintained by the write paths
+        stats = get_org_stats(org_id)
+        total_products = stats.active_products
+        total_warehouses = stats.active_warehouses
+        low_stock_items = stats.low_stock_items
+        total_inventory_value = float(stats.total_inventory_value) if stats.total_inventory_value else 0
         
         # Recent movements (last 7 days)
         seven_days_ago = datetime.utcnow() - timedelta(days=7)
@@ -85,21 +82,9 @@ def get_dashboard_stats():
             organization_id=org_id
         ).order_by(desc(InventoryMovement.movement_date)).limit(10).all()
         
-        # Movement trends (last 30 days)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        movement_trends = db.session.query(
-            func.date(InventoryMovement.movement_date).label('date'),
-            InventoryMovement.movement_type,
-            func.count(InventoryMovement.id).label('count')
-        ).filter(
-            and_(
-                InventoryMovement.organization_id == org_id,
-                InventoryMovement.movement_date >= thirty_days_ago
-            )
-        ).group_by(
-            func.date(InventoryMovement.movement_date),
-            InventoryMovement.movement_type
-        ).order_by('date').all()
+        # Movement trends (last 30 days), served from the daily rollup
+        now = datetime.utcnow()
+        trends = movement_trends(org_id, now - timedelta(days=30), now)
         
         return jsonify({
             'summary': {
@@ -117,14 +102,14 @@ def get_dashboard_stats():
                 }
                 for product in top_products
             ],
-            'recent_activity': [movement.to_dict() for movement in recent_activity],
+            'recent_activity': serialize(recent_activity, fields, expand),
             'movement_trends': [
                 {
-                    'date': trend.date.isoformat() if trend.date else None,
-                    'movement_type': trend.movement_type,
-                    'count': trend.count
+                    'date': trend['date'],
+                    'movement_type': trend['movement_type'],
+                    'count': trend['count']
                 }
-                for trend in movement_trends
+                for trend in trends
             ]
         }), 200
         
@@ -133,6 +118,7 @@ def get_dashboard_stats():
 
 @reports_bp.route('/reports/inventory-summary', methods=['GET'])
 @jwt_required()
+@cached_report(current_organization_id)
 def get_inventory_summary():
     """Generate comprehensive inventory summary report"""
     try:
@@ -144,20 +130,22 @@ def get_inventory_summary():
         warehouse_id = request.args.get('warehouse_id', type=int)
         category_id = request.args.get('category_id', type=int)
         
-        # Base query for inventory summary
-        query = db.session.query(
+        # Base query for inventory summary; prices are read as floats and the
+        # group keys as integers so the rows can be aggregated column-wise.
+        # Cost value comes from the valuation engine, like /reports/valuation.
+        query = join_valuation(db.session.query(
             Product.name.label('product_name'),
             Product.sku,
+            func.coalesce(Product.category_id, 0).label('category_id'),
             Category.name.label('category_name'),
+            Inventory.warehouse_id,
             Warehouse.name.label('warehouse_name'),
             Inventory.quantity_on_hand,
             Inventory.quantity_reserved,
-            (Inventory.quantity_on_hand - Inventory.quantity_reserved).label('quantity_available'),
-            Product.cost_price,
-            Product.selling_price,
-            (Inventory.quantity_on_hand * Product.cost_price).label('total_cost_value'),
-            (Inventory.quantity_on_hand * Product.selling_price).label('total_selling_value')
-        ).select_from(Inventory).join(Product).join(Warehouse).outerjoin(Category).filter(
+            cast(Product.cost_price, Float).label('cost_price'),
+            cast(Product.selling_price, Float).label('selling_price'),
+            cast(inventory_cost_value(func.coalesce(Product.cost_price, 0)), Float).label('cost_value')
+        ).select_from(Inventory).join(Product).join(Warehouse).outerjoin(Category)).filter(
             Inventory.organization_id == org_id
         )
         
@@ -168,91 +156,68 @@ def get_inventory_summary():
         if category_id:
             query = query.filter(Product.category_id == category_id)
         
-        inventory_data = query.all()
+        columns = load_columns(
+            query.statement,
+            numeric=('cost_price', 'selling_price', 'cost_value'),
+            integer=('category_id', 'warehouse_id', 'quantity_on_hand', 'quantity_reserved')
+        )
+        quantity = columns['quantity_on_hand']
+        values = {
+            'total_quantity': quantity,
+            'total_cost_value': columns['cost_value'],
+            'total_selling_value': multiply(quantity, columns['selling_price'])
+        }
         
         # Calculate totals
-        total_cost_value = sum(
-            float(item.total_cost_value) if item.total_cost_value else 0 
-            for item in inventory_data
-        )
-        total_selling_value = sum(
-            float(item.total_selling_value) if item.total_selling_value else 0 
-            for item in inventory_data
-        )
-        total_items = len(inventory_data)
-        total_quantity = sum(item.quantity_on_hand for item in inventory_data)
-        
-        # Group by category
-        by_category = {}
-        for item in inventory_data:
-            category = item.category_name or 'Uncategorized'
-            if category not in by_category:
-                by_category[category] = {
-                    'items': 0,
-                    'total_quantity': 0,
-                    'total_cost_value': 0,
-                    'total_selling_value': 0
-                }
-            
-            by_category[category]['items'] += 1
-            by_category[category]['total_quantity'] += item.quantity_on_hand
-            by_category[category]['total_cost_value'] += float(item.total_cost_value) if item.total_cost_value else 0
-            by_category[category]['total_selling_value'] += float(item.total_selling_value) if item.total_selling_value else 0
-        
-        # Group by warehouse
-        by_warehouse = {}
-        for item in inventory_data:
-            warehouse = item.warehouse_name
-            if warehouse not in by_warehouse:
-                by_warehouse[warehouse] = {
-                    'items': 0,
-                    'total_quantity': 0,
-                    'total_cost_value': 0,
-                    'total_selling_value': 0
+        total_cost_value = total(values['total_cost_value'])
+        total_selling_value = total(values['total_selling_value'])
+        
+        # Group by category and warehouse, in order of first appearance
+        def grouped(keys, label_column, label_name):
+            groups = sorted(group_sums(keys, values).values(), key=lambda group: group['first'])
+            return [
+                {
+                    label_name: columns[label_column][group['first']] or 'Uncategorized',
+                    'items': group['items'],
+                    'total_quantity': int(group['total_quantity']),
+                    'total_cost_value': group['total_cost_value'],
+                    'total_selling_value': group['total_selling_value']
                 }
-            
-            by_warehouse[warehouse]['items'] += 1
-            by_warehouse[warehouse]['total_quantity'] += item.quantity_on_hand
-            by_warehouse[warehouse]['total_cost_value'] += float(item.total_cost_value) if item.total_cost_value else 0
-            by_warehouse[warehouse]['total_selling_value'] += float(item.total_selling_value) if item.total_selling_value else 0
+                for group in groups
+            ]
         
         return jsonify({
             'summary': {
-                'total_items': total_items,
-                'total_quantity': total_quantity,
+                'total_items': len(columns),
+                'total_quantity': int(total(quantity)),
                 'total_cost_value': total_cost_value,
                 'total_selling_value': total_selling_value,
                 'potential_profit': total_selling_value - total_cost_value
             },
-            'by_category': [
-                {
-                    'category': category,
-                    **stats
-                }
-                for category, stats in by_category.items()
-            ],
-            'by_warehouse': [
-                {
-                    'warehouse': warehouse,
-                    **stats
-                }
-                for warehouse, stats in by_warehouse.items()
-            ],
+            'by_category': grouped(columns['category_id'], 'category_name', 'category'),
+            'by_warehouse': grouped(columns['warehouse_id'], 'warehouse_name', 'warehouse'),
             'detailed_items': [
                 {
-                    'product_name': item.product_name,
-                    'sku': item.sku,
-                    'category': item.category_name or 'Uncategorized',
-                    'warehouse': item.warehouse_name,
-                    'quantity_on_hand': item.quantity_on_hand,
-                    'quantity_reserved': item.quantity_reserved,
-                    'quantity_available': item.quantity_available,
-                    'cost_price': float(item.cost_price) if item.cost_price else None,
-                    'selling_price': float(item.selling_price) if item.selling_price else None,
-                    'total_cost_value': float(item.total_cost_value) if item.total_cost_value else 0,
-                    'total_selling_value': float(item.total_selling_value) if item.total_selling_value else 0
+                    'product_name': product_name,
+                    'sku': sku,
+                    'category': category_name or 'Uncategorized',
+                    'warehouse': warehouse_name,
+                    'quantity_on_hand': on_hand,
+                    'quantity_reserved': reserved,
+                    'quantity_available': on_hand - reserved,
+                    'cost_price': cost_price or None,
+                    'selling_price': selling_price or None,
+                    'total_cost_value': cost_value,
+                    'total_selling_value': selling_value
                 }
-                for item in inventory_data
+                for product_name, sku, category_name, warehouse_name, on_hand, reserved,
+                    cost_price, selling_price, cost_value, selling_value in zip(
+                    columns['product_name'], columns['sku'], columns['category_name'],
+                    columns['warehouse_name'], columns.tolist('quantity_on_hand'),
+                    columns.tolist('quantity_reserved'), columns.tolist('cost_price'),
+                    columns.tolist('selling_price'), values['total_cost_value'].tolist(),
+                    values['total_selling_value'].tolist()
+                )
             ]
         }), 200
         
@@ -261,6 +226,7 @@ def get_inventory_summary():
 
 @reports_bp.route('/reports/low-stock', methods=['GET'])
 @jwt_required()
+@cached_report(current_organization_id)
 def get_low_stock_report():
     """Generate low stock alert report"""
     try:
@@ -270,54 +236,55 @@ def get_low_stock_report():
         
         org_id = user.organization_id
         warehouse_id = request.args.get('warehouse_id', type=int)
-        threshold_percentage = request.args.get('threshold_percentage', 100, type=int)
+        try:
+            max_ratio = ratio_limit(request.args.get('threshold_percentage', 100, type=int))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Rows come from the maintained low-stock table, already rated, so the
+        # page and the counts are range scans on (organization, stock_ratio)
+        scope = [LowStockItem.organization_id == org_id, LowStockItem.stock_ratio <= max_ratio]
+        if warehouse_id:
+            scope.append(LowStockItem.warehouse_id == warehouse_id)
+        
+        counts = dict(db.session.query(
+            LowStockItem.criticality, func.count(LowStockItem.inventory_id)
+        ).filter(*scope).group_by(LowStockItem.criticality).all())
         
-        # Query for low stock items
         query = db.session.query(
+            LowStockItem.inventory_id,
+            LowStockItem.stock_ratio,
+            LowStockItem.criticality,
+            LowStockItem.quantity_on_hand,
+            LowStockItem.minimum_stock_level,
+            (LowStockItem.quantity_on_hand - Inventory.quantity_reserved).label('quantity_available'),
             Product.name.label('product_name'),
             Product.sku,
-            Product.minimum_stock_level,
             Product.reorder_point,
             Product.reorder_quantity,
             Warehouse.name.label('warehouse_name'),
-            Inventory.quantity_on_hand,
-            Inventory.quantity_reserved,
-            (Inventory.quantity_on_hand - Inventory.quantity_reserved).label('quantity_available'),
             Category.name.label('category_name')
-        ).select_from(Inventory).join(Product).join(Warehouse).outerjoin(Category).filter(
-            and_(
-                Inventory.organization_id == org_id,
-                Product.is_active == True,
-                Inventory.quantity_on_hand <= (Product.minimum_stock_level * threshold_percentage / 100)
-            )
-        )
-        
-        if warehouse_id:
-            query = query.filter(Inventory.warehouse_id == warehouse_id)
-        
-        low_stock_items = query.order_by(
-            (Inventory.quantity_on_hand / Product.minimum_stock_level).asc()
-        ).all()
-        
-        # Calculate criticality levels
-        critical_items = []
-        warning_items = []
+        ).select_from(LowStockItem).join(
+            Inventory, Inventory.id == LowStockItem.inventory_id
+        ).join(
+            Product, Product.id == LowStockItem.product_id
+        ).join(
+            Warehouse, Warehouse.id == LowStockItem.warehouse_id
+        ).outerjoin(Category, Category.id == Product.category_id).filter(*scope)
         
-        for item in low_stock_items:
-            if item.minimum_stock_level > 0:
-                stock_ratio = item.quantity_on_hand / item.minimum_stock_level
-                if stock_ratio <= 0.25:  # 25% or less of minimum stock
-                    critical_items.append(item)
-                else:
-                    warning_items.append(item)
-            else:
-                warning_items.append(item)
+        try:
+            low_stock_items, page_info = paginate(
+                query, request.args, LowStockItem.stock_ratio, LowStockItem.inventory_id,
+                default_limit=100, count_scope=('low_stock', org_id)
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         return jsonify({
             'summary': {
-                'total_low_stock_items': len(low_stock_items),
-                'critical_items': len(critical_items),
-                'warning_items': len(warning_items)
+                'total_low_stock_items': sum(counts.values()),
+                'critical_items': counts.get('critical', 0),
+                'warning_items': counts.get('warning', 0)
             },
             'low_stock_items': [
                 {
@@ -330,11 +297,12 @@ def get_low_stock_report():
                     'minimum_stock_level': item.minimum_stock_level,
                     'reorder_point': item.reorder_point,
                     'reorder_quantity': item.reorder_quantity,
-                    'stock_ratio': (item.quantity_on_hand / item.minimum_stock_level) if item.minimum_stock_level > 0 else 0,
-                    'criticality': 'critical' if item in critical_items else 'warning'
+                    'stock_ratio': item.stock_ratio,
+                    'criticality': item.criticality
                 }
                 for item in low_stock_items
-            ]
+            ],
+            **page_info
         }), 200
         
     except Exception as e:
@@ -342,6 +310,7 @@ def get_low_stock_report():
 
 @reports_bp.route('/reports/movement-analysis', methods=['GET'])
 @jwt_required()
+@cached_report(current_organization_id)
 def get_movement_analysis():
     """Generate inventory movement analysis report"""
     try:
@@ -354,6 +323,10 @@ def get_movement_analysis():
         date_to = request.args.get('date_to')
         product_id = request.args.get('product_id', type=int)
         movement_type = request.args.get('movement_type')
+        bucket = request.args.get('bucket', 'day')
+        
+        if bucket not in TREND_BUCKETS:
+            return jsonify({'error': f'bucket must be one of: {", ".join(TREND_BUCKETS)}'}), 400
         
         # Default to last 30 days if no dates provided
         if not date_from:
@@ -367,99 +340,25 @@ def get_movement_analysis():
         except ValueError:
             return jsonify({'error': 'Invalid date format'}), 400
         
-        # Base query for movements
-        query = db.session.query(InventoryMovement).filter(
-            and_(
-                InventoryMovement.organization_id == org_id,
-                InventoryMovement.movement_date >= date_from_obj,
-                InventoryMovement.movement_date <= date_to_obj
-            )
+        # Summary, top products and trends are all aggregated in SQL (trends
+        # from the daily rollup), so memory stays flat as the range grows
+        analysis = movement_analysis(
+            org_id, date_from_obj, date_to_obj, product_id=product_id,
+            movement_type=movement_type, bucket=bucket
         )
         
-        if product_id:
-            query = query.filter(InventoryMovement.product_id == product_id)
-        
-        if movement_type:
-            query = query.filter(InventoryMovement.movement_type == movement_type)
-        
-        movements = query.all()
-        
-        # Analyze movements by type
-        movement_summary = {}
-        for movement in movements:
-            mov_type = movement.movement_type
-            if mov_type not in movement_summary:
-                movement_summary[mov_type] = {
-                    'count': 0,
-                    'total_quantity': 0,
-                    'total_value': 0
-                }
-            
-            movement_summary[mov_type]['count'] += 1
-            movement_summary[mov_type]['total_quantity'] += abs(movement.quantity)
-            if movement.unit_cost:
-                movement_summary[mov_type]['total_value'] += abs(movement.quantity) * float(movement.unit_cost)
-        
-        # Top products by movement activity
-        product_activity = db.session.query(
-            Product.name,
-            Product.sku,
-            func.count(InventoryMovement.id).label('movement_count'),
-            func.sum(func.abs(InventoryMovement.quantity)).label('total_quantity_moved')
-        ).join(InventoryMovement).filter(
-            and_(
-                InventoryMovement.organization_id == org_id,
-                InventoryMovement.movement_date >= date_from_obj,
-                InventoryMovement.movement_date <= date_to_obj
-            )
-        ).group_by(Product.id, Product.name, Product.sku).order_by(
-            desc('movement_count')
-        ).limit(10).all()
-        
-        # Daily movement trends
-        daily_trends = db.session.query(
-            func.date(InventoryMovement.movement_date).label('date'),
-            InventoryMovement.movement_type,
-            func.count(InventoryMovement.id).label('count'),
-            func.sum(func.abs(InventoryMovement.quantity)).label('total_quantity')
-        ).filter(
-            and_(
-                InventoryMovement.organization_id == org_id,
-                InventoryMovement.movement_date >= date_from_obj,
-                InventoryMovement.movement_date <= date_to_obj
-            )
-        ).group_by(
-            func.date(InventoryMovement.movement_date),
-            InventoryMovement.movement_type
-        ).order_by('date').all()
-        
         return jsonify({
             'analysis': {
                 'date_range': {
                     'from': date_from,
                     'to': date_to
                 },
-                'total_movements': len(movements),
-                'movement_summary': movement_summary
+                'bucket': bucket,
+                'total_movements': analysis['total_movements'],
+                'movement_summary': analysis['movement_summary']
             },
-            'top_products': [
-                {
-                    'name': product.name,
-                    'sku': product.sku,
-                    'movement_count': product.movement_count,
-                    'total_quantity_moved': int(product.total_quantity_moved)
-                }
-                for product in product_activity
-            ],
-            'daily_trends': [
-                {
-                    'date': trend.date.isoformat() if trend.date else None,
-                    'movement_type': trend.movement_type,
-                    'count': trend.count,
-                    'total_quantity': int(trend.total_quantity)
-                }
-                for trend in daily_trends
-            ]
+            'top_products': analysis['top_products'],
+            'daily_trends': analysis['daily_trends']
         }), 200
         
     except Exception as e:
@@ -467,6 +366,7 @@ def get_movement_analysis():
 
 @reports_bp.route('/reports/valuation', methods=['GET'])
 @jwt_required()
+@cached_report(current_organization_id)
 def get_inventory_valuation():
     """Generate inventory valuation report"""
     try:
@@ -477,19 +377,18 @@ def get_inventory_valuation():
         org_id = user.organization_id
         warehouse_id = request.args.get('warehouse_id', type=int)
         
-        # Query for inventory valuation
-        query = db.session.query(
+        # Query for inventory valuation; stock is valued at its cost layers
+        # (weighted average or FIFO), read from the maintained cost state
+        query = join_valuation(db.session.query(
             Product.name.label('product_name'),
             Product.sku,
-            Product.cost_price,
-            Product.selling_price,
+            cast(Product.cost_price, Float).label('cost_price'),
+            cast(Product.selling_price, Float).label('selling_price'),
             Warehouse.name.label('warehouse_name'),
             Category.name.label('category_name'),
             Inventory.quantity_on_hand,
-            (Inventory.quantity_on_hand * Product.cost_price).label('cost_value'),
-            (Inventory.quantity_on_hand * Product.selling_price).label('selling_value'),
-            ((Inventory.quantity_on_hand * Product.selling_price) - (Inventory.quantity_on_hand * Product.cost_price)).label('potential_profit')
-        ).select_from(Inventory).join(Product).join(Warehouse).outerjoin(Category).filter(
+            cast(inventory_cost_value(func.coalesce(Product.cost_price, 0)), Float).label('cost_value')
+        ).select_from(Inventory).join(Product).join(Warehouse).outerjoin(Category)).filter(
             and_(
                 Inventory.organization_id == org_id,
                 Inventory.quantity_on_hand > 0,
@@ -500,25 +399,21 @@ def get_inventory_valuation():
         if warehouse_id:
             query = query.filter(Inventory.warehouse_id == warehouse_id)
         
-        valuation_data = query.all()
+        columns = load_columns(
+            query.statement,
+            numeric=('cost_price', 'selling_price', 'cost_value'),
+            integer=('quantity_on_hand',)
+        )
+        cost_value = columns['cost_value']
+        selling_value = multiply(columns['quantity_on_hand'], columns['selling_price'])
         
         # Calculate totals
-        total_cost_value = sum(
-            float(item.cost_value) if item.cost_value else 0 
-            for item in valuation_data
-        )
-        total_selling_value = sum(
-            float(item.selling_value) if item.selling_value else 0 
-            for item in valuation_data
-        )
+        total_cost_value = total(cost_value)
+        total_selling_value = total(selling_value)
         total_potential_profit = total_selling_value - total_cost_value
         
-        # Top valued items
-        top_valued_items = sorted(
-            valuation_data,
-            key=lambda x: float(x.cost_value) if x.cost_value else 0,
-            reverse=True
-        )[:10]
+        # Top valued items, without sorting the whole result
+        top_valued_items = top_k(cost_value, 10)
         
         return jsonify({
             'summary': {
@@ -526,25 +421,141 @@ def get_inventory_valuation():
                 'total_selling_value': total_selling_value,
                 'total_potential_profit': total_potential_profit,
                 'profit_margin_percentage': (total_potential_profit / total_cost_value * 100) if total_cost_value > 0 else 0,
-                'total_items_valued': len(valuation_data)
+                'total_items_valued': len(columns),
+                'valuation_method': valuation_method(org_id)
             },
             'top_valued_items': [
                 {
-                    'product_name': item.product_name,
-                    'sku': item.sku,
-                    'category': item.category_name or 'Uncategorized',
-                    'warehouse': item.warehouse_name,
-                    'quantity_on_hand': item.quantity_on_hand,
-                    'cost_price': float(item.cost_price) if item.cost_price else 0,
-                    'selling_price': float(item.selling_price) if item.selling_price else 0,
-                    'cost_value': float(item.cost_value) if item.cost_value else 0,
-                    'selling_value': float(item.selling_value) if item.selling_value else 0,
-                    'potential_profit': float(item.potential_profit) if item.potential_profit else 0
+                    'product_name': columns['product_name'][index],
+                    'sku': columns['sku'][index],
+                    'category': columns['category_name'][index] or 'Uncategorized',
+                    'warehouse': columns['warehouse_name'][index],
+                    'quantity_on_hand': int(columns['quantity_on_hand'][index]),
+                    'cost_price': float(columns['cost_price'][index]),
+                    'selling_price': float(columns['selling_price'][index]),
+                    'unit_cost': float(cost_value[index] / columns['quantity_on_hand'][index]),
+                    'cost_value': float(cost_value[index]),
+                    'selling_value': float(selling_value[index]),
+                    'potential_profit': float(selling_value[index] - cost_value[index])
                 }
-                for item in top_valued_items
+                for index in top_valued_items
             ]
         }), 200
         
     except Exception as e:
         return jsonify({'error': 'Failed to generate valuation report', 'details': str(e)}), 500
 
+@reports_bp.route('/reports/reorder-suggestions', methods=['GET'])
+@jwt_required()
+@cached_report(current_organization_id)
+def get_reorder_suggestions():
+    """Reorder points and quantities forecast from recent demand, largest orders first"""
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        try:
+            fields, expand = serialization_args(request.args, ReorderSuggestion)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        org_id = user.organization_id
+        warehouse_id = request.args.get('warehouse_id', type=int)
+        needs_order = request.args.get('needs_order', type=bool)
+        
+        # Refreshed by the forecast job (`flask forecast-reorders`)
+        query = ReorderSuggestion.query.filter_by(organization_id=org_id)
+        if warehouse_id:
+            query = query.filter_by(warehouse_id=warehouse_id)
+        if needs_order:
+            query = query.filter(ReorderSuggestion.suggested_order_quantity > 0)
+        
+        try:
+            suggestions, page_info = paginate(
+                query, request.args, ReorderSuggestion.suggested_order_quantity, ReorderSuggestion.id,
+                descending=True, count_scope=('reorder_suggestions', org_id)
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        computed_at = db.session.query(ReorderSuggestion.computed_at).filter_by(organization_id=org_id).first()
+        
+        return jsonify({
+            'computed_at': computed_at[0].isoformat() if computed_at else None,
+            'suggestions': serialize(suggestions, fields, expand),
+            **page_info
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to generate reorder suggestions', 'details': str(e)}), 500
+
+@reports_bp.route('/reports/reorder-simulation', methods=['POST'])
+@jwt_required()
+def simulate_reorder_policy():
+    """Replay past demand against current and candidate reorder policies"""
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        try:
+            params = validate_simulation(request.get_json(silent=True) or {})
+            result = run_simulation(user.organization_id, params)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({'simulation': result}), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to simulate reorder policy', 'details': str(e)}), 500
+
+@reports_bp.route('/reports/<name>/export', methods=['GET'])
+@jwt_required()
+def export_report(name):
+    """Stream a report's rows as CSV or NDJSON, optionally gzipped"""
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        export_format = request.args.get('format', 'csv')
+        compress = request.args.get('gzip', 'false').lower() in ('1', 'true', 'yes')
+        
+        if name not in EXPORTS:
+            return jsonify({'error': f'Report must be one of: {", ".join(EXPORTS)}'}), 404
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f'format must be one of: {", ".join(EXPORT_FORMATS)}'}), 400
+        
+        try:
+            export = build_export(name, user.organization_id, request.args)
+        except ValueError as e:
+            return jsonify({'error': 'Invalid export parameters', 'details': str(e)}), 400
+        
+        # Rows are fetched and encoded batch by batch while the response is
+        # sent, so memory stays flat regardless of the report size
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        filename = f'{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.{extension}'
+        if compress:
+            mimetype, filename = 'application/gzip', filename + '.gz'
+        
+        return Response(
+            export_stream(export_engine(), export, export_format, compress=compress),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to export report', 'details': str(e)}), 500
+
+@reports_bp.route('/reports/cache-metrics', methods=['GET'])
+@jwt_required()
+def get_report_cache_metrics():
+    """Hit/miss and size counters of this process's report cache (admins only)"""
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    if user.role != 'admin':
+        return jsonify({'error': 'Only administrators can view cache metrics'}), 403
+    
+    return jsonify({'cache': report_cache.metrics()}), 200
@@ -0,0 +1,187 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, delete, insert, literal, or_, select
+from src.models.inventory import db, Alert, AlertArchive, Organization
+from src.services.maintenance import start_periodic_job
+
+DEFAULT_SWEEP_BATCH_ROWS = 500
+DEFAULT_SWEEP_PAUSE = 0.05  # seconds between batches, so writers can take the lock
+POLICY_CACHE_TTL = 60
+
+# Retention settings an organization can override under
+# Organization.settings['alert_retention']:
+#   expire_after_days      default expires_at of new alerts (None: never)
+#   read_retention_days    read alerts not seen for this long are swept (None: kept)
+#   archive                copy swept alerts to alerts_archive before deleting
+DEFAULT_RETENTION = {
+    'expire_after_days': 30,
+    'read_retention_days': 14,
+    'archive': False
+}
+
+_policy_lock = threading.Lock()
+_policies = {}
+
+_metrics_lock = threading.Lock()
+_metrics = dict.fromkeys(('runs', 'batches', 'rows_deleted', 'rows_archived', 'errors'), 0)
+_metrics.update({'seconds': 0.0, 'last_run_at': None, 'last_run_seconds': None, 'last_run_rows': None})
+
+def default_retention():
+    """DEFAULT_RETENTION with the app-wide overrides from config"""
+    config = current_app.config
+    return {
+        'expire_after_days': config.get('ALERT_EXPIRE_AFTER_DAYS', DEFAULT_RETENTION['expire_after_days']),
+        'read_retention_days': config.get('ALERT_READ_RETENTION_DAYS', DEFAULT_RETENTION['read_retention_days']),
+        'archive': config.get('ALERT_ARCHIVE', DEFAULT_RETENTION['archive'])
+    }
+
+def validate_retention(data):
+    """Check a retention policy update; returns (policy, error message)"""
+    if not isinstance(data, dict):
+        return None, 'Retention policy must be an object'
+    unknown = set(data) - set(DEFAULT_RETENTION)
+    if unknown:
+        return None, f'Unknown retention settings: {", ".join(sorted(unknown))}'
+    for field in ('expire_after_days', 'read_retention_days'):
+        value = data.get(field)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 1):
+            return None, f'{field} must be a positive integer or null'
+    if 'archive' in data and not isinstance(data['archive'], bool):
+        return None, 'archive must be a boolean'
+    return data, None
+
+def _organization_settings(organization_id):
+    raw = db.session.execute(
+        select(Organization.settings).where(Organization.id == organization_id)
+    ).scalar()
+    return json.loads(raw) if raw else {}
+
+def retention_policy(organization_id):
+    """An organization's alert retention policy, cached for POLICY_CACHE_TTL seconds"""
+    now = time.monotonic()
+    with _policy_lock:
+        cached = _policies.get(organization_id)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    policy = {**default_retention(), **_organization_settings(organization_id).get('alert_retention', {})}
+    with _policy_lock:
+        _policies[organization_id] = (now + POLICY_CACHE_TTL, policy)
+    return policy
+
+def save_retention_policy(organization_id, changes):
+    """Merge changes into an organization's stored policy; the caller commits"""
+    organization = db.session.get(Organization, organization_id)
+    settings = json.loads(organization.settings) if organization.settings else {}
+    settings['alert_retention'] = {**settings.get('alert_retention', {}), **changes}
+    organization.settings = json.dumps(settings)
+    with _policy_lock:
+        _policies.pop(organization_id, None)
+    return {**default_retention(), **settings['alert_retention']}
+
+def alert_expiry(organization_id, now):
+    """expires_at for an alert raised now, or None if the policy never expires alerts"""
+    days = retention_policy(organization_id)['expire_after_days']
+    return now + timedelta(days=days) if days else None
+
+def _sweep_condition(organization_id, policy, now):
+    conditions = [and_(Alert.expires_at.isnot(None), Alert.expires_at <= now)]
+    if policy['read_retention_days']:
+        conditions.append(and_(
+            Alert.is_read == True,
+            Alert.last_seen_at < now - timedelta(days=policy['read_retention_days'])
+        ))
+    return and_(Alert.organization_id == organization_id, or_(*conditions))
+
+def sweep_organization_alerts(organization_id, now=None, batch_rows=DEFAULT_SWEEP_BATCH_ROWS,
+                              pause=DEFAULT_SWEEP_PAUSE):
+    """Delete (or archive) an organization's expired and old read alerts.
+
+    Rows go batch_rows at a time, each batch in its own short transaction
+    followed by a pause, so the write lock is never held for long. Returns
+    (rows removed, batches).
+    """
+    now = now or datetime.utcnow()
+    policy = retention_policy(organization_id)
+    condition = _sweep_condition(organization_id, policy, now)
+    archive_columns = [column.name for column in AlertArchive.__table__.columns if column.name != 'archived_at']
+    removed = 0
+    batches = 0
+    while True:
+        ids = db.session.execute(select(Alert.id).where(condition).limit(batch_rows)).scalars().all()
+        if not ids:
+            break
+        if policy['archive']:
+            db.session.execute(insert(AlertArchive).from_select(
+                archive_columns + ['archived_at'],
+                select(*(Alert.__table__.c[name] for name in archive_columns), literal(now)).where(
+                    Alert.id.in_(ids)
+                )
+            ))
+        db.session.execute(delete(Alert).where(Alert.id.in_(ids)))
+        db.session.commit()
+        removed += len(ids)
+        batches += 1
+        with _metrics_lock:
+            _metrics['batches'] += 1
+            _metrics['rows_archived' if policy['archive'] else 'rows_deleted'] += len(ids)
+        if len(ids) < batch_rows:
+            break
+        time.sleep(pause)
+    return removed, batches
+
+def sweep_alerts(organization_ids=None, batch_rows=DEFAULT_SWEEP_BATCH_ROWS, pause=DEFAULT_SWEEP_PAUSE):
+    """Run the retention sweep for the given organizations (default: all).
+
+    Returns {'organizations', 'rows', 'batches', 'seconds'} and adds the run to
+    the sweep metrics.
+    """
+    started = time.perf_counter()
+    if organization_ids is None:
+        organization_ids = db.session.execute(select(Organization.id)).scalars().all()
+    rows = 0
+    batches = 0
+    try:
+        for organization_id in organization_ids:
+            removed, organization_batches = sweep_organization_alerts(
+                organization_id, batch_rows=batch_rows, pause=pause
+            )
+            rows += removed
+            batches += organization_batches
+    except Exception:
+        db.session.rollback()
+        with _metrics_lock:
+            _metrics['errors'] += 1
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        with _metrics_lock:
+            _metrics['runs'] += 1
+            _metrics['seconds'] = round(_metrics['seconds'] + elapsed, 4)
+            _metrics['last_run_at'] = datetime.utcnow().isoformat()
+            _metrics['last_run_seconds'] = round(elapsed, 4)
+            _metrics['last_run_rows'] = rows
+    return {'organizations': len(organization_ids), 'rows': rows, 'batches': batches, 'seconds': round(elapsed, 4)}
+
+def sweep_metrics():
+    """Counters for the alert retention sweep since the process started"""
+    with _metrics_lock:
+        return dict(_metrics)
+
+def start_alert_sweeper(app):
+    """Run sweep_alerts every ALERT_SWEEP_INTERVAL seconds in the background.
+
+    Every process started this way sweeps; running the same sweep twice is
+    harmless, as each batch only deletes rows that still match. Each run is
+    logged with this process's sweep_metrics totals.
+    """
+    batch_rows = app.config.get('ALERT_SWEEP_BATCH_ROWS', DEFAULT_SWEEP_BATCH_ROWS)
+
+    def sweep():
+        result = sweep_alerts(batch_rows=batch_rows)
+        app.logger.info('Alert sweep: %s; process totals: %s', result, sweep_metrics())
+
+    return start_periodic_job(app, 'alert-sweeper', app.config.get('ALERT_SWEEP_INTERVAL', 0), sweep)
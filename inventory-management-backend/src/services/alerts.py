@@ -0,0 +1,121 @@
+from collections import namedtuple
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import bindparam, text, update
+from sqlalchemy.exc import SQLAlchemyError
+from src.models.inventory import db, Alert
+from src.services.alert_retention import alert_expiry
+from src.services.upsert import dialect_insert
+
+# Columns identifying an alert: a repeat of an open alert with the same key
+# updates it (ux_alerts_open_key) instead of adding a row
+ALERT_DEDUP_KEY = ('organization_id', 'alert_type', 'entity_type', 'entity_id', 'warehouse_id')
+
+# Stock of one item after a movement. `product` needs id, name, sku and
+# minimum_stock_level; `previous` is None for a new inventory row.
+StockLevel = namedtuple('StockLevel', ['product', 'warehouse_id', 'warehouse_name', 'previous', 'current'])
+
+def low_stock_alert_row(organization_id, product, warehouse_id, warehouse_name, quantity_on_hand):
+    """Build the insert parameters for a low stock alert"""
+    return {
+        'organization_id': organization_id,
+        'alert_type': 'low_stock',
+        'title': f'Low Stock Alert: {product.name}',
+        'message': f'Product {product.name} (SKU: {product.sku}) is running low in {warehouse_name}. Current stock: {quantity_on_hand}, Minimum level: {product.minimum_stock_level}',
+        'severity': 'warning',
+        'entity_type': 'product',
+        'entity_id': product.id,
+        'warehouse_id': warehouse_id
+    }
+
+def raise_alerts(rows, now=None):
+    """Insert alerts, or fold each into the open alert with the same dedup key.
+
+    A repeat bumps occurrence_count and takes the new title, message,
+    severity, last_seen_at and expires_at; created_at and is_read are kept.
+    Rows without an expires_at get the organization's default (see
+    alert_retention). Returns (created, updated).
+    """
+    if not rows:
+        return 0, 0
+    now = now or datetime.utcnow()
+    expiry = {}
+    for row in rows:
+        if 'expires_at' not in row:
+            organization_id = row['organization_id']
+            if organization_id not in expiry:
+                expiry[organization_id] = alert_expiry(organization_id, now)
+            row['expires_at'] = expiry[organization_id]
+    table = Alert.__table__
+    stmt = dialect_insert()(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(ALERT_DEDUP_KEY),
+        index_where=text("status = 'open'"),
+        set_={
+            'occurrence_count': table.c.occurrence_count + 1,
+            'title': stmt.excluded.title,
+            'message': stmt.excluded.message,
+            'severity': stmt.excluded.severity,
+            'last_seen_at': stmt.excluded.last_seen_at,
+            'expires_at': stmt.excluded.expires_at
+        }
+    ).returning(table.c.occurrence_count)
+    counts = db.session.scalars(stmt, [
+        dict(row, status='open', occurrence_count=1, is_read=False, created_at=now, last_seen_at=now)
+        for row in rows
+    ]).all()
+    created = counts.count(1)
+    return created, len(counts) - created
+
+def resolve_alerts(organization_id, alert_type, entity_type, keys, now=None):
+    """Resolve the open alerts for (entity_id, warehouse_id) keys; returns how many"""
+    if not keys:
+        return 0
+    now = now or datetime.utcnow()
+    table = Alert.__table__
+    result = db.session.execute(
+        update(table).where(
+            table.c.organization_id == organization_id,
+            table.c.alert_type == alert_type,
+            table.c.entity_type == entity_type,
+            table.c.entity_id == bindparam('key_entity_id'),
+            table.c.warehouse_id == bindparam('key_warehouse_id'),
+            table.c.status == 'open'
+        ).values(status='resolved', resolved_at=now),
+        [{'key_entity_id': entity_id, 'key_warehouse_id': warehouse_id} for entity_id, warehouse_id in keys]
+    )
+    return result.rowcount
+
+def evaluate_low_stock(organization_id, levels):
+    """Raise, refresh or resolve low stock alerts for new stock levels.
+
+    Runs in the movement's transaction, before its commit, inside a savepoint:
+    a failure here is logged and rolled back on its own, and never loses the
+    movement. Items at or below their minimum raise (or count another
+    occurrence of) the open alert for the product and warehouse; items that
+    moved from at or below the minimum to above it resolve it. Returns
+    {'created', 'updated', 'resolved'}.
+    """
+    summary = {'created': 0, 'updated': 0, 'resolved': 0}
+    raised = []
+    recovered = []
+    for level in levels:
+        minimum = level.product.minimum_stock_level or 0
+        if level.current <= minimum:
+            raised.append(low_stock_alert_row(
+                organization_id, level.product, level.warehouse_id, level.warehouse_name, level.current
+            ))
+        elif level.previous is not None and level.previous <= minimum:
+            recovered.append((level.product.id, level.warehouse_id))
+    if not raised and not recovered:
+        return summary
+
+    now = datetime.utcnow()
+    try:
+        with db.session.begin_nested():
+            summary['created'], summary['updated'] = raise_alerts(raised, now)
+            summary['resolved'] = resolve_alerts(organization_id, 'low_stock', 'product', recovered, now)
+    except SQLAlchemyError:
+        current_app.logger.exception('Low stock alert evaluation failed for organization %s', organization_id)
+        return {'created': 0, 'updated': 0, 'resolved': 0}
+    return summary
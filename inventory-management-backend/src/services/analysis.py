@@ -0,0 +1,110 @@
+from collections import namedtuple
+from sqlalchemy import and_, func, desc
+from src.models.inventory import db, Product, InventoryMovement
+from src.services.movement_archive import archived_until, archive_files, archived_rows
+from src.services.rollups import movement_trends
+
+TopProduct = namedtuple('TopProduct', ['name', 'sku', 'movement_count', 'total_quantity_moved'])
+
+def top_moved_products(organization_id, date_from, date_to, limit=10):
+    """Products with the most movements in a range, aggregated in SQL.
+
+    When the range reaches into archived months, the hot ledger is
+    aggregated per product in SQL, the archived movements are added on top
+    and the top `limit` is picked from the merged totals. Ties go to the
+    lower product id either way.
+    """
+    query = db.session.query(
+        Product.name,
+        Product.sku,
+        func.count(InventoryMovement.id).label('movement_count'),
+        func.sum(func.abs(InventoryMovement.quantity)).label('total_quantity_moved')
+    ).join(InventoryMovement).filter(
+        and_(
+            InventoryMovement.organization_id == organization_id,
+            InventoryMovement.movement_date >= date_from,
+            InventoryMovement.movement_date <= date_to
+        )
+    ).group_by(Product.id, Product.name, Product.sku)
+
+    boundary = archived_until(organization_id)
+    months = archive_files(organization_id, date_from, date_to) if boundary is not None else []
+    if not months:
+        return query.order_by(desc('movement_count'), Product.id).limit(limit).all()
+
+    totals = {}
+    for movement in archived_rows(months, date_from, date_to):
+        entry = totals.setdefault(movement['product_id'], [0, 0])
+        entry[0] += 1
+        entry[1] += abs(movement['quantity'])
+    hot = query.filter(InventoryMovement.movement_date >= boundary).add_columns(Product.id)
+    names = {}
+    for name, sku, count, quantity, product_id in hot:
+        entry = totals.setdefault(product_id, [0, 0])
+        entry[0] += count
+        entry[1] += quantity
+        names[product_id] = (name, sku)
+    missing = set(totals) - set(names)
+    if missing:
+        names.update({
+            product_id: (name, sku) for product_id, name, sku in db.session.query(
+                Product.id, Product.name, Product.sku
+            ).filter(Product.id.in_(missing))
+        })
+
+    ranked = sorted(
+        (product_id for product_id in totals if product_id in names),
+        key=lambda product_id: (-totals[product_id][0], product_id)
+    )
+    return [TopProduct(*names[product_id], *totals[product_id]) for product_id in ranked[:limit]]
+
+def movement_analysis(organization_id, date_from, date_to, product_id=None, movement_type=None, bucket='day'):
+    """Build the movement analysis report without loading individual movements.
+
+    Trends come from the daily rollup and the per-type summary is folded from
+    them, so memory depends on the number of buckets rather than the number
+    of movements in the range. `product_id` and `movement_type` narrow the
+    summary only; daily_trends and top_products cover every movement in the
+    range.
+    """
+    trends = movement_trends(organization_id, date_from, date_to, bucket=bucket)
+    filtered = trends
+    if product_id or movement_type:
+        filtered = movement_trends(
+            organization_id, date_from, date_to, bucket=bucket,
+            product_id=product_id, movement_type=movement_type
+        )
+
+    movement_summary = {}
+    for trend in filtered:
+        summary = movement_summary.setdefault(trend['movement_type'], {
+            'count': 0,
+            'total_quantity': 0,
+            'total_value': 0
+        })
+        summary['count'] += trend['count']
+        summary['total_quantity'] += trend['total_quantity']
+        summary['total_value'] += trend['total_value']
+
+    return {
+        'total_movements': sum(summary['count'] for summary in movement_summary.values()),
+        'movement_summary': movement_summary,
+        'top_products': [
+            {
+                'name': product.name,
+                'sku': product.sku,
+                'movement_count': product.movement_count,
+                'total_quantity_moved': int(product.total_quantity_moved)
+            }
+            for product in top_moved_products(organization_id, date_from, date_to)
+        ],
+        'daily_trends': [
+            {
+                'date': trend['date'],
+                'movement_type': trend['movement_type'],
+                'count': trend['count'],
+                'total_quantity': trend['total_quantity']
+            }
+            for trend in trends
+        ]
+    }
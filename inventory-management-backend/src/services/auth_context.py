@@ -0,0 +1,177 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple, OrderedDict
+from flask import current_app
+from flask_jwt_extended import get_jwt
+from sqlalchemy import update
+from src.models.inventory import db, User, Organization
+
+DEFAULT_STATUS_TTL = 30
+MAX_CACHED_STATUSES = 10000
+
+# What protected routes need to know about the caller, read from the token
+RequestIdentity = namedtuple('RequestIdentity', ['id', 'organization_id', 'role', 'permissions_version'])
+
+UserStatus = namedtuple('UserStatus', ['is_active', 'organization_id', 'organization_active', 'permissions_version'])
+
+OrganizationStatus = namedtuple('OrganizationStatus', ['is_active', 'auth_generation'])
+
+# Any change that can take access away from a user bumps the organization's
+# auth_generation, so tokens issued before it fall back to the per-user check.
+# SQLite only; on other databases run `flask revoke-tokens` after such changes.
+AUTH_GENERATION_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS users_auth_generation_au AFTER UPDATE ON users
+    WHEN OLD.is_active IS NOT NEW.is_active OR OLD.role IS NOT NEW.role
+        OR OLD.permissions IS NOT NEW.permissions OR OLD.organization_id IS NOT NEW.organization_id
+    BEGIN
+        UPDATE organizations SET auth_generation = auth_generation + 1
+        WHERE id IN (OLD.organization_id, NEW.organization_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_auth_generation_ad AFTER DELETE ON users
+    BEGIN
+        UPDATE organizations SET auth_generation = auth_generation + 1 WHERE id = OLD.organization_id;
+    END
+    """
+)
+
+class StatusCache:
+    """Thread-safe cache of (expires, value) entries that evicts the least
+    recently used entry once `max_entries` is reached"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, now):
+        """(True, value) for a fresh entry, else (False, None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def put(self, key, value, expires):
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def forget(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+_statuses = StatusCache(MAX_CACHED_STATUSES)
+_organizations = StatusCache(MAX_CACHED_STATUSES)
+
+def permissions_version(role, permissions):
+    """Short fingerprint of a user's role and permissions JSON.
+
+    Tokens carry the value they were issued with; once the role or
+    permissions change the fingerprint no longer matches and the token is
+    refused until it is refreshed.
+    """
+    source = f'{role}:{permissions or ""}'
+    return hashlib.sha256(source.encode()).hexdigest()[:12]
+
+def token_claims(user):
+    """Additional JWT claims for a user's access and refresh tokens"""
+    return {
+        'org_id': user.organization_id,
+        'role': user.role,
+        'perm_ver': permissions_version(user.role, user.permissions),
+        'auth_gen': user.organization.auth_generation or 0
+    }
+
+def current_identity():
+    """The caller's identity from the verified JWT, without touching the database"""
+    claims = get_jwt()
+    organization_id = claims.get('org_id')
+    if organization_id is None:
+        status = user_status(int(claims['sub']))
+        if status is None:
+            return None
+        organization_id = status.organization_id
+    return RequestIdentity(int(claims['sub']), organization_id, claims.get('role'), claims.get('perm_ver'))
+
+def _ttl():
+    return current_app.config.get('AUTH_STATUS_TTL', DEFAULT_STATUS_TTL)
+
+def organization_status(organization_id):
+    """Active flag and token generation of an organization, cached for AUTH_STATUS_TTL seconds"""
+    now = time.monotonic()
+    found, status = _organizations.get(organization_id, now)
+    if found:
+        return status
+
+    row = db.session.query(Organization.is_active, Organization.auth_generation).filter(
+        Organization.id == organization_id
+    ).first()
+    status = OrganizationStatus(row[0] is not False, row[1] or 0) if row else None
+    _organizations.put(organization_id, status, now + _ttl())
+    return status
+
+def user_status(user_id):
+    """Active flags for a user and their organization, cached for AUTH_STATUS_TTL seconds"""
+    now = time.monotonic()
+    found, status = _statuses.get(user_id, now)
+    if found:
+        return status
+
+    row = db.session.query(
+        User.is_active, User.organization_id, Organization.is_active, User.role, User.permissions
+    ).join(Organization, User.organization_id == Organization.id).filter(User.id == user_id).first()
+    status = None
+    if row:
+        status = UserStatus(
+            row[0] is not False,
+            row[1],
+            row[2] is not False,
+            permissions_version(row[3], row[4])
+        )
+    _statuses.put(user_id, status, now + _ttl())
+    return status
+
+def forget_user_status(user_id):
+    """Drop a cached status so the next request re-reads it"""
+    _statuses.forget(user_id)
+
+def revoke_tokens(organization_id=None):
+    """Bump the token generation of one or every organization (not committed),
+    so their tokens are checked against the users table again"""
+    statement = update(Organization).values(auth_generation=Organization.auth_generation + 1)
+    if organization_id is not None:
+        statement = statement.where(Organization.id == organization_id)
+    return db.session.execute(statement.execution_options(synchronize_session=False)).rowcount
+
+def token_revoked(jwt_payload):
+    """Whether a token must be refused: its user or organization is gone or
+    deactivated, it names another organization, or (for access tokens) the
+    user's permissions changed after it was issued.
+
+    A token whose auth_gen still matches its organization's generation was
+    issued after the last change that could revoke it, so only the cached
+    organization row is read; older tokens are checked against their user.
+    """
+    organization_id, generation = jwt_payload.get('org_id'), jwt_payload.get('auth_gen')
+    if organization_id is not None and generation is not None:
+        organization = organization_status(organization_id)
+        if organization is None or not organization.is_active:
+            return True
+        if generation == organization.auth_generation:
+            return False
+
+    status = user_status(int(jwt_payload['sub']))
+    if status is None or not status.is_active or not status.organization_active:
+        return True
+    if 'org_id' in jwt_payload and jwt_payload['org_id'] != status.organization_id:
+        return True
+    if jwt_payload.get('type') == 'access' and jwt_payload.get('perm_ver') not in (None, status.permissions_version):
+        return True
+    return False
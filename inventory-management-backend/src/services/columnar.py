@@ -0,0 +1,122 @@
+import heapq
+from array import array
+from collections import Counter
+from src.models.inventory import db
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class ColumnSet:
+    """A query result held as one sequence per column instead of one object per row.
+
+    Numeric columns are float arrays (NumPy when installed, `array.array`
+    otherwise) so totals, grouped sums and top-K run over whole columns.
+    """
+
+    def __init__(self, columns, length):
+        self.columns = columns
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def tolist(self, name):
+        """A column as a list of plain Python values"""
+        column = self.columns[name]
+        return column.tolist() if hasattr(column, 'tolist') else list(column)
+
+def numeric_column(values, integer=False):
+    """Convert a sequence to a numeric array, reading None as 0"""
+    if np is not None:
+        column = np.array(values, dtype=float)
+        np.nan_to_num(column, copy=False)
+        return column.astype(np.int64) if integer else column
+    return array('q' if integer else 'd', [value or 0 for value in values])
+
+def load_columns(statement, numeric=(), integer=()):
+    """Execute a select and transpose its rows into a ColumnSet.
+
+    Columns listed in `numeric` become float arrays and those in `integer`
+    become int64 arrays; every other column is kept as a tuple.
+    """
+    result = db.session.execute(statement)
+    names = list(result.keys())
+    rows = result.all()
+    data = list(zip(*rows)) if rows else [()] * len(names)
+
+    columns = {}
+    for name, values in zip(names, data):
+        if name in numeric or name in integer:
+            columns[name] = numeric_column(values, integer=name in integer)
+        else:
+            columns[name] = values
+    return ColumnSet(columns, len(rows))
+
+def multiply(left, right):
+    """Element-wise product of two numeric columns"""
+    if np is not None:
+        return left * right
+    return array('d', map(float.__mul__, map(float, left), map(float, right)))
+
+def total(column):
+    """Sum of a numeric column as a Python number"""
+    if np is not None:
+        return column.sum().item()
+    return sum(column)
+
+def group_sums(keys, values):
+    """Count rows and sum each value column per distinct key.
+
+    `keys` is an integer column and `values` maps output names to numeric
+    columns. Returns {key: {'items': count, 'first': index of the key's first
+    row, name: sum, ...}}; `first` lets callers pick a label for the group
+    without a second lookup.
+    """
+    if np is not None:
+        unique, first, inverse, counts = np.unique(
+            keys, return_index=True, return_inverse=True, return_counts=True
+        )
+        sums = {
+            name: np.bincount(inverse, weights=column, minlength=len(unique))
+            for name, column in values.items()
+        }
+        return {
+            key: {
+                'items': count,
+                'first': index,
+                **{name: sums[name][position].item() for name in sums}
+            }
+            for position, (key, index, count) in enumerate(zip(unique.tolist(), first.tolist(), counts.tolist()))
+        }
+
+    # Walking backwards leaves each key mapped to its earliest index
+    first = dict(zip(reversed(keys), range(len(keys) - 1, -1, -1)))
+    groups = {
+        key: {'items': count, 'first': first[key]}
+        for key, count in Counter(keys).items()
+    }
+    for name, column in values.items():
+        sums = dict.fromkeys(groups, 0)
+        for key, value in zip(keys, column):
+            sums[key] += value
+        for key, value in sums.items():
+            groups[key][name] = value
+    return groups
+
+def top_k(column, k):
+    """Indexes of the k largest values, largest first"""
+    size = len(column)
+    if k <= 0 or size == 0:
+        return []
+    if np is not None:
+        if k < size:
+            candidates = np.argpartition(-column, k - 1)[:k]
+        else:
+            candidates = np.arange(size)
+        return candidates[np.argsort(-column[candidates], kind='stable')].tolist()
+    return heapq.nlargest(k, range(size), key=column.__getitem__)
@@ -0,0 +1,181 @@
+import os
+from flask import g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.selectable import Select, CompoundSelect
+
+DEFAULT_DATABASE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'app.db')
+
+# Bind key of the read engine, and blueprints whose requests always read from
+# it (GET and HEAD requests do regardless of blueprint)
+READ_BIND = 'read'
+READ_ROUTED_BLUEPRINTS = ('reports',)
+
+# Per-profile SQLite pragmas (applied to every new connection) and pool
+# settings. WAL lets readers run alongside the single writer, busy_timeout
+# makes writers wait for the lock instead of failing with "database is
+# locked", and synchronous=NORMAL is durable in WAL mode except for the last
+# transactions before a power loss.
+PROFILES = {
+    'development': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+            'temp_store': 'MEMORY'
+        },
+        'pool': {'pool_size': 5, 'max_overflow': 10, 'pool_timeout': 30},
+        'read_pool': {'pool_size': 5, 'max_overflow': 5, 'pool_timeout': 30}
+    },
+    'production': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 15000,
+            'cache_size': -65536,  # KiB, so 64 MiB per connection
+            'mmap_size': 268435456,
+            'temp_store': 'MEMORY'
+        },
+        'pool': {'pool_size': 16, 'max_overflow': 16, 'pool_timeout': 30, 'pool_recycle': 3600},
+        'read_pool': {'pool_size': 8, 'max_overflow': 8, 'pool_timeout': 30, 'pool_recycle': 3600}
+    },
+    'test': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'OFF',
+            'busy_timeout': 5000,
+            'temp_store': 'MEMORY'
+        },
+        'pool': {'pool_size': 5, 'max_overflow': 10, 'pool_timeout': 30},
+        'read_pool': {'pool_size': 5, 'max_overflow': 5, 'pool_timeout': 30}
+    }
+}
+
+def database_settings(profile=None, uri=None, read_uri=None):
+    """Resolve the database URI, pragmas and engine options for a profile.
+
+    The profile comes from DATABASE_PROFILE when not given (default
+    'development') and the URIs from DATABASE_URL and DATABASE_READ_URL. DB_POOL_SIZE,
+    DB_MAX_OVERFLOW, DB_READ_POOL_SIZE, DB_READ_MAX_OVERFLOW and
+    SQLITE_BUSY_TIMEOUT_MS override individual values.
+
+    Reads get their own engine ('read' in the result) when a read URI is
+    given, e.g. a replica, or DB_READ_SPLIT=1 asks for a second pool on the
+    primary database; DB_READ_SPLIT=0 or an in-memory database turns it off.
+    For SQLite the read pool's connections are query_only. A second pool on
+    the same SQLite file still shares its CPU and disk with the writers, so
+    it is not enabled by default.
+    """
+    profile = profile or os.environ.get('DATABASE_PROFILE', 'development')
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown database profile: {profile}')
+
+    uri = uri or os.environ.get('DATABASE_URL', f'sqlite:///{DEFAULT_DATABASE_PATH}')
+    pragmas = dict(PROFILES[profile]['pragmas'])
+    pool = dict(PROFILES[profile]['pool'])
+    if 'DB_POOL_SIZE' in os.environ:
+        pool['pool_size'] = int(os.environ['DB_POOL_SIZE'])
+    if 'DB_MAX_OVERFLOW' in os.environ:
+        pool['max_overflow'] = int(os.environ['DB_MAX_OVERFLOW'])
+    if 'SQLITE_BUSY_TIMEOUT_MS' in os.environ:
+        pragmas['busy_timeout'] = int(os.environ['SQLITE_BUSY_TIMEOUT_MS'])
+
+    read_pool = dict(PROFILES[profile]['read_pool'])
+    if 'DB_READ_POOL_SIZE' in os.environ:
+        read_pool['pool_size'] = int(os.environ['DB_READ_POOL_SIZE'])
+    if 'DB_READ_MAX_OVERFLOW' in os.environ:
+        read_pool['max_overflow'] = int(os.environ['DB_READ_MAX_OVERFLOW'])
+
+    in_memory = uri.startswith('sqlite') and (':memory:' in uri or uri in ('sqlite://', 'sqlite:///'))
+    if in_memory:
+        # In-memory databases live and die with their single connection
+        pool = {}
+        pragmas.pop('journal_mode', None)
+
+    primary = _engine_settings(uri, pool, pragmas)
+    read = None
+    read_uri = read_uri or os.environ.get('DATABASE_READ_URL')
+    read_split = os.environ.get('DB_READ_SPLIT')
+    if not in_memory and (read_split == '1' or (read_uri and read_split != '0')):
+        read = _engine_settings(read_uri or uri, read_pool, {**pragmas, 'query_only': 1})
+
+    return {
+        'profile': profile,
+        'uri': uri,
+        'pragmas': primary['pragmas'],
+        'engine_options': primary['engine_options'],
+        'read': read
+    }
+
+def _engine_settings(uri, pool, pragmas):
+    engine_options = dict(pool)
+    if uri.startswith('sqlite'):
+        # Connections move between worker threads through the pool
+        engine_options['connect_args'] = {
+            'check_same_thread': False,
+            'timeout': pragmas.get('busy_timeout', 5000) / 1000
+        }
+    else:
+        pragmas = {}
+        engine_options['pool_pre_ping'] = True
+    return {'uri': uri, 'pragmas': pragmas, 'engine_options': engine_options}
+
+def apply_pragmas(engine, pragmas):
+    """Run the given PRAGMAs on every new connection the engine opens"""
+    if not pragmas or engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+def configure_engines(app, db, settings):
+    """Initialize Flask-SQLAlchemy with the primary and (if any) read engine"""
+    app.config['SQLALCHEMY_DATABASE_URI'] = settings['uri']
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = settings['engine_options']
+    read = settings.get('read')
+    if read:
+        app.config['SQLALCHEMY_BINDS'] = {READ_BIND: {'url': read['uri'], **read['engine_options']}}
+    db.init_app(app)
+    with app.app_context():
+        apply_pragmas(db.engines[None], settings['pragmas'])
+        if read:
+            apply_pragmas(db.engines[READ_BIND], read['pragmas'])
+
+    @app.before_request
+    def route_reads():
+        g.route_reads = request.method in ('GET', 'HEAD') or request.blueprint in READ_ROUTED_BLUEPRINTS
+
+def init_database(app, db, profile=None):
+    """Configure and initialize Flask-SQLAlchemy for the selected profile"""
+    settings = database_settings(profile)
+    app.config['DATABASE_PROFILE'] = settings['profile']
+    configure_engines(app, db, settings)
+    return settings
+
+class RoutingSession(Session):
+    """Session that sends SELECTs to the read engine while g.route_reads is set.
+
+    Flushes and DML always go to the primary, so a request that writes keeps
+    its writes on one engine. Reads on the read engine see what has been
+    committed on the primary (immediately for the SQLite pool, after
+    replication lag for a replica), not the request's own uncommitted changes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and isinstance(clause, (Select, CompoundSelect))
+            and has_app_context()
+            and g.get('route_reads')
+        ):
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
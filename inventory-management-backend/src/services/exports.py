@@ -0,0 +1,290 @@
+import csv
+import io
+import json
+import zlib
+from collections import namedtuple
+from datetime import datetime, date
+from decimal import Decimal
+from itertools import islice
+from sqlalchemy import and_, select, cast, Float, func
+from src.models.inventory import db, Product, Category, Warehouse, Inventory, InventoryMovement, LowStockItem
+from src.services.database import READ_BIND
+from src.services.low_stock import ratio_limit
+from src.services.movement_archive import archived_until, archive_files, archived_rows
+from src.services.valuation import inventory_cost_value, join_valuation
+
+# Formats an export can be streamed in: format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson')
+}
+
+# Rows fetched from the cursor and encoded per chunk of the response
+EXPORT_BATCH_ROWS = 1000
+
+# A report export: output column names, the SELECT producing the rows and a
+# function turning a result row into the output values (in column order).
+# `archived`, if set, returns an iterator of rows streamed before the
+# statement's (archived movements); it must not need the app context.
+Export = namedtuple('Export', ['columns', 'statement', 'row', 'archived'], defaults=[None])
+
+EXPORTS = {}
+
+def report_export(name):
+    """Register a function building an Export under a report name"""
+    def decorator(func):
+        EXPORTS[name] = func
+        return func
+    return decorator
+
+def _parse_date(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00')) if value else None
+
+@report_export('inventory-summary')
+def _inventory_summary(organization_id, args):
+    cost_price = cast(Product.cost_price, Float)
+    selling_price = cast(Product.selling_price, Float)
+    statement = join_valuation(select(
+        Product.name,
+        Product.sku,
+        func.coalesce(Category.name, 'Uncategorized'),
+        Warehouse.name,
+        Inventory.quantity_on_hand,
+        Inventory.quantity_reserved,
+        Inventory.quantity_on_hand - Inventory.quantity_reserved,
+        cost_price,
+        selling_price,
+        cast(inventory_cost_value(func.coalesce(Product.cost_price, 0)), Float),
+        Inventory.quantity_on_hand * func.coalesce(selling_price, 0)
+    ).select_from(Inventory).join(Product).join(Warehouse).outerjoin(Category)).where(
+        Inventory.organization_id == organization_id
+    ).order_by(Inventory.id)
+
+    warehouse_id = args.get('warehouse_id', type=int)
+    category_id = args.get('category_id', type=int)
+    if warehouse_id:
+        statement = statement.where(Inventory.warehouse_id == warehouse_id)
+    if category_id:
+        statement = statement.where(Product.category_id == category_id)
+
+    return Export(
+        ['product_name', 'sku', 'category', 'warehouse', 'quantity_on_hand', 'quantity_reserved',
+         'quantity_available', 'cost_price', 'selling_price', 'total_cost_value', 'total_selling_value'],
+        statement, tuple
+    )
+
+@report_export('valuation')
+def _valuation(organization_id, args):
+    cost_price = func.coalesce(cast(Product.cost_price, Float), 0)
+    selling_price = func.coalesce(cast(Product.selling_price, Float), 0)
+    cost_value = cast(inventory_cost_value(func.coalesce(Product.cost_price, 0)), Float)
+    statement = join_valuation(select(
+        Product.name,
+        Product.sku,
+        func.coalesce(Category.name, 'Uncategorized'),
+        Warehouse.name,
+        Inventory.quantity_on_hand,
+        cost_price,
+        selling_price,
+        cost_value,
+        Inventory.quantity_on_hand * selling_price,
+        Inventory.quantity_on_hand * selling_price - cost_value
+    ).select_from(Inventory).join(Product).join(Warehouse).outerjoin(Category)).where(
+        and_(
+            Inventory.organization_id == organization_id,
+            Inventory.quantity_on_hand > 0,
+            Product.is_active == True
+        )
+    ).order_by(Inventory.id)
+
+    warehouse_id = args.get('warehouse_id', type=int)
+    if warehouse_id:
+        statement = statement.where(Inventory.warehouse_id == warehouse_id)
+
+    return Export(
+        ['product_name', 'sku', 'category', 'warehouse', 'quantity_on_hand', 'cost_price',
+         'selling_price', 'cost_value', 'selling_value', 'potential_profit'],
+        statement, tuple
+    )
+
+@report_export('low-stock')
+def _low_stock(organization_id, args):
+    max_ratio = ratio_limit(args.get('threshold_percentage', 100, type=int))
+    statement = select(
+        Product.name,
+        Product.sku,
+        func.coalesce(Category.name, 'Uncategorized'),
+        Warehouse.name,
+        LowStockItem.quantity_on_hand,
+        LowStockItem.quantity_on_hand - Inventory.quantity_reserved,
+        LowStockItem.minimum_stock_level,
+        Product.reorder_point,
+        Product.reorder_quantity,
+        LowStockItem.stock_ratio,
+        LowStockItem.criticality
+    ).select_from(LowStockItem).join(
+        Inventory, Inventory.id == LowStockItem.inventory_id
+    ).join(
+        Product, Product.id == LowStockItem.product_id
+    ).join(
+        Warehouse, Warehouse.id == LowStockItem.warehouse_id
+    ).outerjoin(Category, Category.id == Product.category_id).where(
+        LowStockItem.organization_id == organization_id,
+        LowStockItem.stock_ratio <= max_ratio
+    ).order_by(LowStockItem.stock_ratio, LowStockItem.inventory_id)
+
+    warehouse_id = args.get('warehouse_id', type=int)
+    if warehouse_id:
+        statement = statement.where(LowStockItem.warehouse_id == warehouse_id)
+
+    return Export(
+        ['product_name', 'sku', 'category', 'warehouse', 'quantity_on_hand', 'quantity_available',
+         'minimum_stock_level', 'reorder_point', 'reorder_quantity', 'stock_ratio', 'criticality'],
+        statement, tuple
+    )
+
+@report_export('movements')
+def _movements(organization_id, args):
+    statement = select(
+        InventoryMovement.id,
+        InventoryMovement.movement_date,
+        InventoryMovement.movement_type,
+        Product.sku,
+        Product.name,
+        Warehouse.name,
+        InventoryMovement.quantity,
+        cast(InventoryMovement.unit_cost, Float),
+        InventoryMovement.reference_type,
+        InventoryMovement.reference_id,
+        InventoryMovement.notes
+    ).select_from(InventoryMovement).join(Product).join(Warehouse).where(
+        InventoryMovement.organization_id == organization_id
+    ).order_by(InventoryMovement.movement_date, InventoryMovement.id)
+
+    date_from = _parse_date(args.get('date_from'))
+    date_to = _parse_date(args.get('date_to'))
+    product_id = args.get('product_id', type=int)
+    warehouse_id = args.get('warehouse_id', type=int)
+    movement_type = args.get('movement_type')
+    boundary = archived_until(organization_id)
+    if boundary is not None:
+        statement = statement.where(InventoryMovement.movement_date >= boundary)
+    if date_from:
+        statement = statement.where(InventoryMovement.movement_date >= date_from)
+    if date_to:
+        statement = statement.where(InventoryMovement.movement_date <= date_to)
+    if product_id:
+        statement = statement.where(InventoryMovement.product_id == product_id)
+    if warehouse_id:
+        statement = statement.where(InventoryMovement.warehouse_id == warehouse_id)
+    if movement_type:
+        statement = statement.where(InventoryMovement.movement_type == movement_type)
+
+    archived = None
+    months = archive_files(organization_id, date_from, date_to) if boundary is not None else []
+    if months:
+        products = {
+            product_id: (sku, name) for product_id, sku, name in db.session.execute(
+                select(Product.id, Product.sku, Product.name).where(Product.organization_id == organization_id)
+            )
+        }
+        warehouses = dict(db.session.execute(
+            select(Warehouse.id, Warehouse.name).where(Warehouse.organization_id == organization_id)
+        ).all())
+
+        # Same columns as the statement; movements of deleted products or
+        # warehouses are left out, as the joins do
+        def archived():
+            for movement in archived_rows(months, date_from, date_to, product_id=product_id,
+                                          warehouse_id=warehouse_id, movement_type=movement_type):
+                product = products.get(movement['product_id'])
+                warehouse = warehouses.get(movement['warehouse_id'])
+                if product is None or warehouse is None:
+                    continue
+                unit_cost = movement['unit_cost']
+                yield (
+                    movement['id'], movement['movement_date'], movement['movement_type'], product[0], product[1],
+                    warehouse, movement['quantity'], float(unit_cost) if unit_cost is not None else None,
+                    movement['reference_type'], movement['reference_id'], movement['notes']
+                )
+
+    return Export(
+        ['id', 'movement_date', 'movement_type', 'sku', 'product_name', 'warehouse', 'quantity',
+         'unit_cost', 'reference_type', 'reference_id', 'notes'],
+        statement, tuple, archived
+    )
+
+def build_export(name, organization_id, args):
+    """The Export for a report name and request arguments.
+
+    Raises KeyError for an unknown report and ValueError for invalid
+    arguments.
+    """
+    return EXPORTS[name](organization_id, args)
+
+def export_engine():
+    """Engine exports read from: the read engine when configured"""
+    return db.engines.get(READ_BIND) or db.engine
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def export_batches(engine, export, batch_rows=EXPORT_BATCH_ROWS):
+    """Yield lists of output rows, fetching batch_rows at a time.
+
+    Archived rows come first, then the statement runs on its own connection
+    with stream_results, so only one batch is held in memory however large
+    the report. The connection is
+    released when the generator is exhausted or closed.
+    """
+    if export.archived is not None:
+        rows = export.archived()
+        while True:
+            batch = list(islice(rows, batch_rows))
+            if not batch:
+                break
+            yield [[_plain(value) for value in export.row(row)] for row in batch]
+
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=batch_rows).execute(export.statement)
+        for partition in result.partitions(batch_rows):
+            yield [[_plain(value) for value in export.row(row)] for row in partition]
+
+def encode_csv(columns, batches):
+    """CSV text chunks: a header line, then one chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+def encode_ndjson(columns, batches):
+    """NDJSON text chunks, one JSON object per row and one chunk per batch"""
+    for batch in batches:
+        yield ''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in batch)
+
+ENCODERS = {'csv': encode_csv, 'ndjson': encode_ndjson}
+
+def gzip_chunks(chunks, level=6):
+    """Compress text chunks into a gzip stream as they are produced"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_stream(engine, export, export_format, compress=False, batch_rows=EXPORT_BATCH_ROWS):
+    """Response body for an export: encoded chunks, gzipped if compress"""
+    chunks = ENCODERS[export_format](export.columns, export_batches(engine, export, batch_rows))
+    if compress:
+        return gzip_chunks(chunks)
+    return (chunk.encode('utf-8') for chunk in chunks)
@@ -0,0 +1,320 @@
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from statistics import NormalDist
+from flask import current_app
+from sqlalchemy import delete, insert, select
+from src.models.inventory import (
+    db, Inventory, MovementDailyRollup, Organization, Product, PurchaseOrder, PurchaseOrderItem,
+    ReorderSuggestion, Supplier
+)
+from src.services.columnar import np
+from src.services.maintenance import start_periodic_job
+from src.services.report_cache import invalidate_reports
+
+FORECAST_METHODS = ('moving_average', 'exponential_smoothing')
+
+# Forecast settings; each can be overridden app-wide with FORECAST_<NAME> in config:
+#   method          'moving_average' over the last window_days, or 'exponential_smoothing'
+#                   over the whole history with factor alpha
+#   history_days    days of outbound demand read per series, ending yesterday
+#   service_level   chance of not running out while an order is on its way
+#   lead_time_days  for products never ordered from a supplier with a lead time
+#   order_days      the reorder quantity covers this many days of demand
+DEFAULT_FORECAST = {
+    'method': 'moving_average',
+    'history_days': 90,
+    'window_days': 28,
+    'alpha': 0.3,
+    'service_level': 0.95,
+    'lead_time_days': 7,
+    'order_days': 30
+}
+
+WRITE_CHUNK_ROWS = 5000
+
+def forecast_settings(**overrides):
+    """DEFAULT_FORECAST with the config overrides and then `overrides` (None values
+    are ignored). Raises ValueError for invalid settings."""
+    config = current_app.config
+    settings = {
+        name: config.get(f'FORECAST_{name.upper()}', default) for name, default in DEFAULT_FORECAST.items()
+    }
+    settings.update({name: value for name, value in overrides.items() if value is not None})
+
+    if settings['method'] not in FORECAST_METHODS:
+        raise ValueError(f'method must be one of: {", ".join(FORECAST_METHODS)}')
+    if settings['history_days'] < 2:
+        raise ValueError('history_days must be at least 2')
+    if settings['method'] == 'moving_average' and not 2 <= settings['window_days'] <= settings['history_days']:
+        raise ValueError('window_days must be between 2 and history_days')
+    if not 0 < settings['alpha'] <= 1:
+        raise ValueError('alpha must be greater than 0 and at most 1')
+    if not 0.5 <= settings['service_level'] < 1:
+        raise ValueError('service_level must be at least 0.5 and below 1')
+    if settings['lead_time_days'] < 1 or settings['order_days'] < 1:
+        raise ValueError('lead_time_days and order_days must be positive')
+    return settings
+
+def smoothing_weights(days, alpha):
+    """Weights that turn a series of `days` values (oldest first) into its
+    exponentially smoothed level, starting from the first value"""
+    weights = [alpha * (1 - alpha) ** (days - 1 - day) for day in range(days)]
+    weights[0] = (1 - alpha) ** (days - 1)
+    return weights
+
+def load_series(organization_id, history_days, today=None, warehouse_id=None):
+    """Daily outbound demand of an organization's active inventory rows.
+
+    Returns (keys, on_hand, matrix): keys lists the (product_id, warehouse_id)
+    of each row, on_hand its current quantity and matrix[row][day] the
+    quantity shipped on each day of the history (oldest first, ending
+    yesterday). Demand comes from the daily rollup, which still covers
+    archived months. The matrix is a NumPy array when installed, lists
+    otherwise. `warehouse_id` limits the rows to one warehouse.
+    """
+    today = today or datetime.utcnow().date()
+    start = today - timedelta(days=history_days)
+    query = select(Inventory.product_id, Inventory.warehouse_id, Inventory.quantity_on_hand).join(
+        Product, Product.id == Inventory.product_id
+    ).where(Inventory.organization_id == organization_id, Product.is_active == True)
+    demand = select(
+        MovementDailyRollup.product_id, MovementDailyRollup.warehouse_id, MovementDailyRollup.total_quantity
+    ).where(
+        MovementDailyRollup.organization_id == organization_id,
+        MovementDailyRollup.movement_type == 'out'
+    )
+    if warehouse_id:
+        query = query.where(Inventory.warehouse_id == warehouse_id)
+        demand = demand.where(MovementDailyRollup.warehouse_id == warehouse_id)
+    items = db.session.execute(query).all()
+    keys = [(product_id, warehouse_id) for product_id, warehouse_id, _ in items]
+    on_hand = [quantity or 0 for _, _, quantity in items]
+    row_of = {key: row for row, key in enumerate(keys)}
+
+    if np is not None:
+        matrix = np.zeros((len(keys), history_days))
+    else:
+        matrix = [[0.0] * history_days for _ in keys]
+    # One day (one matrix column) per query, so no date is parsed per row; plain
+    # Core rows, as there is nothing for the ORM to load
+    connection = db.session.connection(bind_arguments={'clause': demand})
+    for day in range(history_days):
+        shipped = connection.execute(demand.where(MovementDailyRollup.day == start + timedelta(days=day))).all()
+        if not shipped:
+            continue
+        rows = [row_of.get((product_id, item_warehouse_id)) for product_id, item_warehouse_id, _ in shipped]
+        if np is not None:
+            rows = np.array([-1 if row is None else row for row in rows])
+            quantities = np.array([quantity for _, _, quantity in shipped], dtype=float)
+            stocked = rows >= 0
+            matrix[rows[stocked], day] = quantities[stocked]
+        else:
+            for row, (_, _, quantity) in zip(rows, shipped):
+                if row is not None:
+                    matrix[row][day] = float(quantity)
+    return keys, on_hand, matrix
+
+def lead_times(organization_id, default):
+    """Lead time in days per product id: that of the supplier on the product's
+    latest purchase order. Products without one are left out (use `default`)."""
+    latest = {}
+    for product_id, days in db.session.execute(
+        select(PurchaseOrderItem.product_id, Supplier.lead_time_days).join(
+            PurchaseOrder, PurchaseOrder.id == PurchaseOrderItem.purchase_order_id
+        ).join(
+            Supplier, Supplier.id == PurchaseOrder.supplier_id
+        ).where(
+            PurchaseOrder.organization_id == organization_id,
+            PurchaseOrder.status != 'cancelled'
+        ).order_by(PurchaseOrder.order_date, PurchaseOrder.id)
+    ):
+        latest[product_id] = days or default
+    return latest
+
+def _ceil(value):
+    # Rounded first so float noise (3.0000000001) does not add a unit
+    return math.ceil(round(value, 6))
+
+def compute_suggestions(matrix, lead, on_hand, settings):
+    """Forecast every row of a demand matrix and derive its reorder levels.
+
+    Daily demand is the moving average or smoothed level; its spread is the
+    standard deviation over the same days. Safety stock covers z standard
+    deviations over the lead time, the reorder point the lead time demand
+    plus safety stock, and the reorder quantity order_days of demand. Rows at
+    or below their reorder point get an order that brings them back up to
+    reorder point plus reorder quantity. Returns a dict of columns (lists).
+    """
+    z = NormalDist().inv_cdf(settings['service_level'])
+    method = settings['method']
+    order_days = settings['order_days']
+
+    if np is None:
+        return compute_suggestions_rows(matrix, lead, on_hand, settings)
+
+    lead = np.asarray(lead, dtype=float)
+    on_hand = np.asarray(on_hand, dtype=float)
+    if method == 'moving_average':
+        history = matrix[:, -settings['window_days']:]
+        demand = history.mean(axis=1)
+    else:
+        history = matrix
+        demand = matrix @ np.array(smoothing_weights(matrix.shape[1], settings['alpha']))
+    spread = history.std(axis=1, ddof=1) if len(history) else np.zeros(0)
+
+    safety_stock = np.ceil(np.round(z * spread * np.sqrt(lead), 6))
+    reorder_point = np.ceil(np.round(demand * lead + safety_stock, 6))
+    reorder_quantity = np.ceil(np.round(demand * order_days, 6))
+    suggested = np.where(
+        on_hand <= reorder_point, np.maximum(reorder_point + reorder_quantity - on_hand, 0), 0
+    )
+    return {
+        'daily_demand': np.round(demand, 4).tolist(),
+        'demand_std_dev': np.round(spread, 4).tolist(),
+        'safety_stock': safety_stock.astype(np.int64).tolist(),
+        'reorder_point': reorder_point.astype(np.int64).tolist(),
+        'reorder_quantity': reorder_quantity.astype(np.int64).tolist(),
+        'suggested_order_quantity': suggested.astype(np.int64).tolist()
+    }
+
+def compute_suggestions_rows(matrix, lead, on_hand, settings):
+    """compute_suggestions one row at a time over lists, for when NumPy is not installed"""
+    z = NormalDist().inv_cdf(settings['service_level'])
+    columns = {name: [] for name in (
+        'daily_demand', 'demand_std_dev', 'safety_stock', 'reorder_point', 'reorder_quantity',
+        'suggested_order_quantity'
+    )}
+    weights = smoothing_weights(len(matrix[0]), settings['alpha']) if matrix else []
+    for series, lead_time, quantity in zip(matrix, lead, on_hand):
+        if settings['method'] == 'moving_average':
+            history = series[-settings['window_days']:]
+            demand = sum(history) / len(history)
+        else:
+            history = series
+            demand = sum(weight * value for weight, value in zip(weights, series))
+        mean = sum(history) / len(history)
+        spread = math.sqrt(sum((value - mean) ** 2 for value in history) / (len(history) - 1))
+
+        safety_stock = _ceil(z * spread * math.sqrt(lead_time))
+        reorder_point = _ceil(demand * lead_time + safety_stock)
+        reorder_quantity = _ceil(demand * settings['order_days'])
+        columns['daily_demand'].append(round(demand, 4))
+        columns['demand_std_dev'].append(round(spread, 4))
+        columns['safety_stock'].append(safety_stock)
+        columns['reorder_point'].append(reorder_point)
+        columns['reorder_quantity'].append(reorder_quantity)
+        columns['suggested_order_quantity'].append(
+            max(reorder_point + reorder_quantity - quantity, 0) if quantity <= reorder_point else 0
+        )
+    return columns
+
+def _compute_shard(shard):
+    return compute_suggestions(*shard)
+
+def compute_sharded(matrix, lead, on_hand, settings, pool, shards):
+    """compute_suggestions with the rows split into `shards` parts run on a process pool"""
+    size = max(-(-len(matrix) // shards), 1)
+    columns = None
+    for part in pool.map(_compute_shard, [
+        (matrix[start:start + size], lead[start:start + size], on_hand[start:start + size], settings)
+        for start in range(0, len(matrix), size)
+    ]):
+        if columns is None:
+            columns = part
+        else:
+            for name, values in part.items():
+                columns[name].extend(values)
+    return columns if columns is not None else compute_suggestions(matrix, lead, on_hand, settings)
+
+def write_suggestions(organization_id, keys, lead, on_hand, columns, settings, now):
+    """Replace an organization's suggestions with freshly computed ones (commits)"""
+    db.session.execute(delete(ReorderSuggestion).where(ReorderSuggestion.organization_id == organization_id))
+    rows = [
+        {
+            'organization_id': organization_id,
+            'product_id': product_id,
+            'warehouse_id': warehouse_id,
+            'method': settings['method'],
+            'daily_demand': columns['daily_demand'][row],
+            'demand_std_dev': columns['demand_std_dev'][row],
+            'lead_time_days': lead[row],
+            'safety_stock': columns['safety_stock'][row],
+            'reorder_point': columns['reorder_point'][row],
+            'reorder_quantity': columns['reorder_quantity'][row],
+            'quantity_on_hand': on_hand[row],
+            'suggested_order_quantity': columns['suggested_order_quantity'][row],
+            'computed_at': now
+        }
+        for row, (product_id, warehouse_id) in enumerate(keys)
+    ]
+    for start in range(0, len(rows), WRITE_CHUNK_ROWS):
+        db.session.execute(insert(ReorderSuggestion), rows[start:start + WRITE_CHUNK_ROWS])
+    invalidate_reports(organization_id)
+    db.session.commit()
+
+def forecast_organization(organization_id, settings, pool=None, workers=1, today=None):
+    """Forecast an organization's inventory rows and store the suggestions.
+
+    Returns {'series', 'suggested', 'compute_seconds'}. With a
+    ProcessPoolExecutor as `pool` the computation is split into `workers`
+    shards.
+    """
+    keys, on_hand, matrix = load_series(organization_id, settings['history_days'], today)
+    by_product = lead_times(organization_id, settings['lead_time_days'])
+    lead = [by_product.get(product_id, settings['lead_time_days']) for product_id, _ in keys]
+
+    started = time.perf_counter()
+    if pool is not None and len(keys) > 1:
+        columns = compute_sharded(matrix, lead, on_hand, settings, pool, workers)
+    else:
+        columns = compute_suggestions(matrix, lead, on_hand, settings)
+    compute_seconds = time.perf_counter() - started
+
+    write_suggestions(organization_id, keys, lead, on_hand, columns, settings, datetime.utcnow())
+    return {
+        'series': len(keys),
+        'suggested': sum(1 for quantity in columns['suggested_order_quantity'] if quantity > 0),
+        'compute_seconds': compute_seconds
+    }
+
+def run_forecast(organization_ids=None, workers=None, **overrides):
+    """Refresh the reorder suggestions of the given organizations (default: all).
+
+    `workers` > 1 computes in a process pool of that size (default
+    FORECAST_WORKERS); keyword overrides replace forecast settings. Returns
+    {'organizations', 'series', 'suggested', 'compute_seconds', 'seconds'}.
+    Raises ValueError for invalid settings.
+    """
+    started = time.perf_counter()
+    settings = forecast_settings(**overrides)
+    if workers is None:
+        workers = current_app.config.get('FORECAST_WORKERS', 1)
+    if organization_ids is None:
+        organization_ids = db.session.execute(select(Organization.id)).scalars().all()
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    totals = {'series': 0, 'suggested': 0, 'compute_seconds': 0.0}
+    try:
+        for organization_id in organization_ids:
+            result = forecast_organization(organization_id, settings, pool, workers)
+            for name in totals:
+                totals[name] += result[name]
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return {
+        'organizations': len(organization_ids),
+        'series': totals['series'],
+        'suggested': totals['suggested'],
+        'compute_seconds': round(totals['compute_seconds'], 4),
+        'seconds': round(time.perf_counter() - started, 4)
+    }
+
+def start_reorder_forecast(app):
+    """Run run_forecast every FORECAST_INTERVAL seconds in the background"""
+    return start_periodic_job(app, 'reorder-forecast', app.config.get('FORECAST_INTERVAL', 0), run_forecast)
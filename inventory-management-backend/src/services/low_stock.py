@@ -0,0 +1,91 @@
+from datetime import datetime
+from sqlalchemy import Float, and_, case, cast, delete, insert, literal, select, tuple_
+from src.models.inventory import db, Inventory, LowStockItem, Product
+
+# The table keeps rows up to this percentage of their minimum level, so the
+# report's threshold_percentage can go this high without a base-table scan
+MAX_THRESHOLD_PERCENTAGE = 200
+
+# At or below this share of the minimum level an item is critical
+CRITICAL_RATIO = 0.25
+
+# stock_ratio at or below which an item counts as low stock (on hand <= minimum)
+LOW_STOCK_RATIO = 1
+
+LOW_STOCK_COLUMNS = (
+    'inventory_id', 'organization_id', 'product_id', 'warehouse_id', 'quantity_on_hand',
+    'minimum_stock_level', 'stock_ratio', 'criticality', 'updated_at'
+)
+
+def ratio_limit(threshold_percentage):
+    """The stock_ratio bound for a threshold given as a percentage of the minimum level"""
+    if threshold_percentage is None or not 0 <= threshold_percentage <= MAX_THRESHOLD_PERCENTAGE:
+        raise ValueError(f'threshold_percentage must be between 0 and {MAX_THRESHOLD_PERCENTAGE}')
+    return threshold_percentage / 100
+
+def _source(organization_id, now):
+    """Inventory rows of active products within the kept threshold, as low-stock rows"""
+    minimum = Product.minimum_stock_level
+    stock_ratio = case(
+        (minimum > 0, cast(Inventory.quantity_on_hand, Float) / minimum),
+        else_=0.0
+    )
+    criticality = case(
+        (and_(minimum > 0, stock_ratio <= CRITICAL_RATIO), 'critical'),
+        else_='warning'
+    )
+    statement = select(
+        Inventory.id, Inventory.organization_id, Inventory.product_id, Inventory.warehouse_id,
+        Inventory.quantity_on_hand, minimum, stock_ratio, criticality, literal(now, db.DateTime)
+    ).join(Product, Product.id == Inventory.product_id).where(
+        Product.is_active == True,
+        Inventory.quantity_on_hand * 100 <= minimum * MAX_THRESHOLD_PERCENTAGE
+    )
+    if organization_id is not None:
+        statement = statement.where(Inventory.organization_id == organization_id)
+    return statement
+
+def refresh_low_stock(organization_id, items=None, product_ids=None):
+    """Recompute the low-stock rows of some inventory rows in the current transaction.
+
+    `items` are (product_id, warehouse_id) pairs whose stock changed,
+    `product_ids` products whose active flag or minimum level changed; with
+    neither, the whole organization is rebuilt. Returns the rows written.
+    """
+    inventory_ids = select(Inventory.id).where(Inventory.organization_id == organization_id)
+    source = _source(organization_id, datetime.utcnow())
+    if items is not None:
+        if not items:
+            return 0
+        scope = tuple_(Inventory.product_id, Inventory.warehouse_id).in_(list(items))
+        inventory_ids, source = inventory_ids.where(scope), source.where(scope)
+    elif product_ids is not None:
+        if not product_ids:
+            return 0
+        scope = Inventory.product_id.in_(list(product_ids))
+        inventory_ids, source = inventory_ids.where(scope), source.where(scope)
+
+    if items is None and product_ids is None:
+        db.session.execute(delete(LowStockItem).where(LowStockItem.organization_id == organization_id))
+    else:
+        db.session.execute(delete(LowStockItem).where(LowStockItem.inventory_id.in_(inventory_ids)))
+    return db.session.execute(
+        insert(LowStockItem.__table__).from_select(list(LOW_STOCK_COLUMNS), source)
+    ).rowcount
+
+def rebuild_low_stock(organization_id=None):
+    """Recompute the low-stock table from inventory and products (not committed)"""
+    if organization_id is not None:
+        return refresh_low_stock(organization_id)
+    db.session.execute(delete(LowStockItem))
+    return db.session.execute(
+        insert(LowStockItem.__table__).from_select(list(LOW_STOCK_COLUMNS), _source(None, datetime.utcnow()))
+    ).rowcount
+
+def ensure_low_stock():
+    """Backfill the low-stock table once if it is empty but inventory already exists"""
+    has_low_stock = db.session.query(LowStockItem.inventory_id).first()
+    has_inventory = db.session.query(Inventory.id).first()
+    if has_inventory and not has_low_stock:
+        rebuild_low_stock()
+        db.session.commit()
@@ -0,0 +1,33 @@
+import threading
+import time
+from src.models.inventory import db
+
+_jobs_lock = threading.Lock()
+_jobs = {}
+
+def start_periodic_job(app, name, interval, job):
+    """Call job() in an app context every `interval` seconds on a daemon thread.
+
+    Does nothing when the interval is 0 or a job with this name is already
+    running in the process. Failures are logged and the job runs again at the
+    next interval. Returns the thread, or None when disabled.
+    """
+    if not interval:
+        return None
+
+    def run():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    job()
+                except Exception:
+                    app.logger.exception('Maintenance job %s failed', name)
+                finally:
+                    db.session.remove()
+
+    with _jobs_lock:
+        if name not in _jobs:
+            _jobs[name] = threading.Thread(target=run, name=name, daemon=True)
+            _jobs[name].start()
+        return _jobs[name]
@@ -0,0 +1,134 @@
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, inspect, select, insert
+from sqlalchemy.exc import IntegrityError
+from src.models.inventory import db
+from src.services.auth_context import AUTH_GENERATION_TRIGGERS
+from src.services.search import PRODUCT_FTS_UPDATE_TRIGGER
+
+# A schema change applied once per database. `apply` receives a connection
+# inside the migration's transaction and must be safe to run against a schema
+# that db.create_all() already brought up to date (fresh databases get the
+# current models first, then every migration is recorded).
+Migration = namedtuple('Migration', ['version', 'description', 'apply'])
+
+MIGRATIONS = []
+
+_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', _metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(255), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+def migration(version, description):
+    """Register a migration function under a version number"""
+    def decorator(func):
+        MIGRATIONS.append(Migration(version, description, func))
+        MIGRATIONS.sort(key=lambda entry: entry.version)
+        return func
+    return decorator
+
+def create_indexes(connection, *names):
+    """Create model-declared indexes by name if they do not exist yet"""
+    indexes = {index.name: index for table in db.metadata.tables.values() for index in table.indexes}
+    for name in names:
+        indexes[name].create(connection, checkfirst=True)
+
+def add_column(connection, table, column_ddl):
+    """ALTER TABLE ... ADD COLUMN unless the column is already there"""
+    column_name = column_ddl.split()[0]
+    existing = {column['name'] for column in inspect(connection).get_columns(table)}
+    if column_name not in existing:
+        connection.exec_driver_sql(f'ALTER TABLE {table} ADD COLUMN {column_ddl}')
+
+def applied_versions(engine):
+    with engine.connect() as connection:
+        return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+def apply_migrations(engine=None):
+    """Apply pending migrations in version order; returns the versions applied.
+
+    Each migration runs in its own transaction together with its version row,
+    so a failed migration leaves nothing half-recorded. If another process
+    applies the same version first, the duplicate version row is rejected and
+    this process skips it.
+    """
+    engine = engine or db.engine
+    _metadata.create_all(engine)
+    done = applied_versions(engine)
+
+    applied = []
+    for entry in MIGRATIONS:
+        if entry.version in done:
+            continue
+        try:
+            with engine.begin() as connection:
+                entry.apply(connection)
+                connection.execute(insert(schema_migrations).values(
+                    version=entry.version,
+                    description=entry.description,
+                    applied_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            continue
+        applied.append(entry.version)
+    return applied
+
+@migration(1, 'Composite indexes for the list, report and alert queries')
+def _hot_query_indexes(connection):
+    create_indexes(
+        connection,
+        'ix_categories_org_sort',
+        'ix_products_org_name',
+        'ix_products_org_category',
+        'ix_inventory_org_warehouse',
+        'ix_inventory_product',
+        'ix_movements_org_date',
+        'ix_movements_org_product_date',
+        'ix_movements_org_warehouse_date',
+        'ix_alerts_org_created',
+        'ix_alerts_org_read_created'
+    )
+
+@migration(2, 'Skip the product search update trigger when the indexed text is unchanged')
+def _product_fts_update_trigger(connection):
+    if connection.dialect.name != 'sqlite':
+        return
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+    ).first()
+    if exists:
+        connection.exec_driver_sql('DROP TRIGGER IF EXISTS products_fts_au')
+        connection.exec_driver_sql(PRODUCT_FTS_UPDATE_TRIGGER)
+
+@migration(3, 'Coalesce repeated alerts into one open alert per dedup key')
+def _alert_dedup(connection):
+    add_column(connection, 'alerts', 'warehouse_id INTEGER REFERENCES warehouses(id)')
+    add_column(connection, 'alerts', "status VARCHAR(20) NOT NULL DEFAULT 'open'")
+    add_column(connection, 'alerts', 'occurrence_count INTEGER NOT NULL DEFAULT 1')
+    add_column(connection, 'alerts', 'last_seen_at DATETIME')
+    add_column(connection, 'alerts', 'resolved_at DATETIME')
+    connection.exec_driver_sql('UPDATE alerts SET last_seen_at = created_at WHERE last_seen_at IS NULL')
+    # Existing alerts have no warehouse, so they never collide in the unique index
+    create_indexes(connection, 'ix_alerts_org_status_created', 'ux_alerts_open_key')
+
+@migration(4, 'Indexes for the alert retention sweep')
+def _alert_retention_indexes(connection):
+    create_indexes(connection, 'ix_alerts_org_expires', 'ix_alerts_org_read_seen')
+
+@migration(5, 'Covering index for daily demand series')
+def _demand_series_index(connection):
+    create_indexes(connection, 'ix_rollup_org_type_day_item')
+
+@migration(6, 'Per-organization token generation, bumped when a user loses access')
+def _auth_generation(connection):
+    add_column(connection, 'organizations', 'auth_generation INTEGER NOT NULL DEFAULT 0')
+    if connection.dialect.name == 'sqlite':
+        for statement in AUTH_GENERATION_TRIGGERS:
+            connection.exec_driver_sql(statement)
+
+@migration(7, 'Report cache generation shared by every worker')
+def _report_generation(connection):
+    add_column(connection, 'org_stats', 'report_generation INTEGER NOT NULL DEFAULT 0')
@@ -0,0 +1,351 @@
+import gzip
+import json
+import os
+import threading
+import time
+from collections import namedtuple, OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from itertools import islice
+from flask import current_app
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from src.models.inventory import db, InventoryMovement, MovementArchive, Organization
+from src.services.database import DEFAULT_DATABASE_PATH
+from src.services.maintenance import start_periodic_job
+from src.services.pagination import page_args, count_total, decode_cursor, encode_cursor, paginate
+
+DEFAULT_ARCHIVE_DIR = os.path.join(os.path.dirname(DEFAULT_DATABASE_PATH), 'movement_archive')
+DEFAULT_HORIZON_DAYS = 365
+# The dashboard's recent movements and the first pages of the history must stay hot
+MIN_HORIZON_DAYS = 31
+ARCHIVE_BATCH_ROWS = 5000
+# Decoded months kept in memory for paging through archived history
+MONTH_CACHE_ROWS = 500000
+
+_DATETIME_COLUMNS = ('movement_date', 'created_at')
+
+# An archived month as readers see it: the file, its row count and the
+# [start, end) range of movement dates it covers
+ArchivedMonth = namedtuple('ArchivedMonth', ['path', 'row_count', 'start', 'end'])
+
+_cache_lock = threading.Lock()
+_month_cache = OrderedDict()
+_cached_rows = 0
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+def add_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+def _at_midnight(day):
+    return datetime(day.year, day.month, day.day)
+
+def naive_utc(value):
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def archive_directory():
+    return current_app.config.get('MOVEMENT_ARCHIVE_DIR') or DEFAULT_ARCHIVE_DIR
+
+def _encode(row):
+    values = {}
+    for name, value in row.items():
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+        values[name] = value
+    return json.dumps(values, separators=(',', ':'))
+
+def _decode(line):
+    row = json.loads(line)
+    for name in _DATETIME_COLUMNS:
+        if row[name] is not None:
+            row[name] = datetime.fromisoformat(row[name])
+    if row['unit_cost'] is not None:
+        row['unit_cost'] = Decimal(row['unit_cost'])
+    return row
+
+def archived_until(organization_id):
+    """Where an organization's hot ledger starts: every movement before it is
+    archived. None when nothing has been archived."""
+    last = db.session.execute(
+        select(func.max(MovementArchive.next_month)).where(MovementArchive.organization_id == organization_id)
+    ).scalar()
+    return _at_midnight(last) if last else None
+
+def archive_files(organization_id, date_from=None, date_to=None, descending=False):
+    """ArchivedMonths of an organization overlapping [date_from, date_to], in month order"""
+    query = select(MovementArchive).where(MovementArchive.organization_id == organization_id)
+    date_from, date_to = naive_utc(date_from), naive_utc(date_to)
+    if date_from is not None:
+        query = query.where(MovementArchive.month >= month_start(date_from))
+    if date_to is not None:
+        query = query.where(MovementArchive.month <= date_to.date())
+    order = MovementArchive.month.desc() if descending else MovementArchive.month
+    directory = archive_directory()
+    return [
+        ArchivedMonth(
+            os.path.join(directory, record.path), record.row_count,
+            _at_midnight(record.month), _at_midnight(record.next_month)
+        )
+        for record in db.session.execute(query.order_by(order)).scalars()
+    ]
+
+def _iter_month(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as handle:
+        for line in handle:
+            yield _decode(line)
+
+def _cached_month(path):
+    """All rows of an archive file, decoded once and kept in a small LRU"""
+    global _cached_rows
+    key = (path, os.stat(path).st_mtime_ns)
+    with _cache_lock:
+        rows = _month_cache.get(key)
+        if rows is not None:
+            _month_cache.move_to_end(key)
+            return rows
+
+    rows = list(_iter_month(path))
+    with _cache_lock:
+        if key not in _month_cache:
+            _month_cache[key] = rows
+            _cached_rows += len(rows)
+            while _cached_rows > MONTH_CACHE_ROWS and len(_month_cache) > 1:
+                _, dropped = _month_cache.popitem(last=False)
+                _cached_rows -= len(dropped)
+    return rows
+
+def archived_rows(months, date_from=None, date_to=None, before=None, product_id=None, warehouse_id=None,
+                  movement_type=None, descending=False):
+    """Yield archived movement dicts from `months` in (movement_date, id) order.
+
+    date_from and date_to are inclusive, `before` exclusive. Descending reads
+    go through the decoded-month cache; ascending reads stream each file, so
+    exports do not hold whole months in memory. Needs no app context.
+    """
+    date_from, date_to, before = naive_utc(date_from), naive_utc(date_to), naive_utc(before)
+    for month in months:
+        rows = reversed(_cached_month(month.path)) if descending else _iter_month(month.path)
+        for row in rows:
+            moved = row['movement_date']
+            if date_from is not None and moved < date_from:
+                if descending:
+                    break
+                continue
+            if (date_to is not None and moved > date_to) or (before is not None and moved >= before):
+                if descending:
+                    continue
+                break
+            if product_id and row['product_id'] != product_id:
+                continue
+            if warehouse_id and row['warehouse_id'] != warehouse_id:
+                continue
+            if movement_type and row['movement_type'] != movement_type:
+                continue
+            yield row
+
+def archived_count(months, date_from=None, date_to=None, **filters):
+    """Number of archived movements matching a range and row filters.
+
+    Months wholly inside an unfiltered range use their recorded row_count;
+    the rest are counted from the decoded-month cache.
+    """
+    date_from, date_to = naive_utc(date_from), naive_utc(date_to)
+    total = 0
+    for month in months:
+        inside = (date_from is None or date_from <= month.start) and (date_to is None or date_to >= month.end)
+        if inside and not any(filters.values()):
+            total += month.row_count
+        else:
+            total += sum(1 for _ in archived_rows([month], date_from, date_to, descending=True, **filters))
+    return total
+
+def paginate_movements(query, args, organization_id, filters, default_limit=50, count_scope=None):
+    """paginate() for the movement history, newest first, fanning out to the
+    archive when the requested range reaches before the hot ledger.
+
+    `query` selects the organization's movements with the filters applied;
+    `filters` holds the same date_from, date_to, product_id, warehouse_id and
+    movement_type for the archive. Pages and cursors run across the hot ledger
+    and then the archived months as if they were one table. Archived
+    movements are returned as transient InventoryMovement instances.
+    """
+    sort_column, id_column = InventoryMovement.movement_date, InventoryMovement.id
+    boundary = archived_until(organization_id)
+    if boundary is not None:
+        # Rows of a month being archived are hidden as soon as the month is recorded
+        query = query.filter(sort_column >= boundary)
+    date_from = naive_utc(filters.get('date_from'))
+    months = []
+    if boundary is not None and (date_from is None or date_from < boundary):
+        months = archive_files(organization_id, date_from, filters.get('date_to'), descending=True)
+    if not months:
+        return paginate(query, args, sort_column, id_column, descending=True,
+                        default_limit=default_limit, count_scope=count_scope)
+
+    limit, keyset, total_mode = page_args(args, default_limit)
+    row_filters = {name: filters.get(name) for name in ('product_id', 'warehouse_id', 'movement_type')}
+    cold_rows = archived_rows(months, date_from, filters.get('date_to'), descending=True, **row_filters)
+    hot_total = count_total(query, args, total_mode, count_scope)
+    total = None
+    if hot_total is not None:
+        total = hot_total + archived_count(months, date_from, filters.get('date_to'), **row_filters)
+    ordered = query.order_by(sort_column.desc(), id_column.desc())
+
+    if keyset:
+        cursor = args.get('cursor')
+        position = decode_cursor(cursor, sort_column) if cursor else None
+        items = []
+        if position is None or position[0] >= boundary:
+            if position is not None:
+                ordered = ordered.filter(tuple_(sort_column, id_column) < position)
+            items = ordered.limit(limit + 1).all()
+        elif position is not None:
+            cold_rows = (row for row in cold_rows if (row['movement_date'], row['id']) < position)
+        if len(items) <= limit:
+            items += [InventoryMovement(**row) for row in islice(cold_rows, limit + 1 - len(items))]
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(items[-1].movement_date, items[-1].id)
+        return items, {'total': total, 'limit': limit, 'next_cursor': next_cursor}
+
+    page = max(args.get('page', 1, type=int) or 1, 1)
+    skip = (page - 1) * limit
+    hot_rows = hot_total if total_mode == 'exact' else query.count()
+    items = ordered.offset(skip).limit(limit).all() if skip < hot_rows else []
+    if len(items) < limit:
+        cold_skip = max(skip - hot_rows, 0)
+        items += [InventoryMovement(**row) for row in islice(cold_rows, cold_skip, cold_skip + limit - len(items))]
+    return items, {
+        'total': total,
+        'page': page,
+        'pages': (total + limit - 1) // limit if total is not None else None
+    }
+
+def _delete_hot_rows(organization_id, start, end, batch_rows):
+    """Delete an archived month's rows from inventory_movements, one batch per transaction"""
+    table = InventoryMovement.__table__
+    deleted = 0
+    while True:
+        ids = db.session.execute(
+            select(table.c.id).where(
+                table.c.organization_id == organization_id,
+                table.c.movement_date >= start,
+                table.c.movement_date < end
+            ).limit(batch_rows)
+        ).scalars().all()
+        if not ids:
+            return deleted
+        db.session.execute(delete(table).where(table.c.id.in_(ids)))
+        db.session.commit()
+        deleted += len(ids)
+
+def archive_month(organization_id, month, batch_rows=ARCHIVE_BATCH_ROWS):
+    """Move one month of an organization's movements into its archive file.
+
+    The file is written and renamed into place first, then the month is
+    recorded, which hides its rows from the hot queries, and finally the rows
+    are deleted in batches. A month that is already recorded (an earlier run
+    stopped while deleting) only has its remaining rows deleted. Returns
+    (rows archived, bytes written).
+    """
+    start, end = _at_midnight(month), _at_midnight(add_month(month))
+    if db.session.get(MovementArchive, (organization_id, month)) is not None:
+        _delete_hot_rows(organization_id, start, end, batch_rows)
+        return 0, 0
+
+    relative_path = os.path.join(str(organization_id), f'{month:%Y-%m}.ndjson.gz')
+    path = os.path.join(archive_directory(), relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = InventoryMovement.__table__
+    statement = select(table).where(
+        table.c.organization_id == organization_id,
+        table.c.movement_date >= start,
+        table.c.movement_date < end
+    ).order_by(table.c.movement_date, table.c.id)
+
+    rows = 0
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as compressed:
+            result = db.session.execute(statement.execution_options(yield_per=batch_rows))
+            for partition in result.mappings().partitions():
+                compressed.write(''.join(_encode(row) + '\n' for row in partition).encode('utf-8'))
+                rows += len(partition)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(temporary, path)
+    size = os.path.getsize(path)
+
+    try:
+        db.session.add(MovementArchive(
+            organization_id=organization_id,
+            month=month,
+            next_month=add_month(month),
+            path=relative_path,
+            row_count=rows,
+            bytes=size,
+            archived_at=datetime.utcnow()
+        ))
+        db.session.commit()
+    except IntegrityError:
+        # Another process archived the same month first; its file is in place
+        db.session.rollback()
+        rows, size = 0, 0
+    _delete_hot_rows(organization_id, start, end, batch_rows)
+    return rows, size
+
+def archive_movements(organization_ids=None, horizon_days=None, now=None, batch_rows=ARCHIVE_BATCH_ROWS):
+    """Archive every whole month of movements older than the horizon.
+
+    Months go oldest first for each organization. The horizon defaults to
+    MOVEMENT_ARCHIVE_HORIZON_DAYS and cannot be shorter than MIN_HORIZON_DAYS.
+    The daily rollup is left alone, so reports over archived days are
+    unchanged. Returns {'organizations', 'months', 'rows', 'bytes', 'seconds'}.
+    """
+    started = time.perf_counter()
+    horizon_days = horizon_days or current_app.config.get('MOVEMENT_ARCHIVE_HORIZON_DAYS', DEFAULT_HORIZON_DAYS)
+    if horizon_days < MIN_HORIZON_DAYS:
+        raise ValueError(f'The archive horizon must be at least {MIN_HORIZON_DAYS} days')
+    cutoff = _at_midnight(month_start((now or datetime.utcnow()) - timedelta(days=horizon_days)))
+    if organization_ids is None:
+        organization_ids = db.session.execute(select(Organization.id)).scalars().all()
+
+    summary = {'organizations': 0, 'months': 0, 'rows': 0, 'bytes': 0}
+    table = InventoryMovement.__table__
+    for organization_id in organization_ids:
+        archived_any = False
+        since = None
+        while True:
+            oldest = select(func.min(table.c.movement_date)).where(
+                table.c.organization_id == organization_id,
+                table.c.movement_date < cutoff
+            )
+            if since is not None:
+                oldest = oldest.where(table.c.movement_date >= since)
+            oldest = db.session.execute(oldest).scalar()
+            if oldest is None:
+                break
+            month = month_start(oldest)
+            rows, size = archive_month(organization_id, month, batch_rows)
+            summary['months'] += 1 if rows else 0
+            summary['rows'] += rows
+            summary['bytes'] += size
+            archived_any = True
+            since = _at_midnight(add_month(month))
+        summary['organizations'] += 1 if archived_any else 0
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    return summary
+
+def start_movement_archiver(app):
+    """Run archive_movements every MOVEMENT_ARCHIVE_INTERVAL seconds in the background"""
+    return start_periodic_job(
+        app, 'movement-archiver', app.config.get('MOVEMENT_ARCHIVE_INTERVAL', 0), archive_movements
+    )
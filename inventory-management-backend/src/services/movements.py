@@ -0,0 +1,334 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import insert, update, bindparam
+from sqlalchemy.exc import IntegrityError
+from src.models.inventory import db, Product, Warehouse, Inventory, InventoryMovement
+from src.services.alerts import StockLevel, evaluate_low_stock
+from src.services.low_stock import refresh_low_stock
+from src.services.report_cache import invalidate_reports
+from src.services.rollups import record_movement_rollups
+from src.services.stats import bump_org_stats, merge_deltas, stock_change_deltas
+from src.services.upsert import dialect_insert
+from src.services.valuation import record_valuation
+
+VALID_MOVEMENT_TYPES = ('in', 'out', 'adjustment', 'transfer')
+REQUIRED_MOVEMENT_FIELDS = ('product_id', 'warehouse_id', 'movement_type', 'quantity')
+MAX_BATCH_SIZE = 10000
+BATCH_RETRIES = 3
+
+class InsufficientStock(Exception):
+    """An outbound movement would take stock below zero"""
+
+class ConcurrentStockUpdate(Exception):
+    """Stock read by a batch was changed by another writer before it was applied"""
+
+def validate_movement_line(data):
+    """Return an error message for a malformed movement payload, or None"""
+    if not isinstance(data, dict):
+        return 'Movement must be an object'
+    for field in REQUIRED_MOVEMENT_FIELDS:
+        if field not in data:
+            return f'{field} is required'
+    for field in ('product_id', 'warehouse_id'):
+        if not isinstance(data[field], int) or isinstance(data[field], bool):
+            return f'{field} must be an integer'
+    if data['movement_type'] not in VALID_MOVEMENT_TYPES:
+        return 'Invalid movement type'
+    if not isinstance(data['quantity'], int) or isinstance(data['quantity'], bool):
+        return 'quantity must be an integer'
+    if data['movement_type'] == 'adjustment':
+        if data['quantity'] < 0:
+            return 'quantity must not be negative for an adjustment'
+    elif data['quantity'] <= 0:
+        return 'quantity must be a positive integer'
+    unit_cost = data.get('unit_cost')
+    if unit_cost is not None:
+        try:
+            if isinstance(unit_cost, bool) or not Decimal(str(unit_cost)).is_finite() or Decimal(str(unit_cost)) < 0:
+                raise InvalidOperation
+        except InvalidOperation:
+            return 'unit_cost must be a non-negative number'
+    return None
+
+def stock_after(quantity_on_hand, movement_type, quantity):
+    """Stock level after a movement: 'adjustment' sets an absolute value and
+    'transfer' leaves it unchanged"""
+    if movement_type == 'in':
+        return quantity_on_hand + quantity
+    if movement_type == 'out':
+        return quantity_on_hand - quantity
+    if movement_type == 'adjustment':
+        return quantity
+    return quantity_on_hand
+
+def _upsert_stock(organization_id, product_id, warehouse_id, quantity, absolute, now):
+    insert_stmt = dialect_insert()(Inventory).values(
+        organization_id=organization_id,
+        product_id=product_id,
+        warehouse_id=warehouse_id,
+        quantity_on_hand=quantity,
+        quantity_reserved=0,
+        last_movement_at=now,
+        created_at=now,
+        updated_at=now
+    )
+    excluded = insert_stmt.excluded.quantity_on_hand
+    stmt = insert_stmt.on_conflict_do_update(
+        index_elements=['organization_id', 'product_id', 'warehouse_id'],
+        set_={
+            'quantity_on_hand': excluded if absolute else Inventory.quantity_on_hand + excluded,
+            'last_movement_at': now,
+            'updated_at': now
+        }
+    ).returning(Inventory)
+    return db.session.scalars(stmt, execution_options={'populate_existing': True}).first()
+
+def apply_stock_change(organization_id, product_id, warehouse_id, movement_type, quantity):
+    """Apply a movement to the stock level without a read-modify-write.
+
+    'in' and 'out' run one conditional UPDATE that adds the delta only where the
+    result stays non-negative, so concurrent writers can neither lose updates
+    nor oversell. A missing row is created with an upsert. 'adjustment' upserts
+    the absolute value and 'transfer' only checks availability.
+
+    Returns (inventory, previous_quantity); previous_quantity is None when the
+    row was created. Raises InsufficientStock.
+    """
+    now = datetime.utcnow()
+    key = (
+        Inventory.organization_id == organization_id,
+        Inventory.product_id == product_id,
+        Inventory.warehouse_id == warehouse_id
+    )
+    if movement_type == 'adjustment':
+        # Take the row's write lock first so the value being replaced is known
+        previous = db.session.execute(
+            update(Inventory.__table__).where(*key).values(updated_at=now).returning(
+                Inventory.__table__.c.quantity_on_hand
+            )
+        ).scalar()
+        inventory = _upsert_stock(organization_id, product_id, warehouse_id, quantity, True, now)
+        return inventory, previous
+
+    delta = {'in': quantity, 'out': -quantity}.get(movement_type, 0)
+    check = -quantity if movement_type == 'transfer' else delta
+    stmt = update(Inventory).where(
+        *key,
+        Inventory.quantity_on_hand + check >= 0
+    ).values(
+        quantity_on_hand=Inventory.quantity_on_hand + delta,
+        last_movement_at=now,
+        updated_at=now
+    ).returning(Inventory)
+    inventory = db.session.scalars(stmt, execution_options={'populate_existing': True}).first()
+    if inventory:
+        return inventory, inventory.quantity_on_hand - delta
+
+    # No row matched: either the item has never been stocked here (stock is 0)
+    # or there is not enough of it
+    if check < 0:
+        raise InsufficientStock()
+    inventory = _upsert_stock(organization_id, product_id, warehouse_id, delta, False, now)
+    return inventory, None
+
+def apply_movement_batch(organization_id, user_id, lines, atomic=True):
+    """Validate and apply a list of movement payloads in a single transaction.
+
+    Product and warehouse ids are checked with one IN query each, lines are
+    applied in order against the running stock level (so several lines for the
+    same item accumulate), and inventory and ledger rows are written with bulk
+    statements. Low stock alerts are written in the same transaction. In
+    atomic mode any failed line rejects the whole batch; otherwise failed
+    lines are skipped.
+
+    Inventory rows are only written if they still hold the quantities read at
+    the start; if another writer got there first the batch is re-evaluated, up
+    to BATCH_RETRIES times.
+
+    Returns (results, summary, committed). Raises ConcurrentStockUpdate.
+    """
+    for attempt in range(BATCH_RETRIES):
+        try:
+            return _apply_movement_batch(organization_id, user_id, lines, atomic)
+        except ConcurrentStockUpdate:
+            db.session.rollback()
+    raise ConcurrentStockUpdate()
+
+def _apply_movement_batch(organization_id, user_id, lines, atomic):
+    results = [None] * len(lines)
+    valid = []
+    for index, line in enumerate(lines):
+        error = validate_movement_line(line)
+        if error:
+            results[index] = {'index': index, 'status': 'failed', 'error': error}
+        else:
+            valid.append(index)
+
+    product_ids = {lines[index]['product_id'] for index in valid}
+    warehouse_ids = {lines[index]['warehouse_id'] for index in valid}
+
+    products = {}
+    warehouses = {}
+    stock = {}
+    inventory_ids = {}
+    if valid:
+        products = {
+            row.id: row for row in db.session.query(
+                Product.id, Product.name, Product.sku, Product.minimum_stock_level,
+                Product.is_active, Product.cost_price
+            ).filter(
+                Product.organization_id == organization_id,
+                Product.id.in_(product_ids)
+            )
+        }
+        warehouses = {
+            row.id: row.name for row in db.session.query(Warehouse.id, Warehouse.name).filter(
+                Warehouse.organization_id == organization_id,
+                Warehouse.id.in_(warehouse_ids)
+            )
+        }
+        for row in db.session.query(
+            Inventory.id, Inventory.product_id, Inventory.warehouse_id, Inventory.quantity_on_hand
+        ).filter(
+            Inventory.organization_id == organization_id,
+            Inventory.product_id.in_(products.keys()),
+            Inventory.warehouse_id.in_(warehouses.keys())
+        ):
+            key = (row.product_id, row.warehouse_id)
+            stock[key] = row.quantity_on_hand
+            inventory_ids[key] = row.id
+    initial = dict(stock)
+
+    applied = []
+    touched = set()
+    for index in valid:
+        line = lines[index]
+        key = (line['product_id'], line['warehouse_id'])
+        if key[0] not in products:
+            results[index] = {'index': index, 'status': 'failed', 'error': 'Product not found'}
+            continue
+        if key[1] not in warehouses:
+            results[index] = {'index': index, 'status': 'failed', 'error': 'Warehouse not found'}
+            continue
+
+        current = stock.get(key, 0)
+        quantity = line['quantity']
+        movement_type = line['movement_type']
+        # Same rule as apply_stock_change: stock never goes below zero
+        after = stock_after(current, movement_type, quantity)
+        if after < 0 or (movement_type == 'transfer' and current < quantity):
+            results[index] = {'index': index, 'status': 'failed', 'error': 'Insufficient stock'}
+            continue
+
+        current = after
+        stock[key] = current
+        touched.add(key)
+        applied.append(index)
+        results[index] = {'index': index, 'status': 'applied', 'quantity_on_hand': current}
+
+    failed = sum(1 for result in results if result['status'] == 'failed')
+    summary = {
+        'mode': 'atomic' if atomic else 'best_effort',
+        'received': len(lines),
+        'applied': len(applied),
+        'failed': failed,
+        'alerts_created': 0,
+        'alerts_updated': 0,
+        'alerts_resolved': 0
+    }
+    if not applied or (atomic and failed):
+        if atomic and failed:
+            summary['applied'] = 0
+            for index in applied:
+                results[index] = {'index': index, 'status': 'skipped'}
+        return results, summary, False
+
+    now = datetime.utcnow()
+    existing = [key for key in touched if key in inventory_ids]
+    new = [key for key in touched if key not in inventory_ids]
+    if existing:
+        table = Inventory.__table__
+        result = db.session.execute(
+            update(table).where(
+                table.c.id == bindparam('inventory_id'),
+                table.c.quantity_on_hand == bindparam('expected')
+            ).values(
+                quantity_on_hand=bindparam('new_quantity'),
+                last_movement_at=now,
+                updated_at=now
+            ),
+            [
+                {
+                    'inventory_id': inventory_ids[key],
+                    'expected': initial[key],
+                    'new_quantity': stock[key]
+                }
+                for key in existing
+            ]
+        )
+        if result.rowcount != len(existing):
+            raise ConcurrentStockUpdate()
+    if new:
+        try:
+            db.session.execute(insert(Inventory), [
+                {
+                    'organization_id': organization_id,
+                    'product_id': key[0],
+                    'warehouse_id': key[1],
+                    'quantity_on_hand': stock[key],
+                    'quantity_reserved': 0,
+                    'last_movement_at': now
+                }
+                for key in new
+            ])
+        except IntegrityError:
+            # Another writer created one of these rows in the meantime
+            raise ConcurrentStockUpdate()
+
+    # Ids are allocated in ascending order within the multi-row INSERT, so sorting
+    # them maps back to parameter order without falling back to row-at-a-time
+    # inserts (which sort_by_parameter_order=True does on SQLite)
+    movement_rows = [
+        {
+            'organization_id': organization_id,
+            'product_id': lines[index]['product_id'],
+            'warehouse_id': lines[index]['warehouse_id'],
+            'movement_type': lines[index]['movement_type'],
+            'quantity': lines[index]['quantity'],
+            'unit_cost': lines[index].get('unit_cost'),
+            'reference_type': lines[index].get('reference_type'),
+            'reference_id': lines[index].get('reference_id'),
+            'notes': lines[index].get('notes'),
+            'user_id': user_id,
+            'movement_date': now
+        }
+        for index in applied
+    ]
+    movement_ids = sorted(db.session.scalars(
+        insert(InventoryMovement).returning(InventoryMovement.id), movement_rows
+    ).all())
+    for index, movement_id, row in zip(applied, movement_ids, movement_rows):
+        results[index]['movement_id'] = movement_id
+        row['movement_id'] = movement_id
+    record_movement_rollups(movement_rows)
+    value_changes = record_valuation(organization_id, movement_rows)
+
+    bump_org_stats(organization_id, **merge_deltas(*(
+        stock_change_deltas(products[key[0]], initial.get(key), stock[key], value_changes[key])
+        for key in touched
+    )))
+    refresh_low_stock(organization_id, items=touched)
+
+    # Alerts are evaluated once per item, not per line, in the same transaction
+    alerts = evaluate_low_stock(organization_id, [
+        StockLevel(products[key[0]], key[1], warehouses[key[1]], initial.get(key), stock[key])
+        for key in touched
+    ])
+    invalidate_reports(organization_id)
+
+    db.session.commit()
+
+    summary['alerts_created'] = alerts['created']
+    summary['alerts_updated'] = alerts['updated']
+    summary['alerts_resolved'] = alerts['resolved']
+    return results, summary, True
@@ -0,0 +1,118 @@
+import base64
+import json
+import time
+from datetime import datetime
+from sqlalchemy import DateTime, tuple_
+
+# Valid values for ?total=. 'cached' reuses a recent exact count for the same
+# filters, 'none' skips counting altogether.
+TOTAL_MODES = ('exact', 'cached', 'none')
+
+COUNT_CACHE_TTL = 60  # seconds
+COUNT_CACHE_MAX_ENTRIES = 1024
+
+# Arguments that select a page rather than the result set being counted
+_PAGING_ARGS = {'page', 'limit', 'cursor', 'total', 'fields', 'expand'}
+
+_count_cache = {}
+
+def encode_cursor(value, row_id):
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([value, row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, sort_column):
+    """Decode a cursor produced by encode_cursor. Raises ValueError if malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if isinstance(sort_column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        return value, int(row_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+def _cached_count(query, key):
+    now = time.monotonic()
+    entry = _count_cache.get(key)
+    if entry and entry[0] > now:
+        return entry[1]
+
+    total = query.count()
+    if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+        for stale_key in [k for k, (expires, _) in _count_cache.items() if expires <= now]:
+            del _count_cache[stale_key]
+        if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+            _count_cache.clear()
+    _count_cache[key] = (now + COUNT_CACHE_TTL, total)
+    return total
+
+def page_args(args, default_limit=20):
+    """(limit, keyset, total mode) from the request arguments. Raises ValueError."""
+    limit = args.get('limit', default_limit, type=int)
+    if not limit or limit < 1:
+        raise ValueError('limit must be a positive integer')
+
+    keyset = 'cursor' in args
+    total_mode = args.get('total', 'none' if keyset else 'exact')
+    if total_mode not in TOTAL_MODES:
+        raise ValueError(f'total must be one of: {", ".join(TOTAL_MODES)}')
+    return limit, keyset, total_mode
+
+def count_total(query, args, total_mode, count_scope=None):
+    """Row count of a query for a ?total= mode, or None for 'none'"""
+    if total_mode == 'exact':
+        return query.count()
+    if total_mode == 'cached':
+        filters = tuple(sorted((k, v) for k, v in args.items(multi=True) if k not in _PAGING_ARGS))
+        return _cached_count(query, (count_scope, filters))
+    return None
+
+def paginate(query, args, sort_column, id_column, descending=False, default_limit=20, count_scope=None):
+    """Apply offset or keyset pagination to a query.
+
+    Keyset mode is selected by passing ?cursor= (empty for the first page) and
+    seeks on (sort_column, id_column), so deep pages cost the same as the
+    first one. ?total= chooses between an exact count, a cached count keyed on
+    `count_scope` plus the filter arguments, or no count at all; keyset mode
+    skips the count unless asked.
+
+    Returns (items, page_info). Raises ValueError for invalid arguments.
+    """
+    limit, keyset, total_mode = page_args(args, default_limit)
+    total = count_total(query, args, total_mode, count_scope)
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    if keyset:
+        cursor = args.get('cursor')
+        if cursor:
+            value, last_id = decode_cursor(cursor, sort_column)
+            key = tuple_(sort_column, id_column)
+            query = query.filter(key < (value, last_id) if descending else key > (value, last_id))
+
+        items = query.limit(limit + 1).all()
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+        return items, {
+            'total': total,
+            'limit': limit,
+            'next_cursor': next_cursor
+        }
+
+    page = max(args.get('page', 1, type=int) or 1, 1)
+    items = query.offset((page - 1) * limit).limit(limit).all()
+    return items, {
+        'total': total,
+        'page': page,
+        'pages': (total + limit - 1) // limit if total is not None else None
+    }
@@ -0,0 +1,101 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app, has_app_context
+import bcrypt
+
+DEFAULT_ROUNDS = 12
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_QUEUE = 8
+DEFAULT_TIMEOUT = 2.0  # seconds a caller waits for its hash, queueing included
+DEFAULT_NICE = 10  # added to the hashing processes' niceness
+
+class PasswordHasherBusy(Exception):
+    """Too many password hashes are already running or waiting, or the hash
+    did not finish within PASSWORD_HASH_TIMEOUT"""
+
+_pool_lock = threading.Lock()
+_pool = None
+_slots = None
+
+def _setting(name, default):
+    return current_app.config.get(name, default) if has_app_context() else default
+
+def _lower_priority(increment):
+    try:
+        os.nice(increment)
+    except OSError:
+        pass
+
+def _executor():
+    """The hashing process pool, created on first use.
+
+    bcrypt runs in PASSWORD_HASH_WORKERS separate processes reniced by
+    PASSWORD_HASH_NICE, so under load the scheduler serves the API workers
+    before a burst of logins. At most PASSWORD_HASH_QUEUE more hashes may
+    wait for a process; beyond that callers are turned away, and a caller
+    gives up on its hash after PASSWORD_HASH_TIMEOUT seconds.
+    """
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            workers = _setting('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_lower_priority,
+                initargs=(_setting('PASSWORD_HASH_NICE', DEFAULT_NICE),)
+            )
+            _slots = threading.BoundedSemaphore(workers + _setting('PASSWORD_HASH_QUEUE', DEFAULT_QUEUE))
+        return _pool, _slots
+
+def _discard(pool):
+    """Forget a broken pool so the next hash starts a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _run(func, *args):
+    pool, slots = _executor()
+    if not slots.acquire(blocking=False):
+        raise PasswordHasherBusy()
+    try:
+        future = pool.submit(func, *args)
+    except BrokenProcessPool:
+        slots.release()
+        _discard(pool)
+        raise PasswordHasherBusy()
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=_setting('PASSWORD_HASH_TIMEOUT', DEFAULT_TIMEOUT))
+    except TimeoutError:
+        future.cancel()  # drops it if still queued; a running hash finishes unseen
+        raise PasswordHasherBusy()
+    except BrokenProcessPool:
+        _discard(pool)
+        raise PasswordHasherBusy()
+
+def configured_rounds():
+    """bcrypt cost factor from BCRYPT_ROUNDS"""
+    return _setting('BCRYPT_ROUNDS', DEFAULT_ROUNDS)
+
+def hash_password(password):
+    """Hash a password at the configured cost in the hashing processes"""
+    salt = bcrypt.gensalt(rounds=configured_rounds())
+    return _run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+def verify_password(password, password_hash):
+    """Check a password against a bcrypt hash in the hashing processes"""
+    return _run(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+def needs_rehash(password_hash):
+    """Whether a hash was made at a different cost than the configured one"""
+    try:
+        return int(password_hash.split('$')[2]) != configured_rounds()
+    except (IndexError, ValueError):
+        return True
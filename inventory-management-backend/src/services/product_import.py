@@ -0,0 +1,412 @@
+import csv
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
+from src.models.inventory import db, Product, Category, ProductImport
+from src.services.low_stock import refresh_low_stock
+from src.services.report_cache import invalidate_reports
+from src.services.search import resume_product_search_index, suspend_product_search_index
+from src.services.stats import bump_org_stats, merge_deltas, products_change_deltas
+from src.services.upsert import dialect_insert
+
+IMPORT_FORMATS = ('csv', 'json', 'ndjson')
+DEFAULT_CHUNK_ROWS = 5000
+MAX_IMPORT_ERRORS = 1000  # row errors kept on the import record
+DEFAULT_IMPORT_WORKERS = 2
+DEFAULT_SEARCH_REBUILD_BYTES = 1024 * 1024  # uploads this large rebuild the search index once at the end
+JSON_READ_CHARS = 64 * 1024
+
+_pool_lock = threading.Lock()
+_pool = None
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    lowered = str(value).lower()
+    if lowered not in ('1', '0', 'true', 'false', 'yes', 'no'):
+        raise ValueError
+    return lowered in ('1', 'true', 'yes')
+
+def _parse_int(value):
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError
+    return int(value)
+
+def _parse_decimal(value):
+    return Decimal(value if isinstance(value, str) else str(value))
+
+# Importable product columns and the parser for each. A blank value takes the
+# column's default ('category' is resolved to category_id).
+IMPORT_COLUMNS = {
+    'sku': str,
+    'name': str,
+    'description': str,
+    'category': str,
+    'category_id': _parse_int,
+    'brand': str,
+    'unit_of_measure': str,
+    'cost_price': _parse_decimal,
+    'selling_price': _parse_decimal,
+    'minimum_stock_level': _parse_int,
+    'maximum_stock_level': _parse_int,
+    'reorder_point': _parse_int,
+    'reorder_quantity': _parse_int,
+    'barcode': str,
+    'image_url': str,
+    'weight': _parse_decimal,
+    'dimensions': str,
+    'is_active': _parse_bool
+}
+BLANK_DEFAULTS = {
+    'unit_of_measure': 'piece',
+    'minimum_stock_level': 0,
+    'reorder_point': 0,
+    'reorder_quantity': 0,
+    'is_active': True
+}
+STATE_COLUMNS = ('is_active', 'cost_price', 'minimum_stock_level')
+
+class ImportRowError(ValueError):
+    """A row that cannot be imported; the rest of the import continues"""
+
+def read_json_array(text, read_chars=JSON_READ_CHARS):
+    """Yield the elements of a JSON array from a text stream one at a time.
+
+    Only the element being decoded is held in memory. A syntax error raises
+    ValueError when it is reached, after the elements before it were yielded.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+
+    def read_more():
+        nonlocal buffer, position, eof
+        chunk = text.read(read_chars)
+        buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+
+    def next_char():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or eof:
+                return buffer[position:position + 1]
+            read_more()
+
+    if next_char() != '[':
+        raise ValueError('JSON imports must be an array of objects')
+    position += 1
+    if next_char() == ']':
+        position += 1
+    else:
+        while True:
+            next_char()
+            while True:
+                # A value that ends the buffer may continue in the next read
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                    if end < len(buffer) or eof:
+                        break
+                except json.JSONDecodeError as e:
+                    if eof:
+                        raise ValueError(f'Invalid JSON: {e}')
+                read_more()
+            position = end
+            yield value
+            separator = next_char()
+            position += 1
+            if separator == ']':
+                break
+            if separator != ',':
+                raise ValueError('Invalid JSON: expected "," or "]" after an array element')
+    if next_char():
+        raise ValueError('Invalid JSON: data after the array')
+
+def read_rows(stream, source_format):
+    """Yield (row number, raw dict) from a binary stream without loading it whole.
+
+    CSV needs a header row, JSON an array of objects and NDJSON one object
+    per line. An invalid NDJSON line fails only that row; invalid JSON or CSV
+    structure fails the import where it is reached.
+    """
+    lines = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if source_format == 'json':
+        yield from enumerate(read_json_array(lines), 1)
+        return
+
+    if source_format == 'csv':
+        yield from enumerate(csv.DictReader(lines), 1)
+        return
+
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError as e:
+                yield number, ImportRowError(f'Invalid JSON: {e}')
+
+def _parse_value(name, parse, default, value):
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return default
+        if parse is str:
+            return value
+    elif value is None:
+        return default
+    try:
+        return parse(value)
+    except (ValueError, InvalidOperation):
+        raise ImportRowError(f'Invalid {name}: {value!r}')
+
+_row_specs = {}
+
+def _row_spec(names):
+    """(name, parser, blank default) for each column of a row, built once per
+    distinct column set; raises ImportRowError for unknown columns"""
+    key = tuple(names)
+    spec = _row_specs.get(key)
+    if spec is None:
+        unknown = [name for name in key if name not in IMPORT_COLUMNS]
+        if unknown:
+            raise ImportRowError(f'Unknown columns: {", ".join(sorted(map(str, unknown)))}')
+        spec = [(name, IMPORT_COLUMNS[name], BLANK_DEFAULTS.get(name)) for name in key]
+        if len(_row_specs) < 1024:
+            _row_specs[key] = spec
+    return spec
+
+class CategoryLookup:
+    """An organization's category ids by id and lower-cased name, loaded once"""
+
+    def __init__(self, organization_id):
+        self.by_name = {}
+        self.ids = set()
+        for category_id, name in db.session.execute(
+            select(Category.id, Category.name).where(Category.organization_id == organization_id)
+        ):
+            self.ids.add(category_id)
+            self.by_name.setdefault(name.strip().lower(), category_id)
+
+    def resolve(self, values):
+        if 'category' in values:
+            name = values.pop('category')
+            if name is None:
+                values['category_id'] = None
+            elif name.lower() in self.by_name:
+                values['category_id'] = self.by_name[name.lower()]
+            else:
+                raise ImportRowError(f'Unknown category: {name}')
+        elif values.get('category_id') is not None and values['category_id'] not in self.ids:
+            raise ImportRowError(f'Unknown category_id: {values["category_id"]}')
+
+def parse_product_row(raw, categories):
+    """Validate a raw import row into Product column values"""
+    if isinstance(raw, ImportRowError):
+        raise raw
+    if not isinstance(raw, dict):
+        raise ImportRowError('Row must be an object')
+
+    if None in raw:
+        raise ImportRowError('Row has more fields than the header')
+
+    values = {
+        name: _parse_value(name, parse, default, value)
+        for (name, parse, default), value in zip(_row_spec(raw), raw.values())
+    }
+    for field in ('sku', 'name'):
+        if not values.get(field):
+            raise ImportRowError(f'{field} is required')
+    categories.resolve(values)
+    return values
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _upsert_group(organization_id, columns, rows, now):
+    """One executemany INSERT ... ON CONFLICT for rows that share the same columns"""
+    stmt = dialect_insert()(Product.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['organization_id', 'sku'],
+        set_={
+            **{name: stmt.excluded[name] for name in columns if name != 'sku'},
+            'updated_at': stmt.excluded.updated_at
+        }
+    )
+    db.session.execute(stmt, [
+        dict(values, organization_id=organization_id, created_at=now, updated_at=now) for values in rows
+    ])
+
+def _write_chunk(organization_id, parsed, now):
+    """Upsert one chunk of parsed rows; returns (inserted, updated, stat deltas).
+
+    Existing products are read with one IN query to tell inserts from updates
+    and to work out the summary deltas. Within a chunk the last row for a
+    SKU wins, as it would if the rows were applied one at a time.
+    """
+    products = Product.__table__
+    latest = {}
+    for values in parsed:
+        latest.pop(values['sku'], None)
+        latest[values['sku']] = values
+
+    existing = {
+        sku: (product_id, (is_active, cost_price, minimum))
+        for sku, product_id, is_active, cost_price, minimum in db.session.execute(
+            select(products.c.sku, products.c.id, *(products.c[name] for name in STATE_COLUMNS)).where(
+                products.c.organization_id == organization_id,
+                products.c.sku.in_(list(latest))
+            )
+        )
+    }
+
+    groups = {}
+    for values in latest.values():
+        groups.setdefault(tuple(sorted(values)), []).append(values)
+    for columns, rows in groups.items():
+        _upsert_group(organization_id, columns, rows, now)
+
+    changes = {}
+    new_active = 0
+    for sku, values in latest.items():
+        if sku in existing:
+            product_id, old_state = existing[sku]
+            new_state = tuple(values.get(name, old) for name, old in zip(STATE_COLUMNS, old_state))
+            changes[product_id] = (old_state, new_state)
+        elif values.get('is_active', True):
+            new_active += 1
+
+    # Only the active flag and minimum level decide which rows are low on stock
+    refresh_low_stock(organization_id, product_ids=[
+        product_id for product_id, (old_state, new_state) in changes.items()
+        if (old_state[0], old_state[2]) != (new_state[0], new_state[2])
+    ])
+
+    # Repeated SKUs count as one insert (if new) followed by updates
+    inserted = len(latest) - len(existing)
+    deltas = merge_deltas({'active_products': new_active}, products_change_deltas(organization_id, changes))
+    return inserted, len(parsed) - inserted, deltas
+
+def import_products(organization_id, rows, product_import=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Upsert products from (row number, raw dict) pairs, one transaction per chunk.
+
+    Rows that fail validation are recorded as errors and skipped. When a chunk
+    fails in the database, its rows are retried one by one so the failing ones
+    can be reported. Counters (and the given ProductImport) are committed
+    with each chunk. Returns the counters and the first MAX_IMPORT_ERRORS
+    errors.
+    """
+    categories = CategoryLookup(organization_id)
+    result = {'processed': 0, 'inserted': 0, 'updated': 0, 'failed': 0, 'errors': []}
+
+    def record_error(number, raw, message):
+        result['failed'] += 1
+        if len(result['errors']) < MAX_IMPORT_ERRORS:
+            sku = raw.get('sku') if isinstance(raw, dict) else None
+            result['errors'].append({'row': number, 'sku': sku, 'error': message})
+
+    def commit_progress():
+        if product_import is not None:
+            product_import.rows_processed = result['processed']
+            product_import.rows_inserted = result['inserted']
+            product_import.rows_updated = result['updated']
+            product_import.rows_failed = result['failed']
+            product_import.errors = json.dumps(result['errors'])
+        invalidate_reports(organization_id)
+        db.session.commit()
+
+    def apply(parsed, now):
+        inserted, updated, deltas = _write_chunk(organization_id, [values for _, _, values in parsed], now)
+        bump_org_stats(organization_id, **deltas)
+        result['inserted'] += inserted
+        result['updated'] += updated
+
+    for chunk in _chunks(rows, chunk_rows):
+        parsed = []
+        for number, raw in chunk:
+            try:
+                parsed.append((number, raw, parse_product_row(raw, categories)))
+            except ImportRowError as e:
+                record_error(number, raw, str(e))
+        result['processed'] += len(chunk)
+
+        now = datetime.utcnow()
+        if parsed:
+            try:
+                apply(parsed, now)
+            except DBAPIError:
+                db.session.rollback()
+                for line in parsed:
+                    try:
+                        with db.session.begin_nested():
+                            apply([line], now)
+                    except DBAPIError as e:
+                        record_error(line[0], line[1], str(e.orig))
+        commit_progress()
+    return result
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = current_app.config.get('PRODUCT_IMPORT_WORKERS', DEFAULT_IMPORT_WORKERS)
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='product-import')
+        return _pool
+
+def run_product_import(import_id, path, chunk_rows=None):
+    """Run a stored import from the uploaded file at `path`, then delete it.
+
+    For uploads of at least PRODUCT_IMPORT_SEARCH_REBUILD_BYTES the product
+    search triggers are suspended while the rows are written and the index
+    is rebuilt once at the end, instead of being updated row by row.
+    """
+    chunk_rows = chunk_rows or current_app.config.get('PRODUCT_IMPORT_CHUNK_ROWS', DEFAULT_CHUNK_ROWS)
+    rebuild_bytes = current_app.config.get('PRODUCT_IMPORT_SEARCH_REBUILD_BYTES', DEFAULT_SEARCH_REBUILD_BYTES)
+    product_import = db.session.get(ProductImport, import_id)
+    suspended = False
+    try:
+        product_import.status = 'running'
+        product_import.started_at = datetime.utcnow()
+        db.session.commit()
+        if os.path.getsize(path) >= rebuild_bytes:
+            suspended = suspend_product_search_index(db.engine)
+        with open(path, 'rb') as stream:
+            import_products(
+                product_import.organization_id, read_rows(stream, product_import.source_format),
+                product_import=product_import, chunk_rows=chunk_rows
+            )
+        product_import.status = 'completed'
+    except Exception as e:
+        db.session.rollback()
+        product_import.status = 'failed'
+        product_import.message = str(e)
+    finally:
+        product_import.finished_at = datetime.utcnow()
+        db.session.commit()
+        if suspended:
+            resume_product_search_index(db.engine)
+        db.session.remove()
+        os.remove(path)
+    return product_import
+
+def start_product_import(import_id, path):
+    """Run an import on the background pool; poll its ProductImport for progress"""
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            run_product_import(import_id, path)
+
+    return _executor().submit(run)
@@ -0,0 +1,342 @@
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select
+from src.models.inventory import db, Product, ReorderSuggestion
+from src.services.columnar import np
+from src.services.forecasting import lead_times, load_series
+from src.services.movement_archive import naive_utc
+from src.services.snapshots import stock_as_of
+
+POLICY_FIELDS = ('reorder_point', 'reorder_quantity', 'minimum_stock_level')
+BASE_POLICIES = ('current', 'suggested')
+RESULT_FIELDS = ('stockout_days', 'unmet_quantity', 'average_on_hand', 'orders', 'days_below_minimum')
+
+DEFAULT_SIMULATION_DAYS = 90
+MAX_SIMULATION_DAYS = 366
+DEFAULT_HOLDING_COST_RATE = 0.25  # yearly carrying cost as a fraction of cost price
+
+def _parse_date(value, field):
+    try:
+        return naive_utc(datetime.fromisoformat(value.replace('Z', '+00:00'))).date()
+    except (AttributeError, ValueError):
+        raise ValueError(f'{field} must be an ISO date')
+
+def _count(value, field):
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise ValueError(f'{field} must be a non-negative integer')
+    return value
+
+def validate_simulation(data):
+    """Check a simulation request; returns its parameters. Raises ValueError.
+
+    `products` lists candidate policies ({'product_id', 'reorder_point',
+    'reorder_quantity', 'minimum_stock_level'}, each setting optional) applied
+    on top of the `policy` base: the products' current settings or the
+    forecast reorder suggestions.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Simulation request must be an object')
+    date_to = _parse_date(data['date_to'], 'date_to') if data.get('date_to') else datetime.utcnow().date()
+    date_from = (
+        _parse_date(data['date_from'], 'date_from') if data.get('date_from')
+        else date_to - timedelta(days=DEFAULT_SIMULATION_DAYS)
+    )
+    if not 1 <= (date_to - date_from).days <= MAX_SIMULATION_DAYS:
+        raise ValueError(f'The simulated range must be 1 to {MAX_SIMULATION_DAYS} days')
+
+    policy = data.get('policy', 'current')
+    if policy not in BASE_POLICIES:
+        raise ValueError(f'policy must be one of: {", ".join(BASE_POLICIES)}')
+
+    products = data.get('products', [])
+    if not isinstance(products, list):
+        raise ValueError('products must be a list')
+    overrides = {}
+    for entry in products:
+        if not isinstance(entry, dict) or not isinstance(entry.get('product_id'), int):
+            raise ValueError('Each product needs an integer product_id')
+        unknown = set(entry) - set(POLICY_FIELDS) - {'product_id'}
+        if unknown:
+            raise ValueError(f'Unknown policy settings: {", ".join(sorted(unknown))}')
+        overrides[entry['product_id']] = {
+            field: _count(entry[field], field) for field in POLICY_FIELDS if field in entry
+        }
+
+    lead_time_days = data.get('lead_time_days')
+    if lead_time_days is not None and (_count(lead_time_days, 'lead_time_days') < 1):
+        raise ValueError('lead_time_days must be positive')
+    holding_cost_rate = data.get('holding_cost_rate', DEFAULT_HOLDING_COST_RATE)
+    if not isinstance(holding_cost_rate, (int, float)) or isinstance(holding_cost_rate, bool) or holding_cost_rate < 0:
+        raise ValueError('holding_cost_rate must be a non-negative number')
+
+    warehouse_id = data.get('warehouse_id')
+    if warehouse_id is not None and not isinstance(warehouse_id, int):
+        raise ValueError('warehouse_id must be an integer')
+
+    return {
+        'date_from': date_from,
+        'date_to': date_to,
+        'policy': policy,
+        'overrides': overrides,
+        'lead_time_days': lead_time_days,
+        'holding_cost_rate': float(holding_cost_rate),
+        'warehouse_id': warehouse_id
+    }
+
+def simulate(demand, stock, lead, reorder_point, reorder_quantity, minimum):
+    """Replay daily demand against a reorder policy for every row at once.
+
+    Each day opens with the orders due that day, ships what stock allows
+    (the rest is lost) and closes by ordering reorder_quantity wherever stock
+    plus open orders is at or below the reorder point; the order arrives
+    lead days later. `demand` is a rows x days matrix, the other arguments
+    one value per row. Returns RESULT_FIELDS as lists.
+    """
+    if np is None:
+        return simulate_rows(demand, stock, lead, reorder_point, reorder_quantity, minimum)
+
+    rows, days = demand.shape
+    daily = np.ascontiguousarray(demand.T)
+    stock = np.maximum(np.asarray(stock, dtype=float), 0)
+    lead = np.asarray(lead, dtype=np.int64)
+    reorder_point = np.asarray(reorder_point, dtype=float)
+    reorder_quantity = np.asarray(reorder_quantity, dtype=float)
+    minimum = np.asarray(minimum, dtype=float)
+    orderable = reorder_quantity > 0
+    index = np.arange(rows)
+
+    # Orders in transit, by arrival day modulo the longest lead time
+    slots = int(lead.max(initial=0)) + 1
+    arrivals = np.zeros((slots, rows))
+    on_order = np.zeros(rows)
+    stockout_days = np.zeros(rows, dtype=np.int64)
+    unmet = np.zeros(rows)
+    on_hand_total = np.zeros(rows)
+    below_minimum = np.zeros(rows, dtype=np.int64)
+    orders = np.zeros(rows, dtype=np.int64)
+    for day in range(days):
+        arrived = arrivals[day % slots]
+        stock += arrived
+        on_order -= arrived
+        arrived[:] = 0
+
+        wanted = daily[day]
+        short = np.maximum(wanted - stock, 0)
+        stock -= wanted - short
+        stockout_days += short > 0
+        unmet += short
+        on_hand_total += stock
+        below_minimum += stock < minimum
+
+        ordering = orderable & (stock + on_order <= reorder_point)
+        orders += ordering
+        due = (day + lead[ordering]) % slots
+        arrivals[due, index[ordering]] += reorder_quantity[ordering]
+        on_order[ordering] += reorder_quantity[ordering]
+
+    return {
+        'stockout_days': stockout_days.tolist(),
+        'unmet_quantity': unmet.tolist(),
+        'average_on_hand': (on_hand_total / max(days, 1)).tolist(),
+        'orders': orders.tolist(),
+        'days_below_minimum': below_minimum.tolist()
+    }
+
+def simulate_rows(demand, stock, lead, reorder_point, reorder_quantity, minimum):
+    """simulate one row at a time over lists, for when NumPy is not installed"""
+    results = {field: [] for field in RESULT_FIELDS}
+    for series, on_hand, lead_time, point, quantity, floor in zip(
+        demand, stock, lead, reorder_point, reorder_quantity, minimum
+    ):
+        on_hand = max(on_hand, 0)
+        arrivals = defaultdict(float)
+        on_order = 0
+        stockout_days = unmet = on_hand_total = below_minimum = orders = 0
+        for day, wanted in enumerate(series):
+            arrived = arrivals.pop(day, 0)
+            on_hand += arrived
+            on_order -= arrived
+
+            short = max(wanted - on_hand, 0)
+            on_hand -= wanted - short
+            stockout_days += short > 0
+            unmet += short
+            on_hand_total += on_hand
+            below_minimum += on_hand < floor
+
+            if quantity > 0 and on_hand + on_order <= point:
+                orders += 1
+                arrivals[day + lead_time] += quantity
+                on_order += quantity
+        results['stockout_days'].append(stockout_days)
+        results['unmet_quantity'].append(float(unmet))
+        results['average_on_hand'].append(on_hand_total / max(len(series), 1))
+        results['orders'].append(orders)
+        results['days_below_minimum'].append(below_minimum)
+    return results
+
+def _take(values, rows):
+    if np is not None and hasattr(values, 'shape'):
+        return values[rows]
+    return [values[row] for row in rows]
+
+def _simulate_shard(shard):
+    demand, stock, lead, baseline, candidate = shard
+    return (
+        simulate(demand, stock, lead, *baseline),
+        simulate(demand, stock, lead, *candidate)
+    )
+
+def simulate_sharded(shards, pool=None):
+    """Run _simulate_shard over (rows, shard) pairs, in a process pool if given;
+    returns (baseline, candidate) results in the original row order"""
+    results = (pool.map if pool else map)(_simulate_shard, [shard for _, shard in shards])
+    length = sum(len(rows) for rows, _ in shards)
+    merged = tuple({field: [0] * length for field in RESULT_FIELDS} for _ in range(2))
+    for (rows, _), shard_results in zip(shards, results):
+        for merged_results, shard_result in zip(merged, shard_results):
+            for field in RESULT_FIELDS:
+                column = merged_results[field]
+                for row, value in zip(rows, shard_result[field]):
+                    column[row] = value
+    return merged
+
+def _policies(organization_id, keys, params):
+    """(baseline, candidate, cost price) per row: the baseline is the products'
+    current settings, each policy a (reorder_point, reorder_quantity,
+    minimum_stock_level) tuple of lists"""
+    products = {
+        product_id: (reorder_point or 0, reorder_quantity or 0, minimum or 0, float(cost_price or 0))
+        for product_id, reorder_point, reorder_quantity, minimum, cost_price in db.session.execute(
+            select(
+                Product.id, Product.reorder_point, Product.reorder_quantity, Product.minimum_stock_level,
+                Product.cost_price
+            ).where(Product.organization_id == organization_id)
+        )
+    }
+    unknown = set(params['overrides']) - set(products)
+    if unknown:
+        raise ValueError(f'Unknown products: {", ".join(str(product_id) for product_id in sorted(unknown))}')
+
+    suggested = {}
+    if params['policy'] == 'suggested':
+        suggested = {
+            (product_id, warehouse_id): (reorder_point, reorder_quantity)
+            for product_id, warehouse_id, reorder_point, reorder_quantity in db.session.execute(
+                select(
+                    ReorderSuggestion.product_id, ReorderSuggestion.warehouse_id,
+                    ReorderSuggestion.reorder_point, ReorderSuggestion.reorder_quantity
+                ).where(ReorderSuggestion.organization_id == organization_id)
+            )
+        }
+
+    baseline = ([], [], [])
+    candidate = ([], [], [])
+    costs = []
+    for key in keys:
+        current = products[key[0]]
+        policy = dict(zip(POLICY_FIELDS, current))
+        if key in suggested:
+            policy['reorder_point'], policy['reorder_quantity'] = suggested[key]
+        policy.update(params['overrides'].get(key[0], {}))
+        for position, field in enumerate(POLICY_FIELDS):
+            baseline[position].append(current[position])
+            candidate[position].append(policy[field])
+        costs.append(current[3])
+    return baseline, candidate, costs
+
+def _totals(results, costs, rate, days):
+    carrying = sum(
+        average * cost for average, cost in zip(results['average_on_hand'], costs)
+    ) * rate * days / 365
+    return {
+        'stockout_days': int(sum(results['stockout_days'])),
+        'items_with_stockouts': sum(1 for value in results['stockout_days'] if value),
+        'unmet_quantity': round(sum(results['unmet_quantity']), 2),
+        'average_on_hand': round(sum(results['average_on_hand']), 2),
+        'carrying_cost': round(carrying, 2),
+        'orders': int(sum(results['orders'])),
+        'days_below_minimum': int(sum(results['days_below_minimum']))
+    }
+
+def run_simulation(organization_id, params, workers=None):
+    """Replay a period of demand against the current and a candidate policy.
+
+    Demand is the daily outbound quantity of each active inventory row, read
+    from the daily rollup; the replay starts from the stock held at
+    date_from. With `workers` > 1 (default SIMULATION_WORKERS) warehouses are
+    simulated in a process pool. Returns the totals of both policies and,
+    for the products given candidate settings, per-item results. Raises
+    ValueError for unknown products.
+    """
+    started = time.perf_counter()
+    if workers is None:
+        workers = current_app.config.get('SIMULATION_WORKERS', 1)
+    days = (params['date_to'] - params['date_from']).days
+    default_lead = params['lead_time_days'] or current_app.config.get('FORECAST_LEAD_TIME_DAYS', 7)
+
+    keys, _, demand = load_series(organization_id, days, today=params['date_to'], warehouse_id=params['warehouse_id'])
+    baseline, candidate, costs = _policies(organization_id, keys, params)
+    if params['lead_time_days']:
+        lead = [default_lead] * len(keys)
+    else:
+        by_product = lead_times(organization_id, default_lead)
+        lead = [by_product.get(product_id, default_lead) for product_id, _ in keys]
+    levels, _, _ = stock_as_of(
+        organization_id, datetime.combine(params['date_from'], datetime.min.time()),
+        warehouse_id=params['warehouse_id']
+    )
+    stock = [levels.get(key, 0) for key in keys]
+
+    # One shard per warehouse
+    by_warehouse = defaultdict(list)
+    for row, (_, warehouse_id) in enumerate(keys):
+        by_warehouse[warehouse_id].append(row)
+    shards = [
+        (rows, (
+            _take(demand, rows), _take(stock, rows), _take(lead, rows),
+            tuple(_take(column, rows) for column in baseline),
+            tuple(_take(column, rows) for column in candidate)
+        ))
+        for rows in by_warehouse.values()
+    ]
+    simulation_started = time.perf_counter()
+    if workers > 1 and len(shards) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as pool:
+            baseline_results, candidate_results = simulate_sharded(shards, pool)
+    else:
+        baseline_results, candidate_results = simulate_sharded(shards)
+    simulation_seconds = time.perf_counter() - simulation_started
+
+    rate = params['holding_cost_rate']
+    items = []
+    for row, (product_id, warehouse_id) in enumerate(keys):
+        if product_id in params['overrides']:
+            items.append({
+                'product_id': product_id,
+                'warehouse_id': warehouse_id,
+                'baseline': {
+                    **{field: baseline[position][row] for position, field in enumerate(POLICY_FIELDS)},
+                    **{field: round(baseline_results[field][row], 2) for field in RESULT_FIELDS}
+                },
+                'candidate': {
+                    **{field: candidate[position][row] for position, field in enumerate(POLICY_FIELDS)},
+                    **{field: round(candidate_results[field][row], 2) for field in RESULT_FIELDS}
+                }
+            })
+
+    return {
+        'date_from': params['date_from'].isoformat(),
+        'date_to': params['date_to'].isoformat(),
+        'days': days,
+        'policy': params['policy'],
+        'items_simulated': len(keys),
+        'baseline': _totals(baseline_results, costs, rate, days),
+        'candidate': _totals(candidate_results, costs, rate, days),
+        'items': items,
+        'simulation_seconds': round(simulation_seconds, 4),
+        'seconds': round(time.perf_counter() - started, 4)
+    }
@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request
+from sqlalchemy import update
+from src.models.inventory import db, OrgStats
+from src.services.stats import rebuild_org_stats
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+class ReportCache:
+    """In-process LRU cache of rendered report responses.
+
+    Entries are keyed by (organization, generation, endpoint, query args),
+    where the generation is `org_stats.report_generation`. Write paths bump
+    it in their own transaction, so once a write commits every worker's
+    entries computed before it are unreachable; those entries then age out
+    through the TTL or the LRU entry and byte limits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.counters = dict.fromkeys(
+            ('hits', 'misses', 'stores', 'evictions', 'expirations', 'invalidations'), 0
+        )
+
+    def count_invalidation(self):
+        with self._lock:
+            self.counters['invalidations'] += 1
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            expires_at, body, status = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                self.counters['expirations'] += 1
+                self.counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return body, status
+
+    def set(self, key, body, status, ttl, max_entries, max_bytes):
+        if len(body) > max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, body, status)
+            self._bytes += len(body)
+            self.counters['stores'] += 1
+            while len(self._entries) > max_entries or self._bytes > max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return {
+                **self.counters,
+                'hit_ratio': round(self.counters['hits'] / lookups, 4) if lookups else None,
+                'entries': len(self._entries),
+                'bytes': self._bytes
+            }
+
+    def _drop(self, key):
+        _, body, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+
+report_cache = ReportCache()
+
+def report_generation(organization_id):
+    """The organization's current report generation (None before it has a summary row)"""
+    return db.session.query(OrgStats.report_generation).filter(
+        OrgStats.organization_id == organization_id
+    ).scalar()
+
+def invalidate_reports(organization_id):
+    """Call before committing a write that can change an organization's reports.
+
+    Bumps the report generation in the write's transaction, so cached reports
+    stop being served on every worker exactly when the write commits.
+    """
+    result = db.session.execute(
+        update(OrgStats).where(OrgStats.organization_id == organization_id).values(
+            report_generation=OrgStats.report_generation + 1
+        ).execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        # Reports cached so far were keyed with no generation; the new
+        # summary row starts one, which already differs from that
+        rebuild_org_stats(organization_id)
+    report_cache.count_invalidation()
+
+def cached_report(organization_of):
+    """Serve a report view from the cache, storing successful responses.
+
+    `organization_of` returns the current user's organization id (or None,
+    in which case the view runs uncached). Responses carry an X-Cache header
+    of HIT or MISS. The TTL, entry and byte limits come from the
+    REPORT_CACHE_TTL, REPORT_CACHE_MAX_ENTRIES and REPORT_CACHE_MAX_BYTES
+    settings; a TTL of 0 disables caching.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            ttl = current_app.config.get('REPORT_CACHE_TTL', DEFAULT_TTL)
+            organization_id = organization_of() if ttl > 0 else None
+            if organization_id is None:
+                return view(*args, **kwargs)
+
+            key = (
+                organization_id,
+                report_generation(organization_id),
+                request.endpoint,
+                tuple(sorted(request.args.items(multi=True))),
+                tuple(sorted(kwargs.items()))
+            )
+            cached = report_cache.get(key)
+            if cached is not None:
+                body, status = cached
+                response = current_app.response_class(body, status=status, mimetype='application/json')
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                report_cache.set(
+                    key, response.get_data(), response.status_code, ttl,
+                    current_app.config.get('REPORT_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+                    current_app.config.get('REPORT_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+                )
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
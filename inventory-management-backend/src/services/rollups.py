@@ -0,0 +1,223 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from sqlalchemy import func, delete, exists, insert, select
+from src.models.inventory import db, InventoryMovement, MovementDailyRollup, MovementArchive
+from src.services.movement_archive import archived_until, archive_files, archived_rows
+from src.services.upsert import dialect_insert
+
+TREND_BUCKETS = ('day', 'week', 'month')
+
+ROLLUP_KEY = ('organization_id', 'day', 'warehouse_id', 'product_id', 'movement_type')
+
+def record_movement_rollups(movements):
+    """Add movements (dicts of InventoryMovement columns) to the daily rollup.
+
+    Runs in the caller's transaction, so the rollup commits with the ledger.
+    """
+    totals = {}
+    for movement in movements:
+        key = (
+            movement['organization_id'],
+            movement['movement_date'].date(),
+            movement['warehouse_id'],
+            movement['product_id'],
+            movement['movement_type']
+        )
+        quantity = abs(movement['quantity'])
+        unit_cost = movement.get('unit_cost')
+        entry = totals.setdefault(key, [0, 0, Decimal(0)])
+        entry[0] += 1
+        entry[1] += quantity
+        if unit_cost:
+            entry[2] += quantity * Decimal(str(unit_cost))
+
+    if not totals:
+        return
+
+    table = MovementDailyRollup.__table__
+    stmt = dialect_insert()(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(ROLLUP_KEY),
+        set_={
+            'movement_count': table.c.movement_count + stmt.excluded.movement_count,
+            'total_quantity': table.c.total_quantity + stmt.excluded.total_quantity,
+            'total_value': table.c.total_value + stmt.excluded.total_value
+        }
+    )
+    db.session.execute(stmt, [
+        {
+            **dict(zip(ROLLUP_KEY, key)),
+            'movement_count': count,
+            'total_quantity': quantity,
+            'total_value': value
+        }
+        for key, (count, quantity, value) in totals.items()
+    ])
+
+def _archived_day(day_column, organization_column):
+    return exists().where(
+        MovementArchive.organization_id == organization_column,
+        MovementArchive.month <= day_column,
+        MovementArchive.next_month > day_column
+    )
+
+def rebuild_movement_rollups(organization_id=None):
+    """Recompute the rollup from the ledger (not committed); returns rows written.
+
+    Days in archived months keep their rollup rows, since their movements are
+    no longer in the ledger.
+    """
+    movement_day = func.date(InventoryMovement.movement_date)
+    clear = delete(MovementDailyRollup).where(
+        ~_archived_day(MovementDailyRollup.day, MovementDailyRollup.organization_id)
+    )
+    source = select(
+        InventoryMovement.organization_id,
+        func.date(InventoryMovement.movement_date),
+        InventoryMovement.warehouse_id,
+        InventoryMovement.product_id,
+        InventoryMovement.movement_type,
+        func.count(InventoryMovement.id),
+        func.sum(func.abs(InventoryMovement.quantity)),
+        func.coalesce(func.sum(func.abs(InventoryMovement.quantity) * InventoryMovement.unit_cost), 0)
+    ).where(
+        ~_archived_day(movement_day, InventoryMovement.organization_id)
+    ).group_by(
+        InventoryMovement.organization_id,
+        func.date(InventoryMovement.movement_date),
+        InventoryMovement.warehouse_id,
+        InventoryMovement.product_id,
+        InventoryMovement.movement_type
+    )
+    if organization_id is not None:
+        clear = clear.where(MovementDailyRollup.organization_id == organization_id)
+        source = source.where(InventoryMovement.organization_id == organization_id)
+
+    db.session.execute(clear)
+    result = db.session.execute(
+        insert(MovementDailyRollup.__table__).from_select(
+            list(ROLLUP_KEY) + ['movement_count', 'total_quantity', 'total_value'], source
+        )
+    )
+    return result.rowcount
+
+def ensure_movement_rollups():
+    """Backfill the rollup once if it is empty but movements already exist"""
+    has_rollups = db.session.query(MovementDailyRollup.organization_id).first()
+    has_movements = db.session.query(InventoryMovement.id).first()
+    if has_movements and not has_rollups:
+        rebuild_movement_rollups()
+        db.session.commit()
+
+def bucket_start(day, bucket):
+    """First day of the week (Monday) or month containing `day`"""
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+def _naive_utc(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def movement_trends(organization_id, date_from, date_to, bucket='day', product_id=None, movement_type=None):
+    """Movement count, quantity and value per (bucket, movement_type) in a range.
+
+    Whole days are read from the rollup. Partial days at either end of the
+    range are aggregated from the ledger, so the result matches a query on raw
+    movements while touching at most two days of them.
+    """
+    date_from, date_to = _naive_utc(date_from), _naive_utc(date_to)
+    first_full = date_from.date() if date_from.time() == time.min else date_from.date() + timedelta(days=1)
+    last_full = date_to.date() - timedelta(days=1)
+
+    per_day = defaultdict(lambda: [0, 0, Decimal(0)])
+
+    def add(day, mov_type, count, quantity, value):
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        entry = per_day[(day, mov_type)]
+        entry[0] += count
+        entry[1] += int(quantity or 0)
+        entry[2] += Decimal(str(value or 0))
+
+    ledger_ranges = []
+    if first_full <= last_full:
+        query = db.session.query(
+            MovementDailyRollup.day,
+            MovementDailyRollup.movement_type,
+            func.sum(MovementDailyRollup.movement_count),
+            func.sum(MovementDailyRollup.total_quantity),
+            func.sum(MovementDailyRollup.total_value)
+        ).filter(
+            MovementDailyRollup.organization_id == organization_id,
+            MovementDailyRollup.day >= first_full,
+            MovementDailyRollup.day <= last_full
+        )
+        if product_id:
+            query = query.filter(MovementDailyRollup.product_id == product_id)
+        if movement_type:
+            query = query.filter(MovementDailyRollup.movement_type == movement_type)
+        for row in query.group_by(MovementDailyRollup.day, MovementDailyRollup.movement_type):
+            add(*row)
+
+        ledger_ranges.append((date_from, datetime.combine(first_full, time.min), False))
+        ledger_ranges.append((datetime.combine(last_full + timedelta(days=1), time.min), date_to, True))
+    else:
+        ledger_ranges.append((date_from, date_to, True))
+
+    boundary = archived_until(organization_id)
+    for start, end, inclusive in ledger_ranges:
+        if start > end or (start == end and not inclusive):
+            continue
+        if boundary is not None and start < boundary:
+            # Partial days in archived months are aggregated from the archive files
+            for movement in archived_rows(
+                archive_files(organization_id, start, end), date_from=start,
+                date_to=end if inclusive else None, before=None if inclusive else end,
+                product_id=product_id, movement_type=movement_type
+            ):
+                quantity = abs(movement['quantity'])
+                add(movement['movement_date'].date(), movement['movement_type'], 1, quantity,
+                    quantity * movement['unit_cost'] if movement['unit_cost'] is not None else 0)
+            start = max(start, boundary)
+            if start > end or (start == end and not inclusive):
+                continue
+        query = db.session.query(
+            func.date(InventoryMovement.movement_date),
+            InventoryMovement.movement_type,
+            func.count(InventoryMovement.id),
+            func.sum(func.abs(InventoryMovement.quantity)),
+            func.sum(func.abs(InventoryMovement.quantity) * InventoryMovement.unit_cost)
+        ).filter(
+            InventoryMovement.organization_id == organization_id,
+            InventoryMovement.movement_date >= start,
+            InventoryMovement.movement_date <= end if inclusive else InventoryMovement.movement_date < end
+        )
+        if product_id:
+            query = query.filter(InventoryMovement.product_id == product_id)
+        if movement_type:
+            query = query.filter(InventoryMovement.movement_type == movement_type)
+        for row in query.group_by(func.date(InventoryMovement.movement_date), InventoryMovement.movement_type):
+            add(*row)
+
+    buckets = defaultdict(lambda: [0, 0, Decimal(0)])
+    for (day, mov_type), (count, quantity, value) in per_day.items():
+        entry = buckets[(bucket_start(day, bucket), mov_type)]
+        entry[0] += count
+        entry[1] += quantity
+        entry[2] += value
+
+    return [
+        {
+            'date': day.isoformat(),
+            'movement_type': mov_type,
+            'count': count,
+            'total_quantity': quantity,
+            'total_value': float(value)
+        }
+        for (day, mov_type), (count, quantity, value) in sorted(buckets.items())
+    ]
@@ -0,0 +1,139 @@
+import re
+import time
+from flask import current_app
+from sqlalchemy import or_, func, text, table, column, literal_column
+from src.models.inventory import db, Product
+
+# Keeps the index in step with product renames. The WHEN clause skips updates
+# that leave the indexed text as it was, such as re-importing a catalogue.
+PRODUCT_FTS_UPDATE_TRIGGER = """CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, sku, description ON products
+    WHEN old.name IS NOT new.name OR old.sku IS NOT new.sku OR old.description IS NOT new.description BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, sku, description)
+        VALUES ('delete', old.id, old.name, old.sku, old.description);
+        INSERT INTO products_fts(rowid, name, sku, description)
+        VALUES (new.id, new.name, new.sku, new.description);
+    END"""
+
+# FTS5 index over the searchable product columns. It is an external-content
+# table, so it stores only the index; triggers keep it in sync with `products`.
+PRODUCT_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, sku, description,
+        content='products', content_rowid='id',
+        tokenize='unicode61', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, sku, description)
+        VALUES (new.id, new.name, new.sku, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, sku, description)
+        VALUES ('delete', old.id, old.name, old.sku, old.description);
+    END""",
+    PRODUCT_FTS_UPDATE_TRIGGER,
+]
+
+PRODUCT_FTS_TRIGGERS = ('products_fts_ai', 'products_fts_ad', 'products_fts_au')
+
+DEFAULT_FTS_MIN_ROWS = 5000
+CATALOGUE_SIZE_TTL = 300  # seconds
+
+products_fts = table('products_fts', column('rowid'), column('rank'))
+
+_fts_engines = set()
+_catalogue_sizes = {}
+
+def ensure_product_search_index(engine):
+    """Create the FTS5 product index and its triggers if missing.
+
+    Returns False when the database is not SQLite or lacks FTS5, in which case
+    product search keeps using LIKE.
+    """
+    if engine.dialect.name != 'sqlite':
+        return False
+
+    with engine.begin() as conn:
+        triggers = conn.execute(text(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'products_fts_%'"
+        )).scalar()
+        try:
+            for statement in PRODUCT_FTS_DDL:
+                conn.exec_driver_sql(statement)
+        except Exception as e:
+            current_app.logger.warning('FTS5 product search unavailable: %s', e)
+            return False
+        if triggers < len(PRODUCT_FTS_TRIGGERS):
+            # Index products written while the triggers were missing: a new
+            # index, or a bulk import that stopped before resuming them
+            conn.exec_driver_sql("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+
+    _fts_engines.add(engine.url)
+    return True
+
+def suspend_product_search_index(engine):
+    """Drop the FTS triggers so a bulk write does not update the index row by
+    row; returns False (and does nothing) when there is no FTS index.
+
+    Every product write, from any request, then skips the index until
+    resume_product_search_index() rebuilds it.
+    """
+    if engine.url not in _fts_engines:
+        return False
+    with engine.begin() as conn:
+        for name in PRODUCT_FTS_TRIGGERS:
+            conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS {name}')
+    return True
+
+def resume_product_search_index(engine):
+    """Recreate the FTS triggers and rebuild the index in one transaction, so
+    it covers every product written before and is maintained after"""
+    with engine.begin() as conn:
+        for statement in PRODUCT_FTS_DDL[1:]:
+            conn.exec_driver_sql(statement)
+        conn.exec_driver_sql("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+
+def build_match_expression(search):
+    """Turn free text into an FTS5 query where every term is a prefix match"""
+    terms = re.findall(r'\w[\w\-./]*', search)
+    return ' AND '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+def _catalogue_size(organization_id):
+    now = time.monotonic()
+    cached = _catalogue_sizes.get(organization_id)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    size = db.session.query(func.count(Product.id)).filter(
+        Product.organization_id == organization_id
+    ).scalar()
+    _catalogue_sizes[organization_id] = (now + CATALOGUE_SIZE_TTL, size)
+    return size
+
+def _like_filter(query, search):
+    return query.filter(
+        or_(
+            Product.name.contains(search),
+            Product.sku.contains(search),
+            Product.description.contains(search)
+        )
+    )
+
+def apply_product_search(query, search, organization_id, ranked=True):
+    """Filter a Product query by free-text search.
+
+    Catalogues at or above PRODUCT_SEARCH_FTS_MIN_ROWS are searched through the
+    FTS5 index with prefix matching, ordered by relevance when `ranked` is set.
+    Smaller catalogues, or databases without the index, use substring LIKE.
+    """
+    match = build_match_expression(search)
+    min_rows = current_app.config.get('PRODUCT_SEARCH_FTS_MIN_ROWS', DEFAULT_FTS_MIN_ROWS)
+    if (not match or db.engine.url not in _fts_engines
+            or _catalogue_size(organization_id) < min_rows):
+        return _like_filter(query, search)
+
+    query = query.join(products_fts, products_fts.c.rowid == Product.id).filter(
+        literal_column('products_fts').op('MATCH')(match)
+    )
+    if ranked:
+        query = query.order_by(products_fts.c.rank)
+    return query
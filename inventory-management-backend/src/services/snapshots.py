@@ -0,0 +1,163 @@
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, literal, select, text
+from src.models.inventory import (
+    db, Inventory, InventoryMovement, InventorySnapshot, InventorySnapshotLine, Organization
+)
+from src.services.maintenance import start_periodic_job
+from src.services.movement_archive import archived_until, archive_files, archived_rows, naive_utc
+from src.services.movements import stock_after
+
+# Movements are stamped with their date before they commit, so one stamped
+# shortly before a snapshot can still commit after it. Replay looks this far
+# back from the snapshot for movement ids the snapshot does not include.
+COMMIT_MARGIN = timedelta(minutes=10)
+
+def take_snapshot(organization_id, now=None):
+    """Copy an organization's current stock levels into a new snapshot.
+
+    Skipped (returns None) when no movement was recorded since the previous
+    snapshot. The copy and the movement watermark are read under the write
+    lock, so no movement can commit between them. `now` backdates taken_at
+    and is only meant for seeding history. Commits; returns the snapshot.
+    """
+    previous = db.session.execute(
+        select(InventorySnapshot).where(
+            InventorySnapshot.organization_id == organization_id
+        ).order_by(InventorySnapshot.taken_at.desc()).limit(1)
+    ).scalar()
+    if previous is not None:
+        changed = db.session.execute(
+            select(InventoryMovement.id).where(
+                InventoryMovement.organization_id == organization_id,
+                InventoryMovement.movement_date >= previous.taken_at - COMMIT_MARGIN,
+                InventoryMovement.id > previous.last_movement_id
+            ).limit(1)
+        ).scalar()
+        if changed is None:
+            return None
+
+    if db.engine.dialect.name == 'postgresql':
+        # Waits for in-flight movements and holds new ones until the commit
+        db.session.execute(text('LOCK TABLE inventory_movements IN SHARE MODE'))
+    snapshot = InventorySnapshot(organization_id=organization_id, taken_at=datetime.utcnow())
+    db.session.add(snapshot)
+    db.session.flush()  # on SQLite the first write takes the database lock
+
+    result = db.session.execute(insert(InventorySnapshotLine).from_select(
+        ['snapshot_id', 'product_id', 'warehouse_id', 'quantity_on_hand'],
+        select(
+            literal(snapshot.id), Inventory.product_id, Inventory.warehouse_id, Inventory.quantity_on_hand
+        ).where(Inventory.organization_id == organization_id)
+    ))
+    # Any organization's highest id will do as the watermark, and it is a
+    # primary key lookup
+    last_id = db.session.execute(select(func.max(InventoryMovement.id))).scalar()
+    snapshot.last_movement_id = last_id or (previous.last_movement_id if previous else 0)
+    snapshot.row_count = result.rowcount
+    snapshot.taken_at = now or datetime.utcnow()
+    db.session.commit()
+    return snapshot
+
+def take_snapshots(organization_ids=None):
+    """Snapshot the given organizations (default: all); returns {'organizations', 'snapshots', 'rows', 'seconds'}"""
+    started = time.perf_counter()
+    if organization_ids is None:
+        organization_ids = db.session.execute(select(Organization.id)).scalars().all()
+    snapshots = 0
+    rows = 0
+    for organization_id in organization_ids:
+        snapshot = take_snapshot(organization_id)
+        if snapshot is not None:
+            snapshots += 1
+            rows += snapshot.row_count
+    return {
+        'organizations': len(organization_ids),
+        'snapshots': snapshots,
+        'rows': rows,
+        'seconds': round(time.perf_counter() - started, 4)
+    }
+
+def _replay_movements(organization_id, since, after_id, until, product_id, warehouse_id):
+    """(id, product_id, warehouse_id, movement_type, quantity) of the movements
+    after `after_id` dated from `since` (None: the start) to `until`, by id"""
+    movements = []
+    # Archived rows are sorted by id below, so the (cached) descending read will do
+    boundary = archived_until(organization_id)
+    if boundary is not None and (since is None or since < boundary):
+        for row in archived_rows(
+            archive_files(organization_id, since, until), date_from=since, date_to=until,
+            product_id=product_id, warehouse_id=warehouse_id, descending=True
+        ):
+            if row['id'] > after_id:
+                movements.append((
+                    row['id'], row['product_id'], row['warehouse_id'], row['movement_type'], row['quantity']
+                ))
+        since = boundary
+
+    query = select(
+        InventoryMovement.id, InventoryMovement.product_id, InventoryMovement.warehouse_id,
+        InventoryMovement.movement_type, InventoryMovement.quantity
+    ).where(
+        InventoryMovement.organization_id == organization_id,
+        InventoryMovement.movement_date <= until,
+        InventoryMovement.id > after_id
+    )
+    if since is not None:
+        query = query.where(InventoryMovement.movement_date >= since)
+    if product_id:
+        query = query.where(InventoryMovement.product_id == product_id)
+    if warehouse_id:
+        query = query.where(InventoryMovement.warehouse_id == warehouse_id)
+    movements.extend(tuple(row) for row in db.session.execute(query))
+    movements.sort()
+    return movements
+
+def stock_as_of(organization_id, as_of, product_id=None, warehouse_id=None):
+    """Stock levels at `as_of`, rebuilt from the nearest earlier snapshot.
+
+    Only movements recorded after that snapshot are replayed, in id order
+    (the order they were applied to the stock), so the work is bounded by the
+    snapshot interval. Without an earlier snapshot the whole ledger is
+    replayed, reading archived months where needed. Returns (levels, snapshot,
+    movements replayed); levels maps (product_id, warehouse_id) to quantity.
+    """
+    as_of = naive_utc(as_of)
+    snapshot = db.session.execute(
+        select(InventorySnapshot).where(
+            InventorySnapshot.organization_id == organization_id,
+            InventorySnapshot.taken_at <= as_of
+        ).order_by(InventorySnapshot.taken_at.desc()).limit(1)
+    ).scalar()
+
+    levels = {}
+    if snapshot is not None:
+        query = select(
+            InventorySnapshotLine.product_id, InventorySnapshotLine.warehouse_id,
+            InventorySnapshotLine.quantity_on_hand
+        ).where(InventorySnapshotLine.snapshot_id == snapshot.id)
+        if product_id:
+            query = query.where(InventorySnapshotLine.product_id == product_id)
+        if warehouse_id:
+            query = query.where(InventorySnapshotLine.warehouse_id == warehouse_id)
+        levels = {
+            (line_product, line_warehouse): quantity
+            for line_product, line_warehouse, quantity in db.session.execute(query)
+        }
+
+    movements = _replay_movements(
+        organization_id,
+        snapshot.taken_at - COMMIT_MARGIN if snapshot else None,
+        snapshot.last_movement_id if snapshot else 0,
+        as_of, product_id, warehouse_id
+    )
+    for _, movement_product, movement_warehouse, movement_type, quantity in movements:
+        key = (movement_product, movement_warehouse)
+        levels[key] = stock_after(levels.get(key, 0), movement_type, quantity)
+    return levels, snapshot, len(movements)
+
+def start_inventory_snapshots(app):
+    """Run take_snapshots every INVENTORY_SNAPSHOT_INTERVAL seconds in the background"""
+    return start_periodic_job(
+        app, 'inventory-snapshots', app.config.get('INVENTORY_SNAPSHOT_INTERVAL', 0), take_snapshots
+    )
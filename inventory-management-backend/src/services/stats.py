@@ -0,0 +1,149 @@
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import func, case, update
+from src.models.inventory import db, OrgStats, Product, Warehouse, Inventory, StockValuation
+from src.services.valuation import inventory_cost_value, join_valuation
+
+STAT_COLUMNS = ('active_products', 'active_warehouses', 'low_stock_items', 'total_inventory_value')
+
+def _is_low(quantity, minimum):
+    return quantity is not None and minimum is not None and quantity <= minimum
+
+def _as_decimal(value):
+    return value if isinstance(value, Decimal) or value is None else Decimal(str(value))
+
+def compute_org_stats(organization_id):
+    """Compute the dashboard summary for an organization from the base tables"""
+    active_products = db.session.query(func.count(Product.id)).filter_by(
+        organization_id=organization_id, is_active=True
+    ).scalar()
+    active_warehouses = db.session.query(func.count(Warehouse.id)).filter_by(
+        organization_id=organization_id, is_active=True
+    ).scalar()
+    low_stock_items, total_value = join_valuation(db.session.query(
+        func.count(case((Inventory.quantity_on_hand <= Product.minimum_stock_level, 1))),
+        func.sum(inventory_cost_value(func.coalesce(Product.cost_price, 0)))
+    ).join(Product)).filter(
+        Inventory.organization_id == organization_id,
+        Product.is_active == True
+    ).one()
+
+    return {
+        'active_products': active_products,
+        'active_warehouses': active_warehouses,
+        'low_stock_items': low_stock_items,
+        'total_inventory_value': _as_decimal(total_value or 0)
+    }
+
+def rebuild_org_stats(organization_id):
+    """Recompute an organization's summary row from scratch (not committed)"""
+    values = compute_org_stats(organization_id)
+    stats = db.session.get(OrgStats, organization_id)
+    if stats is None:
+        stats = OrgStats(organization_id=organization_id)
+        db.session.add(stats)
+    for name, value in values.items():
+        setattr(stats, name, value)
+    stats.updated_at = datetime.utcnow()
+    db.session.flush()
+    return stats
+
+def get_org_stats(organization_id):
+    """Return the summary row, building it on first use"""
+    stats = db.session.get(OrgStats, organization_id)
+    if stats is None:
+        stats = rebuild_org_stats(organization_id)
+        db.session.commit()
+    return stats
+
+def bump_org_stats(organization_id, **deltas):
+    """Add deltas to an organization's summary row in the current transaction"""
+    deltas = {name: value for name, value in deltas.items() if value}
+    if not deltas:
+        return
+
+    result = db.session.execute(
+        update(OrgStats).where(OrgStats.organization_id == organization_id).values(
+            updated_at=datetime.utcnow(),
+            **{name: getattr(OrgStats, name) + value for name, value in deltas.items()}
+        ).execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        # No summary row yet. The rebuild reads this transaction's own writes,
+        # so it already includes the change the deltas describe.
+        rebuild_org_stats(organization_id)
+
+def merge_deltas(*delta_dicts):
+    """Sum several delta dicts into one"""
+    merged = {}
+    for deltas in delta_dicts:
+        for name, value in deltas.items():
+            merged[name] = merged.get(name, 0) + value
+    return merged
+
+def stock_change_deltas(product, previous, current, value_change):
+    """Summary deltas for one inventory row whose on-hand quantity changed.
+
+    `previous` is None when the row was just created. `product` needs
+    is_active, cost_price and minimum_stock_level. `value_change` is the
+    (value change, uncosted quantity change) that record_valuation returned
+    for the row; uncosted stock counts at the product's cost_price.
+    """
+    if not product.is_active:
+        return {}
+    minimum = product.minimum_stock_level
+    cost = _as_decimal(product.cost_price)
+    value, uncosted = value_change
+    return {
+        'low_stock_items': int(_is_low(current, minimum)) - int(_is_low(previous, minimum)),
+        'total_inventory_value': value + uncosted * cost if cost is not None else value
+    }
+
+def product_change_deltas(organization_id, product_id, old_state, new_state):
+    """Summary deltas for a product whose active flag, cost or minimum level changed.
+
+    States are (is_active, cost_price, minimum_stock_level) tuples.
+    """
+    return products_change_deltas(organization_id, {product_id: (old_state, new_state)})
+
+def products_change_deltas(organization_id, changes):
+    """Summary deltas for many products at once, reading their stock in one query.
+
+    `changes` maps product id to an (old_state, new_state) pair of
+    (is_active, cost_price, minimum_stock_level) tuples.
+    """
+    changes = {product_id: states for product_id, states in changes.items() if states[0] != states[1]}
+    if not changes:
+        return {}
+
+    # Per inventory row: quantity, value of its costed stock and the quantity
+    # valued at cost_price (all of it for rows without cost state)
+    rows = {}
+    for product_id, quantity, has_valuation, value, uncosted in join_valuation(db.session.query(
+        Inventory.product_id, Inventory.quantity_on_hand, StockValuation.product_id.isnot(None),
+        StockValuation.total_value, StockValuation.uncosted_quantity
+    )).filter(
+        Inventory.organization_id == organization_id,
+        Inventory.product_id.in_(list(changes))
+    ):
+        if has_valuation:
+            rows.setdefault(product_id, []).append((quantity, _as_decimal(value), uncosted))
+        else:
+            rows.setdefault(product_id, []).append((quantity, 0, quantity))
+
+    def contribution(state, stock):
+        is_active, cost, minimum = state
+        if not is_active:
+            return 0, 0, 0
+        cost = _as_decimal(cost)
+        value = sum(row[1] + (row[2] * cost if cost is not None else 0) for row in stock)
+        return 1, sum(1 for row in stock if _is_low(row[0], minimum)), value
+
+    deltas = {'active_products': 0, 'low_stock_items': 0, 'total_inventory_value': 0}
+    for product_id, (old_state, new_state) in changes.items():
+        stock = rows.get(product_id, [])
+        old, new = contribution(old_state, stock), contribution(new_state, stock)
+        deltas['active_products'] += new[0] - old[0]
+        deltas['low_stock_items'] += new[1] - old[1]
+        deltas['total_inventory_value'] += new[2] - old[2]
+    return deltas
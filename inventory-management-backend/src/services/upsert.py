@@ -0,0 +1,8 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from src.models.inventory import db
+
+def dialect_insert():
+    """Return the insert() construct supporting ON CONFLICT for the session's database"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return postgresql.insert
+    return sqlite.insert
@@ -0,0 +1,370 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import and_, bindparam, case, delete, insert, select, text, tuple_, update
+from src.models.inventory import db, CostLayer, Inventory, InventoryMovement, Organization, StockValuation
+from src.services.movement_archive import archived_until, archive_files, archived_rows
+from src.services.upsert import dialect_insert
+
+VALUATION_METHODS = ('weighted_average', 'fifo')
+DEFAULT_VALUATION_METHOD = 'weighted_average'
+COST_PLACES = Decimal('0.0001')
+VALUE_PLACES = Decimal('0.01')
+REBUILD_BATCH_ROWS = 5000
+
+def _cost(value):
+    if value is None:
+        return None
+    return (value if isinstance(value, Decimal) else Decimal(str(value))).quantize(COST_PLACES)
+
+class CostState:
+    """Quantity and cost of one inventory row under a valuation method.
+
+    Movements are applied in the order they changed the stock. Receipts
+    without a unit_cost take the item's current cost (the average, or the
+    latest receipt cost under FIFO) and stay uncosted if there is none yet.
+    'adjustment' sets the quantity: a gain is received at the current cost
+    and a loss is issued like an 'out'. 'transfer' changes nothing.
+    """
+
+    __slots__ = ('method', 'quantity', 'unit_cost', 'layers')
+
+    def __init__(self, method, quantity=0, unit_cost=None, layers=None):
+        self.method = method
+        self.quantity = quantity
+        self.unit_cost = _cost(unit_cost)
+        # FIFO only: [layer id or None, quantity remaining, unit cost, movement id],
+        # oldest first
+        self.layers = layers if layers is not None else []
+
+    def apply(self, movement_type, quantity, unit_cost=None, movement_id=None):
+        if movement_type == 'in':
+            self.receive(quantity, _cost(unit_cost), movement_id)
+        elif movement_type == 'out':
+            self.issue(quantity)
+        elif movement_type == 'adjustment':
+            change = quantity - self.quantity
+            if change > 0:
+                self.receive(change, None, None)
+            elif change < 0:
+                self.issue(-change)
+
+    def receive(self, quantity, unit_cost, movement_id):
+        if self.method == 'fifo':
+            self.layers.append([None, quantity, unit_cost if unit_cost is not None else self.unit_cost, movement_id])
+            if unit_cost is not None:
+                self.unit_cost = unit_cost
+        elif unit_cost is not None:
+            if self.unit_cost is None or self.quantity <= 0:
+                # Stock received without a cost takes the first known one
+                self.unit_cost = unit_cost
+            else:
+                self.unit_cost = (
+                    (self.quantity * self.unit_cost + quantity * unit_cost) / (self.quantity + quantity)
+                ).quantize(COST_PLACES)
+        self.quantity += quantity
+
+    def issue(self, quantity):
+        self.quantity -= quantity
+        if self.method != 'fifo':
+            return
+        while quantity > 0 and self.layers:
+            layer = self.layers[0]
+            taken = min(layer[1], quantity)
+            layer[1] -= taken
+            quantity -= taken
+            if layer[1] == 0:
+                self.layers.pop(0)
+
+    @property
+    def total_value(self):
+        """Value of the stock whose cost is known"""
+        if self.method == 'fifo':
+            value = sum((layer[1] * layer[2] for layer in self.layers if layer[2] is not None), Decimal(0))
+        else:
+            value = self.quantity * self.unit_cost if self.unit_cost is not None else Decimal(0)
+        return Decimal(value).quantize(VALUE_PLACES)
+
+    @property
+    def uncosted_quantity(self):
+        if self.method == 'fifo':
+            return sum(layer[1] for layer in self.layers if layer[2] is None)
+        return self.quantity if self.unit_cost is None else 0
+
+def valuation_method(organization_id):
+    """An organization's valuation method from its settings, or VALUATION_METHOD"""
+    raw = db.session.execute(select(Organization.settings).where(Organization.id == organization_id)).scalar()
+    settings = json.loads(raw) if raw else {}
+    return settings.get('valuation_method') or current_app.config.get('VALUATION_METHOD', DEFAULT_VALUATION_METHOD)
+
+def save_valuation_method(organization_id, method):
+    """Store an organization's method and rebuild its cost state (not committed)"""
+    organization = db.session.get(Organization, organization_id)
+    settings = json.loads(organization.settings) if organization.settings else {}
+    settings['valuation_method'] = method
+    organization.settings = json.dumps(settings)
+    db.session.flush()
+    return rebuild_valuation(organization_id, method)
+
+def inventory_cost_value(cost_price):
+    """SQL cost value of an inventory row in a query outer-joined with
+    join_valuation(): costed stock at its layers, uncosted stock at
+    `cost_price`, and rows without cost state at quantity * cost_price"""
+    return case(
+        (StockValuation.product_id.is_(None), Inventory.quantity_on_hand * cost_price),
+        else_=StockValuation.total_value + StockValuation.uncosted_quantity * cost_price
+    )
+
+def join_valuation(query):
+    """Outer join StockValuation to a query over Inventory on the inventory key"""
+    return query.outerjoin(StockValuation, and_(
+        StockValuation.organization_id == Inventory.organization_id,
+        StockValuation.product_id == Inventory.product_id,
+        StockValuation.warehouse_id == Inventory.warehouse_id
+    ))
+
+def _load_states(organization_id, keys):
+    states = {}
+    for row in db.session.execute(
+        select(
+            StockValuation.product_id, StockValuation.warehouse_id, StockValuation.method,
+            StockValuation.quantity, StockValuation.unit_cost
+        ).where(
+            StockValuation.organization_id == organization_id,
+            tuple_(StockValuation.product_id, StockValuation.warehouse_id).in_(list(keys))
+        )
+    ):
+        states[(row.product_id, row.warehouse_id)] = CostState(row.method, row.quantity, row.unit_cost)
+
+    if any(state.method == 'fifo' for state in states.values()):
+        for layer in db.session.execute(
+            select(
+                CostLayer.id, CostLayer.product_id, CostLayer.warehouse_id,
+                CostLayer.quantity_remaining, CostLayer.unit_cost, CostLayer.movement_id
+            ).where(
+                CostLayer.organization_id == organization_id,
+                tuple_(CostLayer.product_id, CostLayer.warehouse_id).in_(list(keys))
+            ).order_by(CostLayer.id)
+        ):
+            state = states.get((layer.product_id, layer.warehouse_id))
+            if state is not None and state.method == 'fifo':
+                state.layers.append([layer.id, layer.quantity_remaining, _cost(layer.unit_cost), layer.movement_id])
+    return states
+
+def record_valuation(organization_id, movements):
+    """Apply movements to the cost state of their items in the current transaction.
+
+    `movements` are dicts with product_id, warehouse_id, movement_type,
+    quantity, unit_cost and optionally movement_id, in the order they were
+    applied to the stock. Items without cost state start from zero under the
+    organization's method. Returns {(product_id, warehouse_id): (value
+    change, uncosted quantity change)} for the summary deltas.
+    """
+    keys = {(movement['product_id'], movement['warehouse_id']) for movement in movements}
+    if not keys:
+        return {}
+    method = valuation_method(organization_id)
+    states = _load_states(organization_id, keys)
+    for key in keys - set(states):
+        states[key] = CostState(method)
+
+    before = {key: (state.total_value, state.uncosted_quantity) for key, state in states.items()}
+    loaded_layers = {
+        layer[0]: layer[1] for state in states.values() for layer in state.layers
+    }
+    for movement in movements:
+        states[(movement['product_id'], movement['warehouse_id'])].apply(
+            movement['movement_type'], movement['quantity'], movement.get('unit_cost'), movement.get('movement_id')
+        )
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            'organization_id': organization_id,
+            'product_id': key[0],
+            'warehouse_id': key[1],
+            'method': state.method,
+            'quantity': state.quantity,
+            'unit_cost': state.unit_cost,
+            'total_value': state.total_value,
+            'uncosted_quantity': state.uncosted_quantity,
+            'updated_at': now
+        }
+        for key, state in states.items()
+    ]
+    stmt = dialect_insert()(StockValuation.__table__)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['organization_id', 'product_id', 'warehouse_id'],
+        set_={
+            name: stmt.excluded[name]
+            for name in ('method', 'quantity', 'unit_cost', 'total_value', 'uncosted_quantity', 'updated_at')
+        }
+    ), rows)
+
+    # Write back the layers that were consumed, shrunk or added
+    remaining = {}
+    added = []
+    for key, state in states.items():
+        if state.method != 'fifo':
+            continue
+        for layer_id, quantity, unit_cost, movement_id in state.layers:
+            if layer_id is None:
+                added.append({
+                    'organization_id': organization_id, 'product_id': key[0], 'warehouse_id': key[1],
+                    'movement_id': movement_id, 'quantity_remaining': quantity, 'unit_cost': unit_cost
+                })
+            else:
+                remaining[layer_id] = quantity
+    consumed = [layer_id for layer_id in loaded_layers if layer_id not in remaining]
+    shrunk = [
+        {'layer_id': layer_id, 'new_quantity': quantity}
+        for layer_id, quantity in remaining.items() if quantity != loaded_layers[layer_id]
+    ]
+    if consumed:
+        db.session.execute(delete(CostLayer).where(CostLayer.id.in_(consumed)))
+    if shrunk:
+        table = CostLayer.__table__
+        db.session.execute(
+            update(table).where(table.c.id == bindparam('layer_id')).values(
+                quantity_remaining=bindparam('new_quantity')
+            ),
+            shrunk
+        )
+    if added:
+        db.session.execute(insert(CostLayer.__table__), added)
+
+    return {
+        key: (state.total_value - before[key][0], state.uncosted_quantity - before[key][1])
+        for key, state in states.items()
+    }
+
+def _ledger(organization_id):
+    """(id, product_id, warehouse_id, movement_type, quantity, unit_cost) of an
+    organization's movements in the order they were applied: archived months
+    first, then the hot ledger"""
+    boundary = archived_until(organization_id)
+    if boundary is not None:
+        for month in archive_files(organization_id):
+            # Within a month rows are stored by date; ids give the applied order
+            rows = sorted(archived_rows([month]), key=lambda row: row['id'])
+            for row in rows:
+                yield (row['id'], row['product_id'], row['warehouse_id'], row['movement_type'],
+                       row['quantity'], row['unit_cost'])
+
+    query = select(
+        InventoryMovement.id, InventoryMovement.product_id, InventoryMovement.warehouse_id,
+        InventoryMovement.movement_type, InventoryMovement.quantity, InventoryMovement.unit_cost
+    ).where(InventoryMovement.organization_id == organization_id).order_by(InventoryMovement.id)
+    if boundary is not None:
+        query = query.where(InventoryMovement.movement_date >= boundary)
+    yield from db.session.execute(query.execution_options(yield_per=REBUILD_BATCH_ROWS))
+
+def replay_valuation(organization_id, method):
+    """Cost state of every item rebuilt from the whole ledger; returns ({key: CostState}, movements)"""
+    states = {}
+    count = 0
+    for movement_id, product_id, warehouse_id, movement_type, quantity, unit_cost in _ledger(organization_id):
+        key = (product_id, warehouse_id)
+        state = states.get(key)
+        if state is None:
+            state = states[key] = CostState(method)
+        state.apply(movement_type, quantity, unit_cost, movement_id)
+        count += 1
+    return states, count
+
+def rebuild_valuation(organization_id, method=None):
+    """Replace an organization's cost state with one rebuilt from the ledger.
+
+    The stored rows are deleted first, which on SQLite takes the write lock,
+    so no movement can change the stock while the ledger is replayed. Not
+    committed. Returns {'items', 'layers', 'movements', 'total_value'}.
+    """
+    method = method or valuation_method(organization_id)
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text('LOCK TABLE inventory_movements IN SHARE MODE'))
+    db.session.execute(delete(CostLayer).where(CostLayer.organization_id == organization_id))
+    db.session.execute(delete(StockValuation).where(StockValuation.organization_id == organization_id))
+
+    states, count = replay_valuation(organization_id, method)
+    if states:
+        db.session.execute(insert(StockValuation.__table__), [
+            {
+                'organization_id': organization_id,
+                'product_id': key[0],
+                'warehouse_id': key[1],
+                'method': method,
+                'quantity': state.quantity,
+                'unit_cost': state.unit_cost,
+                'total_value': state.total_value,
+                'uncosted_quantity': state.uncosted_quantity
+            }
+            for key, state in states.items()
+        ])
+    layers = [
+        {
+            'organization_id': organization_id, 'product_id': key[0], 'warehouse_id': key[1],
+            'movement_id': movement_id, 'quantity_remaining': quantity, 'unit_cost': unit_cost
+        }
+        for key, state in states.items()
+        for _, quantity, unit_cost, movement_id in state.layers
+    ]
+    for start in range(0, len(layers), REBUILD_BATCH_ROWS):
+        db.session.execute(insert(CostLayer.__table__), layers[start:start + REBUILD_BATCH_ROWS])
+    return {
+        'items': len(states),
+        'layers': len(layers),
+        'movements': count,
+        'total_value': float(sum((state.total_value for state in states.values()), Decimal(0)))
+    }
+
+def check_valuation(organization_id):
+    """Compare the stored cost state with a replay of the ledger.
+
+    Returns a list of {'product_id', 'warehouse_id', 'stored', 'rebuilt'} for
+    items whose quantity, unit cost, value or uncosted quantity differ, or
+    whose quantity differs from the inventory row.
+    """
+    stored = {
+        (row.product_id, row.warehouse_id): row
+        for row in db.session.execute(
+            select(StockValuation).where(StockValuation.organization_id == organization_id)
+        ).scalars()
+    }
+    # Replay under the stored method unless the rows disagree
+    methods = {row.method for row in stored.values()}
+    method = methods.pop() if len(methods) == 1 else valuation_method(organization_id)
+    states, _ = replay_valuation(organization_id, method)
+    on_hand = dict(
+        ((product_id, warehouse_id), quantity) for product_id, warehouse_id, quantity in db.session.execute(
+            select(Inventory.product_id, Inventory.warehouse_id, Inventory.quantity_on_hand).where(
+                Inventory.organization_id == organization_id
+            )
+        )
+    )
+
+    drift = []
+    for key in sorted(set(stored) | set(states)):
+        row, state = stored.get(key), states.get(key)
+        stored_values = (row.quantity, _cost(row.unit_cost), Decimal(row.total_value).quantize(VALUE_PLACES),
+                         row.uncosted_quantity) if row is not None else None
+        rebuilt_values = (state.quantity, state.unit_cost, state.total_value,
+                          state.uncosted_quantity) if state is not None else None
+        if stored_values != rebuilt_values or (state is not None and on_hand.get(key, 0) != state.quantity):
+            drift.append({
+                'product_id': key[0],
+                'warehouse_id': key[1],
+                'stored': [str(value) for value in stored_values] if stored_values else None,
+                'rebuilt': [str(value) for value in rebuilt_values] if rebuilt_values else None,
+                'quantity_on_hand': on_hand.get(key)
+            })
+    return drift
+
+def ensure_stock_valuations():
+    """Build cost state once for every organization if none exists but movements do"""
+    has_valuations = db.session.query(StockValuation.organization_id).first()
+    has_movements = db.session.query(InventoryMovement.id).first()
+    if has_movements and not has_valuations:
+        for organization_id in db.session.execute(select(Organization.id)).scalars().all():
+            rebuild_valuation(organization_id)
+        db.session.commit()
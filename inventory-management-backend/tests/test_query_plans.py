@@ -0,0 +1,109 @@
+import re
+from sqlalchemy import event
+from src.models.inventory import db
+from src.services.forecasting import run_forecast
+from src.services.snapshots import take_snapshots
+from bench.scratch import scratch_api, seed_api_organization, remove_scratch_database
+
+# Read endpoints whose queries must be served from indexes. '{name}' is filled
+# from the seeded ids; paths ending in 'cursor=' are requested twice, the second
+# time with the cursor the first page returned.
+PLAN_CHECK_REQUESTS = [
+    '/api/products',
+    '/api/products?search=widget',
+    '/api/products?category_id={category_id}',
+    '/api/products?is_active=1',
+    '/api/products?low_stock=1',
+    '/api/products?limit=1&cursor=',
+    '/api/inventory',
+    '/api/inventory?warehouse_id={warehouse_id}',
+    '/api/inventory?product_id={product_id}',
+    '/api/inventory?low_stock=1&expand=product,warehouse',
+    '/api/inventory/movements',
+    '/api/inventory/movements?product_id={product_id}',
+    '/api/inventory/movements?warehouse_id={warehouse_id}',
+    '/api/inventory/movements?movement_type=in&date_from={date_from}&date_to={date_to}',
+    '/api/inventory/movements?limit=1&cursor=',
+    '/api/inventory/as-of?ts={date_from}',
+    '/api/inventory/as-of?ts={date_to}&product_id={product_id}',
+    '/api/warehouses',
+    '/api/categories',
+    '/api/alerts',
+    '/api/alerts?unread_only=1',
+    '/api/alerts?status=open',
+    '/api/alerts?limit=1&cursor=',
+    '/api/reports/dashboard?expand=product',
+    '/api/reports/inventory-summary',
+    '/api/reports/inventory-summary?warehouse_id={warehouse_id}&category_id={category_id}',
+    '/api/reports/low-stock',
+    '/api/reports/low-stock?warehouse_id={warehouse_id}&threshold_percentage=150',
+    '/api/reports/low-stock?limit=1&cursor=',
+    '/api/reports/movement-analysis?date_from={date_from}&date_to={date_to}',
+    '/api/reports/movement-analysis?product_id={product_id}&bucket=week',
+    '/api/reports/valuation',
+    '/api/reports/reorder-suggestions?expand=product,warehouse',
+    '/api/reports/reorder-suggestions?warehouse_id={warehouse_id}&needs_order=1',
+    '/api/reports/reorder-suggestions?limit=1&cursor='
+]
+
+_FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+def full_scans(connection, statement, parameters):
+    """Tables an SQLite statement reads with a full table scan"""
+    plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    scans = []
+    for row in plan:
+        match = _FULL_SCAN.match(row[-1].strip())
+        if match and match.group(1) in db.metadata.tables:
+            scans.append(match.group(1))
+    return scans
+
+def test_read_endpoints_use_indexes():
+    """Run the read endpoints against a seeded scratch database and EXPLAIN
+    every SELECT they issue; none may scan a whole table"""
+    app, path = scratch_api()
+    try:
+        client = app.test_client()
+        with app.app_context():
+            engines = list(db.engines.values())
+        headers, ids = seed_api_organization(client)
+        with app.app_context():
+            take_snapshots()  # so later points in time start from a snapshot
+            run_forecast()
+
+        captured = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                captured.append((conn.engine, statement, parameters))
+
+        checked = 0
+        violations = []
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            for template in PLAN_CHECK_REQUESTS:
+                url = template.format(**ids)
+                urls = [url]
+                if url.endswith('cursor='):
+                    first = client.get(url, headers=headers).json
+                    if first.get('next_cursor'):
+                        urls = [url + first['next_cursor']]
+                for request_url in urls:
+                    del captured[:]
+                    response = client.get(request_url, headers=headers)
+                    assert response.status_code == 200, f'{request_url}: HTTP {response.status_code}'
+                    for engine, statement, parameters in list(captured):
+                        with engine.connect() as connection:
+                            checked += 1
+                            scans = full_scans(connection, statement, parameters)
+                        if scans:
+                            violations.append(f"{request_url}: full scan of {', '.join(scans)}\n    {' '.join(statement.split())}")
+        finally:
+            for engine in engines:
+                event.remove(engine, 'before_cursor_execute', capture)
+    finally:
+        remove_scratch_database(path)
+
+    assert checked > 0
+    assert not violations, '\n'.join(violations)
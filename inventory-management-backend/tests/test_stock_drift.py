@@ -0,0 +1,31 @@
+from src.models.inventory import db, OrgStats, Product
+from src.services.stats import STAT_COLUMNS, compute_org_stats
+from src.services.valuation import check_valuation
+from bench.benchmarks import stress_movements
+from bench.scratch import scratch_api, seed_api_organization, remove_scratch_database
+
+def test_concurrent_movements_do_not_drift():
+    result = stress_movements(writers=8, movements_per_writer=25)
+    assert result['errors'] == 0
+    assert result['committed'] + result['rejected'] == result['attempted']
+    assert result['actual_quantity'] >= 0
+    assert result['drift'] == 0
+
+def test_summary_and_cost_state_match_the_base_tables():
+    app, path = scratch_api()
+    try:
+        client = app.test_client()
+        headers, ids = seed_api_organization(client)
+        response = client.post('/api/inventory/movements', json={
+            'product_id': ids['product_id'], 'warehouse_id': ids['warehouse_id'],
+            'movement_type': 'out', 'quantity': 2
+        }, headers=headers)
+        assert response.status_code == 201
+        with app.app_context():
+            organization_id = db.session.get(Product, ids['product_id']).organization_id
+            stored = db.session.get(OrgStats, organization_id)
+            rebuilt = compute_org_stats(organization_id)
+            assert {name: getattr(stored, name) for name in STAT_COLUMNS} == rebuilt
+            assert check_valuation(organization_id) == []
+    finally:
+        remove_scratch_database(path)
@@ -0,0 +1,18 @@
+import pytest
+from bench.benchmarks import (
+    bench_forecast, bench_movement_archive, bench_reorder_simulation, bench_stock_as_of, bench_valuation
+)
+
+# Each run compares the optimized path with a reference computation on a small
+# seeded database; `python -m bench` runs the same checks at full size
+@pytest.mark.parametrize('run', [
+    lambda: bench_stock_as_of(movements_per_day=20, days=60, products=5, queries=10,
+                              snapshot_after_days=10, horizon_days=40),
+    lambda: bench_movement_archive(movements_per_day=10, days=120, products=5, horizon_days=40),
+    lambda: bench_valuation(movements=600, products=20, batch_size=50),
+    lambda: bench_forecast(series=300, days=30, warehouses=3, workers=2, checked=300),
+    lambda: bench_reorder_simulation(series=300, days=30, warehouses=3, workers=2, candidates=50, checked=300)
+], ids=['stock-as-of', 'movement-archive', 'valuation', 'forecast', 'reorder-simulation'])
+def test_matches_reference(run):
+    result = run()
+    assert result['matches'], result
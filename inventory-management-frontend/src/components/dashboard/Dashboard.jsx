@@ -48,7 +48,7 @@ const Dashboard = () => {
   const fetchDashboardData = async () => {
     try {
       setLoading(true);
-      const data = await apiClient.getDashboardStats();
+      const data = await apiClient.getDashboardStats({ expand: 'product' });
       setDashboardData(data);
     } catch (err) {
       setError('Failed to load dashboard data');
@@ -72,6 +72,7 @@ const InventoryPage = () => {
       const data = await apiClient.getInventory({
         search: searchTerm,
         warehouse_id: selectedWarehouse,
+        expand: 'product,warehouse',
       });
       setInventory(data.inventory || []);
     } catch (error) {
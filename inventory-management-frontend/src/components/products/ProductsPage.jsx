@@ -86,6 +86,7 @@ const ProductsPage = () => {
       const data = await apiClient.getProducts({
         search: searchTerm,
         category_id: selectedCategory,
+        expand: 'category',
       });
       setProducts(data.products || []);
     } catch (error) {
@@ -12,6 +12,14 @@ import {
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { Badge } from '@/components/ui/badge';
+import {
+  DropdownMenu,
+  DropdownMenuContent,
+  DropdownMenuItem,
+  DropdownMenuLabel,
+  DropdownMenuSeparator,
+  DropdownMenuTrigger,
+} from '@/components/ui/dropdown-menu';
 import {
   Select,
   SelectContent,
@@ -51,6 +59,32 @@ const ReportsPage = () => {
   const [loading, setLoading] = useState(false);
   const [selectedPeriod, setSelectedPeriod] = useState('30');
   const [selectedReport, setSelectedReport] = useState('inventory-summary');
+  const [exporting, setExporting] = useState(null);
+
+  const exportReports = [
+    { id: 'inventory-summary', label: 'Inventory Summary' },
+    { id: 'valuation', label: 'Inventory Valuation' },
+    { id: 'low-stock', label: 'Low Stock' },
+    { id: 'movements', label: 'Movement History' },
+  ];
+
+  const handleExport = async (report, format) => {
+    const params = { format };
+    if (report === 'movements') {
+      const dateFrom = new Date();
+      dateFrom.setDate(dateFrom.getDate() - parseInt(selectedPeriod, 10));
+      params.date_from = dateFrom.toISOString();
+    }
+
+    try {
+      setExporting(`${report}-${format}`);
+      await apiClient.downloadReport(report, params);
+    } catch (error) {
+      console.error('Failed to export report:', error);
+    } finally {
+      setExporting(null);
+    }
+  };
 
   // Sample data for demonstration
   const inventoryTrendData = [
@@ -142,10 +176,28 @@ const ReportsPage = () => {
               <SelectItem value="365">Last year</SelectItem>
             </SelectContent>
           </Select>
-          <Button variant="outline">
-            <Download className="w-4 h-4 mr-2" />
-            Export
-          </Button>
+          <DropdownMenu>
+            <DropdownMenuTrigger asChild>
+              <Button variant="outline" disabled={exporting !== null}>
+                <Download className="w-4 h-4 mr-2" />
+                {exporting ? 'Exporting...' : 'Export'}
+              </Button>
+            </DropdownMenuTrigger>
+            <DropdownMenuContent align="end">
+              {exportReports.map((report, index) => (
+                <React.Fragment key={report.id}>
+                  {index > 0 && <DropdownMenuSeparator />}
+                  <DropdownMenuLabel>{report.label}</DropdownMenuLabel>
+                  <DropdownMenuItem onClick={() => handleExport(report.id, 'csv')}>
+                    Download CSV
+                  </DropdownMenuItem>
+                  <DropdownMenuItem onClick={() => handleExport(report.id, 'ndjson')}>
+                    Download NDJSON
+                  </DropdownMenuItem>
+                </React.Fragment>
+              ))}
+            </DropdownMenuContent>
+          </DropdownMenu>
         </div>
       </div>
 
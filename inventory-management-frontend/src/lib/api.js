@@ -70,8 +70,9 @@ class ApiClient {
   }
 
   // Dashboard endpoints
-  async getDashboardStats() {
-    return this.request('/reports/dashboard');
+  async getDashboardStats(params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    return this.request(`/reports/dashboard${queryString ? `?${queryString}` : ''}`);
   }
 
   // Product endpoints
@@ -157,6 +158,31 @@ class ApiClient {
     return this.request(`/reports/valuation${queryString ? `?${queryString}` : ''}`);
   }
 
+  // Streams /reports/<report>/export to a file download. The Authorization
+  // header rules out a plain link, so the response is fetched and saved.
+  async downloadReport(report, params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    const url = `${API_BASE_URL}/reports/${report}/export${queryString ? `?${queryString}` : ''}`;
+    const headers = this.token ? { Authorization: `Bearer ${this.token}` } : {};
+
+    const response = await fetch(url, { headers });
+    if (!response.ok) {
+      const data = await response.json().catch(() => ({}));
+      throw new Error(data.error || 'Export failed');
+    }
+
+    const disposition = response.headers.get('Content-Disposition') || '';
+    const match = disposition.match(/filename="([^"]+)"/);
+    const blob = await response.blob();
+    const link = document.createElement('a');
+    link.href = URL.createObjectURL(blob);
+    link.download = match ? match[1] : `${report}.${params.format || 'csv'}`;
+    document.body.appendChild(link);
+    link.click();
+    link.remove();
+    URL.revokeObjectURL(link.href);
+  }
+
   // Alert endpoints
   async getAlerts(params = {}) {
     const queryString = new URLSearchParams(params).toString();